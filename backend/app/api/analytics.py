@@ -0,0 +1,55 @@
+"""Admin analytics API endpoints."""
+from datetime import date, timedelta
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from supabase import Client
+
+from app.database import get_supabase_read
+from app.query_budget import round_trip_budget
+from app.schemas import SalesAnalyticsResponse, SalesDailyTotal, SalesRollupRow
+from app.services.analytics_service import MAX_ROLLUP_PAGES, RollupTooLarge, daily_totals, get_sales_rollup
+
+router = APIRouter(prefix="/admin/analytics", tags=["analytics"])
+
+MAX_RANGE_DAYS = 366
+
+
+@router.get("/sales", response_model=SalesAnalyticsResponse)
+@round_trip_budget(supabase=MAX_ROLLUP_PAGES)  # One per page of rollup rows
+def get_sales(
+    group_by: Literal["product", "category"] = Query("category", description="Break sales down by product or category"),
+    start: Optional[date] = Query(None, description="First day (defaults to 29 days before end)"),
+    end: Optional[date] = Query(None, description="Last day, inclusive (defaults to today)"),
+    supabase: Client = Depends(get_supabase_read)
+):
+    """Daily units and gross amount from the sales rollups (never scans orders)."""
+    end = end or date.today()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {MAX_RANGE_DAYS} days")
+    
+    try:
+        rows = get_sales_rollup(supabase, group_by, start, end)
+    except RollupTooLarge as e:
+        raise HTTPException(status_code=400, detail=f"{e}; narrow the date range or group by category")
+    return SalesAnalyticsResponse(
+        start=start,
+        end=end,
+        group_by=group_by,
+        rows=[
+            SalesRollupRow(
+                day=row["day"],
+                product_id=row.get("product_id"),
+                category=row.get("category") or None,
+                currency=row["currency"],
+                units=row["units"],
+                gross_amount=row["gross_amount"],
+                orders=row["orders"]
+            )
+            for row in rows
+        ],
+        totals=[SalesDailyTotal(**total) for total in daily_totals(rows)]
+    )
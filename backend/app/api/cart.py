@@ -0,0 +1,58 @@
+"""Cart API endpoints."""
+from collections import Counter
+
+from fastapi import APIRouter, Depends
+from supabase import Client
+
+from app.database import get_supabase_read
+from app.query_budget import round_trip_budget
+from app.schemas import CartQuoteLine, CartQuoteRequest, CartQuoteResponse
+from app.services.order_service import available_stock, get_checkout_products, snapshot_cart_items
+from app.services.product_service import format_price
+
+router = APIRouter(prefix="/cart", tags=["cart"])
+
+
+@router.post("/quote", response_model=CartQuoteResponse)
+@round_trip_budget(supabase=1)
+def quote_cart(quote_data: CartQuoteRequest, supabase: Client = Depends(get_supabase_read)):
+    """Validate and price a cart at current prices, without touching Stripe.
+    
+    Uses the same product snapshot as checkout, with stock embedded in the
+    same query, so the whole cart costs one read.
+    """
+    products = get_checkout_products(supabase, [item.product_id for item in quote_data.items], with_stock=True)
+    requested = Counter()
+    for item in quote_data.items:
+        requested[item.product_id] += item.quantity
+    
+    lines = []
+    for line in snapshot_cart_items(quote_data.items, products):
+        product = line["product"]
+        stock = available_stock(product) if product else None
+        problem = line["problem"]
+        if not problem and stock is not None and requested[line["product_id"]] > stock:
+            problem = f"Only {stock} left in stock" if stock else "Out of stock"
+        
+        unit_amount = line["unit_amount_snapshot"]
+        lines.append(CartQuoteLine(
+            product_id=line["product_id"],
+            quantity=line["quantity"],
+            title=product["title"] if product else None,
+            unit_amount=unit_amount,
+            formatted_unit_price=format_price(unit_amount, product["currency"]) if unit_amount is not None else None,
+            line_total=unit_amount * line["quantity"] if not problem else 0,
+            available=problem is None,
+            stock_available=stock,
+            problem=problem
+        ))
+    
+    subtotal = sum(line.line_total for line in lines)
+    return CartQuoteResponse(
+        lines=lines,
+        currency="usd",  # Single currency, as in checkout
+        subtotal=subtotal,
+        formatted_subtotal=format_price(subtotal),
+        item_count=sum(line.quantity for line in lines),
+        checkout_ready=all(line.available for line in lines)
+    )
@@ -1,29 +1,58 @@
 """Checkout API endpoints."""
+import logging
+import time
+
 from fastapi import APIRouter, Depends, HTTPException
 from supabase import Client
 
 from app.database import get_supabase
 from app.config import settings
 from app.schemas import CheckoutSessionRequest, CheckoutSessionResponse
-from app.services.order_service import create_order_from_checkout
-from app.stripe_client import create_checkout_session
+from app.query_budget import round_trip_budget
+from app.rate_limit import UpstreamOverloaded, rate_limit
+from app.services.inventory_service import (
+    InsufficientStock,
+    new_reservation_id,
+    release_reservation,
+    reserve_inventory,
+    tracked_items,
+)
+from app.services.order_service import create_order_from_checkout, get_checkout_products
+from app.stripe_client import create_checkout_session, expire_checkout_session
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/checkout", tags=["checkout"])
 
+# Stripe rejects sessions expiring less than 30 minutes after it receives them;
+# the margin covers the time between computing expires_at and Stripe's check
+MIN_SESSION_EXPIRY_SECONDS = 1800 + 120
+
+
+def _release_hold(supabase: Client, reservation_id: str):
+    """Best-effort release on a failed checkout; the reaper frees the hold if this fails too."""
+    try:
+        release_reservation(supabase, reservation_id)
+    except Exception as e:
+        logger.error(f"Failed to release reservation {reservation_id}: {e}")
+
 
 @router.post("/session", response_model=CheckoutSessionResponse)
+@round_trip_budget(supabase=5, stripe=2)  # Failed order writes add a hold release and a session expiry
+@rate_limit("checkout")
 def create_checkout(checkout_data: CheckoutSessionRequest, supabase: Client = Depends(get_supabase)):
     """Create Stripe Checkout Session."""
+    # Look up every product in the cart with one query
+    products = get_checkout_products(supabase, [item.product_id for item in checkout_data.items])
+    
     # Build line items for Stripe
     line_items = []
     for item in checkout_data.items:
-        result = supabase.table("products").select("*").eq("id", item.product_id).is_("deleted_at", "null").eq("published", True).execute()
+        product = products.get(item.product_id)
         
-        if not result.data:
+        if not product:
             raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found or not published")
         
-        product = result.data[0]
-        
         if not product.get("active_stripe_price_id"):
             raise HTTPException(status_code=400, detail=f"Product {item.product_id} has no active Stripe price")
         
@@ -32,21 +61,54 @@ def create_checkout(checkout_data: CheckoutSessionRequest, supabase: Client = De
             "quantity": item.quantity,
         })
     
+    # Hold stock for the whole cart in one call; the hold outlives the Stripe session
+    # slightly so the expiry webhook, not the reaper, normally releases it
+    expiry_seconds = max(settings.checkout_session_expiry_seconds, MIN_SESSION_EXPIRY_SECONDS)
+    reservation_id = None
+    items_to_reserve = tracked_items(checkout_data.items, products)
+    if items_to_reserve:
+        reservation_id = new_reservation_id()
+        try:
+            reserve_inventory(
+                supabase,
+                reservation_id,
+                items_to_reserve,
+                expiry_seconds + settings.inventory_hold_grace_seconds
+            )
+        except InsufficientStock as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    
     # Create Stripe Checkout Session
     try:
         session = create_checkout_session(
             line_items=line_items,
             success_url=checkout_data.success_url,
-            cancel_url=checkout_data.cancel_url
+            cancel_url=checkout_data.cancel_url,
+            client_reference_id=reservation_id,
+            # Computed last, after the reservation, so Stripe sees the full expiry
+            expires_at=int(time.time()) + expiry_seconds
         )
     except Exception as e:
+        if reservation_id:
+            _release_hold(supabase, reservation_id)
+        if isinstance(e, UpstreamOverloaded):
+            raise
         raise HTTPException(status_code=500, detail=f"Failed to create checkout session: {str(e)}")
     
     # Create order in DB
     try:
-        create_order_from_checkout(supabase, checkout_data.items, session.id)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        create_order_from_checkout(supabase, checkout_data.items, session.id, products=products)
+    except Exception as e:
+        # Nobody will pay this session: free the stock now and close the session
+        if reservation_id:
+            _release_hold(supabase, reservation_id)
+        try:
+            expire_checkout_session(session.id)
+        except Exception as expire_error:
+            logger.error(f"Failed to expire checkout session {session.id}: {expire_error}")
+        if isinstance(e, ValueError):
+            raise HTTPException(status_code=400, detail=str(e))
+        raise
     
     return CheckoutSessionResponse(
         checkout_url=session.url,
@@ -0,0 +1,50 @@
+"""Image proxy endpoint."""
+import os
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
+
+from app.query_budget import round_trip_budget
+from app.services.image_service import IMAGE_WIDTHS, ImageFetchError, get_image, verify_image_url
+
+router = APIRouter(prefix="/images", tags=["images"])
+
+# The bytes behind a signed URL never change (a replaced image gets a new
+# version in its URL), so they may be cached indefinitely
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get("/{signature}")
+@round_trip_budget(supabase=0, stripe=0)
+def get_proxied_image(
+    request: Request,
+    signature: str,
+    url: str = Query(..., description="Original image URL"),
+    w: Optional[int] = Query(None, description=f"Resize to this width; one of {', '.join(map(str, IMAGE_WIDTHS))}"),
+    v: Optional[str] = Query(None, description="Image version, signed with the URL"),
+):
+    """Serve a product image from the disk cache, optionally resized, fetching it on a miss.
+
+    Only URLs signed by ``proxy_image_url`` are served.
+    """
+    if not verify_image_url(url, signature, v):
+        raise HTTPException(status_code=403, detail="Invalid image signature")
+    if w is not None and w not in IMAGE_WIDTHS:
+        raise HTTPException(status_code=400, detail=f"w must be one of {', '.join(map(str, IMAGE_WIDTHS))}")
+
+    try:
+        image = get_image(url, w, v)
+    except ImageFetchError as e:
+        raise HTTPException(status_code=502, detail=f"Could not fetch image: {e}")
+
+    etag = f'"{image.digest[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "X-Content-Type-Options": "nosniff"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    try:
+        stat_result = os.stat(image.path)
+    except FileNotFoundError:
+        # Evicted between the lookup and now; the client may simply retry
+        raise HTTPException(status_code=503, detail="Image evicted, retry", headers={"Retry-After": "1"})
+    # Streamed from disk in chunks rather than read into memory
+    return FileResponse(image.path, media_type=image.content_type, headers=headers, stat_result=stat_result)
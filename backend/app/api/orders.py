@@ -1,25 +1,24 @@
 """Order API endpoints."""
-from fastapi import APIRouter, Depends, HTTPException
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from supabase import Client
 
-from app.database import get_supabase
+from app.config import settings
+from app.database import get_supabase, get_supabase_read
+from app.query_budget import round_trip_budget
 from app.schemas import OrderResponse, OrderItemResponse
+from app.services import order_service
+from app.services.order_events import watcher
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
 
-@router.get("/{order_id}", response_model=OrderResponse)
-def get_order(order_id: int, supabase: Client = Depends(get_supabase)):
-    """Get order by ID."""
-    # Get order with items
-    result = supabase.table("orders").select("*, order_items(*)").eq("id", order_id).execute()
-    
-    if not result.data:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    order_data = result.data[0]
-    
-    # Convert order_items to OrderItemResponse
+def _order_response(order_data: Dict[str, Any]) -> OrderResponse:
+    """Convert an order row with embedded order_items to OrderResponse."""
     items = [
         OrderItemResponse(
             product_id=item["product_id"],
@@ -40,33 +39,106 @@ def get_order(order_id: int, supabase: Client = Depends(get_supabase)):
     )
 
 
+@router.get("/{order_id}", response_model=OrderResponse)
+@round_trip_budget(supabase=3)
+def get_order(order_id: int, supabase: Client = Depends(get_supabase), replica: Client = Depends(get_supabase_read)):
+    """Get order by ID."""
+    order_data = order_service.get_order(supabase, order_id, replica=replica)
+    
+    if not order_data:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    return _order_response(order_data)
+
+
 @router.get("/by-session/{session_id}", response_model=OrderResponse)
-def get_order_by_session(session_id: str, supabase: Client = Depends(get_supabase)):
+@round_trip_budget(supabase=3)
+def get_order_by_session(session_id: str, supabase: Client = Depends(get_supabase), replica: Client = Depends(get_supabase_read)):
     """Get order by Stripe Checkout Session ID."""
-    # Get order with items
-    result = supabase.table("orders").select("*, order_items(*)").eq("stripe_checkout_session_id", session_id).execute()
+    order_data = order_service.get_order_by_session(supabase, session_id, replica=replica)
     
-    if not result.data:
+    if not order_data:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    order_data = result.data[0]
+    return _order_response(order_data)
+
+
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@router.get("/by-session/{session_id}/events")
+@round_trip_budget(supabase=3)
+async def stream_order_by_session(
+    session_id: str,
+    request: Request,
+    supabase: Client = Depends(get_supabase),
+    replica: Client = Depends(get_supabase_read)
+):
+    """Stream the order as Server-Sent Events until it leaves pending_payment.
     
-    # Convert order_items to OrderItemResponse
-    items = [
-        OrderItemResponse(
-            product_id=item["product_id"],
-            quantity=item["quantity"],
-            unit_amount_snapshot=item["unit_amount_snapshot"]
-        )
-        for item in (order_data.get("order_items") or [])
-    ]
+    Sends an ``order`` event with the current order, then another each time
+    the webhook updates it, and ends with ``end`` once the status is final
+    (or ``timeout``). Waiting costs no queries when updates are guaranteed to
+    arrive through the change feed: with a change feed listener, or with a
+    single worker. With several workers and no listener, an update made by
+    another worker never reaches this one's feed, so the order is re-read
+    after ``order_events_poll_seconds``, then at doubling intervals up to the
+    keepalive interval.
     
-    return OrderResponse(
-        id=order_data["id"],
-        status=order_data["status"],
-        total_amount_snapshot=order_data["total_amount_snapshot"],
-        currency=order_data["currency"],
-        customer_email=order_data.get("customer_email"),
-        items=items,
-        created_at=order_data["created_at"]
+    The round-trip budget covers the request up to the first event; reads
+    made later inside the stream are not counted against it.
+    """
+    # Registered before the initial read, so a change landing in between is not missed
+    waiter = watcher.register(session_id)
+    try:
+        order = await run_in_threadpool(order_service.get_order_by_session, supabase, session_id, replica)
+    except Exception as e:
+        watcher.unregister(session_id, waiter)
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=f"Error fetching order: {str(e)}")
+    if not order:
+        watcher.unregister(session_id, waiter)
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    async def events(order: Dict[str, Any]):
+        deadline = time.monotonic() + settings.order_events_timeout_seconds
+        polling = not settings.change_feed_database_url and settings.web_concurrency > 1
+        tick = settings.order_events_poll_seconds if polling else settings.order_events_keepalive_seconds
+        try:
+            while True:
+                yield _sse("order", _order_response(order).model_dump_json())
+                if order["status"] != "pending_payment":
+                    yield _sse("end", order["status"])
+                    return
+                
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or await request.is_disconnected():
+                        yield _sse("timeout", "")
+                        return
+                    record = await waiter.wait(min(tick, remaining))
+                    if record is not None:
+                        break
+                    if polling:
+                        tick = min(tick * 2, settings.order_events_keepalive_seconds)
+                        latest = await run_in_threadpool(order_service.get_order_by_session, supabase, session_id)
+                        if latest and latest["status"] != order["status"]:
+                            record = latest
+                            break
+                    yield ": keepalive\n\n"
+                
+                if record.get("status"):
+                    # The event row has no order_items; keep the ones already loaded
+                    order = {**order, **record}
+                else:
+                    order = await run_in_threadpool(order_service.get_order_by_session, supabase, session_id) or order
+        finally:
+            watcher.unregister(session_id, waiter)
+    
+    return StreamingResponse(
+        events(order),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
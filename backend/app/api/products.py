@@ -1,51 +1,123 @@
 """Product API endpoints."""
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from supabase import Client
 
-from app.database import get_supabase
-from app.schemas import ProductCreate, ProductUpdate, ProductResponse, ProductPublic
+from app.database import get_supabase, get_supabase_read
+from app.query_budget import round_trip_budget
+from app.rate_limit import rate_limit
+from app.schemas import (
+    CategoryFacet,
+    PriceRangeFacet,
+    ProductCreate,
+    ProductFacetsResponse,
+    ProductPublic,
+    ProductResponse,
+    ProductUpdate,
+)
+from app.services.facet_service import PRICE_BUCKET_BOUNDS, facet_index
 from app.services.product_service import (
     create_product,
     update_product,
     delete_product,
     get_products,
     get_product,
-    format_price
+    get_products_by_ids,
+    format_price,
+    storefront_product
 )
 from app.services.stripe_sync import resync_product
 
 router = APIRouter(prefix="/products", tags=["products"])
 
 
+MAX_BATCH_IDS = 100
+
+
+def _public_product(product: Dict[str, Any]) -> ProductPublic:
+    product = storefront_product(product)
+    return ProductPublic(
+        id=product["id"],
+        title=product["title"],
+        description=product.get("description"),
+        image_url=product.get("images", [None])[0] if product.get("images") else None,  # Backward compat
+        images=product.get("images", []),
+        category=product.get("category"),
+        currency=product["currency"],
+        current_price_amount=product["current_price_amount"],
+        published=product.get("published", False),
+        formatted_price=format_price(product["current_price_amount"], product["currency"])
+    )
+
+
+def _etag_response(request: Request, content: Any) -> Response:
+    """JSON response with a strong ETag; 304 when the client already has this body."""
+    body = json.dumps(jsonable_encoder(content), separators=(",", ":")).encode()
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _parse_ids(ids: str) -> List[int]:
+    try:
+        product_ids = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if len(product_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return product_ids
+
+
 @router.get("", response_model=dict)
+@round_trip_budget(supabase=1)
 def get_public_products(
+    request: Request,
     category: Optional[str] = Query(None, description="Filter by category"),
     search: Optional[str] = Query(None, description="Search in title and description"),
-    supabase: Client = Depends(get_supabase)
+    ids: Optional[str] = Query(None, description="Comma-separated product IDs to fetch (ignores other filters)"),
+    supabase: Client = Depends(get_supabase_read),
+    primary: Client = Depends(get_supabase)
 ):
-    """Get published products for storefront."""
+    """Get published products for storefront (served from the read replica when configured).
+    
+    With ``ids``, returns those published products in the requested order from
+    the product cache, with a strong ETag.
+    """
+    if ids is not None:
+        product_ids = _parse_ids(ids)
+        found = get_products_by_ids(primary, product_ids)
+        products = [found[product_id] for product_id in dict.fromkeys(product_ids) if found.get(product_id, {}).get("published")]
+        return _etag_response(request, {"products": [_public_product(product) for product in products]})
+    
     products = get_products(supabase, published_only=True, category=category, search=search)
     return {
-        "products": [
-            ProductPublic(
-                id=product["id"],
-                title=product["title"],
-                description=product.get("description"),
-                image_url=product.get("images", [None])[0] if product.get("images") else None,  # Backward compat
-                images=product.get("images", []),
-                category=product.get("category"),
-                currency=product["currency"],
-                current_price_amount=product["current_price_amount"],
-                published=product.get("published", False),
-                formatted_price=format_price(product["current_price_amount"], product["currency"])
-            )
-            for product in products
-        ]
+        "products": [_public_product(product) for product in products]
     }
 
 
+@router.get("/categories", response_model=ProductFacetsResponse)
+@round_trip_budget(supabase=1)
+def get_product_categories(supabase: Client = Depends(get_supabase)):
+    """Category and price-range counts of storefront products, from the precomputed facet index."""
+    facets = facet_index.snapshot(supabase)
+    bounds = [0] + PRICE_BUCKET_BOUNDS + [None]
+    return ProductFacetsResponse(
+        categories=[CategoryFacet(name=name, count=count) for name, count in facets["categories"]],
+        price_ranges=[
+            PriceRangeFacet(min_amount=bounds[index], max_amount=bounds[index + 1], count=count)
+            for index, count in enumerate(facets["price_buckets"])
+        ],
+        total=facets["total"]
+    )
+
+
 @router.get("/admin", response_model=List[ProductResponse])
+@round_trip_budget(supabase=1)
 def get_admin_products(
     category: Optional[str] = Query(None, description="Filter by category"),
     search: Optional[str] = Query(None, description="Search in title and description"),
@@ -69,6 +141,7 @@ def get_admin_products(
             active_stripe_price_id=product.get("active_stripe_price_id"),
             last_sync_status=product.get("last_sync_status"),
             last_sync_at=product.get("last_sync_at"),
+            track_inventory=product.get("track_inventory") or False,
             created_at=product["created_at"],
             updated_at=product["updated_at"],
             formatted_price=format_price(product["current_price_amount"], product["currency"])
@@ -78,6 +151,8 @@ def get_admin_products(
 
 
 @router.post("/admin", response_model=ProductResponse, status_code=201)
+@round_trip_budget(supabase=3, stripe=2)
+@rate_limit("stripe_sync")
 def create_admin_product(product_data: ProductCreate, supabase: Client = Depends(get_supabase)):
     """Create a new product."""
     product = create_product(supabase, product_data)
@@ -95,6 +170,7 @@ def create_admin_product(product_data: ProductCreate, supabase: Client = Depends
         active_stripe_price_id=product.get("active_stripe_price_id"),
         last_sync_status=product.get("last_sync_status"),
         last_sync_at=product.get("last_sync_at"),
+        track_inventory=product.get("track_inventory") or False,
         created_at=product["created_at"],
         updated_at=product["updated_at"],
         formatted_price=format_price(product["current_price_amount"], product["currency"])
@@ -102,6 +178,8 @@ def create_admin_product(product_data: ProductCreate, supabase: Client = Depends
 
 
 @router.put("/admin/{product_id}", response_model=ProductResponse)
+@round_trip_budget(supabase=3, stripe=3)
+@rate_limit("stripe_sync")
 def update_admin_product(product_id: int, product_data: ProductUpdate, supabase: Client = Depends(get_supabase)):
     """Update a product."""
     try:
@@ -120,6 +198,7 @@ def update_admin_product(product_id: int, product_data: ProductUpdate, supabase:
             active_stripe_price_id=product.get("active_stripe_price_id"),
             last_sync_status=product.get("last_sync_status"),
             last_sync_at=product.get("last_sync_at"),
+            track_inventory=product.get("track_inventory") or False,
             created_at=product["created_at"],
             updated_at=product["updated_at"],
             formatted_price=format_price(product["current_price_amount"], product["currency"])
@@ -129,6 +208,7 @@ def update_admin_product(product_id: int, product_data: ProductUpdate, supabase:
 
 
 @router.delete("/admin/{product_id}")
+@round_trip_budget(supabase=1)
 def delete_admin_product(product_id: int, supabase: Client = Depends(get_supabase)):
     """Soft delete a product."""
     success = delete_product(supabase, product_id)
@@ -138,9 +218,25 @@ def delete_admin_product(product_id: int, supabase: Client = Depends(get_supabas
 
 
 @router.post("/admin/{product_id}/resync")
+@round_trip_budget(supabase=2, stripe=3)
+@rate_limit("stripe_sync")
 def resync_admin_product(product_id: int, supabase: Client = Depends(get_supabase)):
     """Resync a product to Stripe."""
     success, error = resync_product(supabase, product_id)
     if not success:
         raise HTTPException(status_code=400, detail=error or "Resync failed")
     return {"success": True, "message": "Product synced successfully"}
+
+
+@router.get("/{product_id}", response_model=ProductPublic)
+@round_trip_budget(supabase=1)
+def get_public_product(request: Request, product_id: int, supabase: Client = Depends(get_supabase)):
+    """Get one published product, with a strong ETag.
+    
+    Served from the per-product cache, which is invalidated by the change feed;
+    misses read the primary so a fresh write is never re-cached from a lagging replica.
+    """
+    product = get_product(supabase, product_id)
+    if not product or not product.get("published"):
+        raise HTTPException(status_code=404, detail="Product not found")
+    return _etag_response(request, _public_product(product))
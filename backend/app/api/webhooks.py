@@ -1,16 +1,21 @@
 """Stripe webhook handler."""
 from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from postgrest.exceptions import APIError
 from supabase import Client
-import stripe
 
 from app.database import get_supabase
+from app.query_budget import round_trip_budget
 from app.config import settings
+from app.services.inventory_service import commit_reservation, release_reservation
 from app.services.order_service import update_order_status
+from app.stripe_client import get_stripe
 
 router = APIRouter(prefix="/stripe", tags=["webhooks"])
 
 
 @router.post("/webhook")
+@round_trip_budget(supabase=7)
 async def stripe_webhook(request: Request, supabase: Client = Depends(get_supabase)):
     """Handle Stripe webhook events."""
     payload = await request.body()
@@ -19,6 +24,7 @@ async def stripe_webhook(request: Request, supabase: Client = Depends(get_supaba
     if not sig_header:
         raise HTTPException(status_code=400, detail="Missing stripe-signature header")
     
+    stripe = get_stripe()
     try:
         event = stripe.Webhook.construct_event(
             payload, sig_header, settings.stripe_webhook_secret
@@ -28,6 +34,13 @@ async def stripe_webhook(request: Request, supabase: Client = Depends(get_supaba
     except stripe.error.SignatureVerificationError as e:
         raise HTTPException(status_code=400, detail=f"Invalid signature: {str(e)}")
     
+    # The Supabase client is synchronous; keep its calls (and any wait for an
+    # upstream slot) off the event loop
+    return await run_in_threadpool(_process_event, supabase, event)
+
+
+def _process_event(supabase: Client, event) -> dict:
+    """Record and apply a verified event; already processed redeliveries are no-ops."""
     # Check idempotency
     result = supabase.table("stripe_events").select("*").eq("stripe_event_id", event.id).execute()
     existing_event = result.data[0] if result.data else None
@@ -42,8 +55,15 @@ async def stripe_webhook(request: Request, supabase: Client = Depends(get_supaba
             "stripe_event_id": event.id,
             "event_type": event.type
         }
-        result = supabase.table("stripe_events").insert(event_data).execute()
-        stripe_event = result.data[0] if result.data else None
+        try:
+            result = supabase.table("stripe_events").insert(event_data).execute()
+            stripe_event = result.data[0] if result.data else None
+        except APIError as e:
+            if e.code != "23505":
+                raise
+            # A concurrent delivery of the same event recorded it first and is processing it;
+            # if that fails, Stripe's retry finds the unprocessed row and processes it then
+            return {"status": "already_processed"}
     else:
         stripe_event = existing_event
     
@@ -59,6 +79,18 @@ async def stripe_webhook(request: Request, supabase: Client = Depends(get_supaba
                 "paid",
                 customer_email
             )
+            
+            # Checkout put the inventory reservation id in client_reference_id
+            if session.get("client_reference_id"):
+                commit_reservation(supabase, session["client_reference_id"])
+        
+        elif event.type == "checkout.session.expired":
+            session = event.data.object
+            
+            if session.get("client_reference_id"):
+                release_reservation(supabase, session["client_reference_id"])
+            
+            update_order_status(supabase, session.id, "cancelled")
         
         # Mark event as processed
         from datetime import datetime
@@ -0,0 +1,159 @@
+"""Cross-worker change feed for products and orders.
+
+Database triggers (see ``supabase_schema.sql``) ``pg_notify`` every row change
+on ``products`` and ``orders`` to the ``row_changes`` channel. Each worker runs
+a ``PostgresChangeListener`` that LISTENs on that channel and republishes the
+notifications to the in-process ``feed``, where caches subscribe to apply
+incremental invalidations.
+
+Service functions also publish their own writes locally, so the writing worker
+sees them immediately and single-worker setups without
+``CHANGE_FEED_DATABASE_URL`` work the same way. Subscribers must therefore
+treat events as idempotent.
+"""
+import json
+import logging
+import select
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "row_changes"
+
+# Published after the listener reconnects: notifications may have been missed,
+# so subscribers should drop all local state.
+RESYNC = "RESYNC"
+
+EVENTS = registry.counter(
+    "change_feed_events_total",
+    "Row change events dispatched to local subscribers.",
+    ("table", "op", "origin"),
+)
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """A row change on ``table``; ``record`` is the new row (None if unknown or deleted)."""
+    table: str
+    op: str  # 'INSERT', 'UPDATE', 'DELETE' or RESYNC
+    id: Any = None
+    record: Optional[Dict[str, Any]] = None
+    origin: str = "local"  # 'local' (this worker) or 'postgres' (LISTEN/NOTIFY)
+
+
+class ChangeFeed:
+    """In-process pub/sub of row changes, keyed by table ('*' receives everything)."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable[[ChangeEvent], None]]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def subscribe(self, table: str, callback: Callable[[ChangeEvent], None]) -> Callable[[], None]:
+        """Call ``callback`` for every change on ``table``; returns an unsubscribe function."""
+        with self._lock:
+            self._subscribers[table].append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers[table]:
+                    self._subscribers[table].remove(callback)
+        return unsubscribe
+
+    def publish(self, event: ChangeEvent):
+        """Deliver ``event`` synchronously to subscribers; errors are logged, not raised."""
+        EVENTS.inc(event.table, event.op, event.origin)
+        with self._lock:
+            if event.op == RESYNC:
+                callbacks = [cb for subscribers in self._subscribers.values() for cb in subscribers]
+            else:
+                callbacks = list(self._subscribers.get(event.table, ())) + list(self._subscribers.get("*", ()))
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Change feed subscriber failed for {event.table} {event.op}: {e}")
+
+
+feed = ChangeFeed()
+
+
+def publish_change(table: str, op: str, record: Optional[Dict[str, Any]]):
+    """Publish a write made by this worker to local subscribers."""
+    feed.publish(ChangeEvent(table, op, (record or {}).get("id"), record))
+
+
+def parse_notification(payload: str) -> ChangeEvent:
+    """Build a ChangeEvent from a ``notify_row_change()`` trigger payload."""
+    data = json.loads(payload)
+    return ChangeEvent(data["table"], data["op"], data.get("id"), data.get("record"), origin="postgres")
+
+
+class PostgresChangeListener:
+    """Background thread forwarding ``row_changes`` notifications to a ChangeFeed.
+
+    Requires ``psycopg2`` and a direct (non-pooled) Postgres connection string,
+    since LISTEN does not work through transaction-mode poolers.
+    """
+
+    def __init__(self, dsn: str, change_feed: ChangeFeed = feed, channel: str = CHANNEL, poll_interval: float = 1.0):
+        self.dsn = dsn
+        self.feed = change_feed
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-feed-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        import psycopg2  # Optional dependency, only needed when CHANGE_FEED_DATABASE_URL is set
+
+        backoff = 1.0
+        first_connect = True
+        while not self._stop.is_set():
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                logger.info(f"Change feed listening on '{self.channel}'")
+                if not first_connect:
+                    # Changes made while disconnected were not delivered
+                    self.feed.publish(ChangeEvent("*", RESYNC, origin="postgres"))
+                first_connect = False
+                backoff = 1.0
+                self._listen(conn)
+                conn.close()
+            except Exception as e:
+                logger.error(f"Change feed listener error: {e}. Reconnecting in {backoff}s...")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def _listen(self, conn):
+        while not self._stop.is_set():
+            readable, _, _ = select.select([conn], [], [], self.poll_interval)
+            if not readable:
+                continue
+            conn.poll()
+            while conn.notifies:
+                notification = conn.notifies.pop(0)
+                try:
+                    self.feed.publish(parse_notification(notification.payload))
+                except (ValueError, KeyError) as e:
+                    logger.error(f"Ignoring malformed change notification: {e}")
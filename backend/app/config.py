@@ -1,4 +1,6 @@
 """Configuration management using environment variables."""
+from functools import lru_cache
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 
@@ -8,6 +10,12 @@ class Settings(BaseSettings):
     # Supabase
     supabase_url: str
     supabase_key: str  # Service role key for backend
+    supabase_read_url: Optional[str] = None  # Read replica for storefront reads (defaults to primary)
+    supabase_read_key: Optional[str] = None  # Defaults to supabase_key
+    read_your_writes_seconds: float = 30.0  # Reads of rows this worker just wrote go to the primary
+    
+    # Direct Postgres connection for the LISTEN/NOTIFY change feed (optional; not the pooler URL)
+    change_feed_database_url: Optional[str] = None
     
     # Stripe
     stripe_secret_key: str
@@ -17,10 +25,81 @@ class Settings(BaseSettings):
     # Frontend
     frontend_url: str = "http://localhost:3000"
     
+    # Checkout and inventory
+    checkout_session_expiry_seconds: int = 3600  # Stripe allows 30 minutes to 24 hours (shorter values are raised)
+    inventory_hold_grace_seconds: int = 300  # Holds outlive their session by this much before the reaper frees them
+    inventory_shard_count: int = 8  # Stock rows per tracked product; more shards mean less lock contention
+    inventory_reaper_interval_seconds: float = 60.0  # 0 disables the expired-hold reaper
+    
+    # Archival of cold rows into *_archive tables
+    archive_interval_seconds: float = 3600.0  # 0 disables the archiver
+    archive_batch_size: int = 500
+    order_archive_after_days: int = 90  # Closed orders (paid, failed, cancelled) not updated this long
+    stripe_event_retention_days: int = 30  # Processed events; must exceed Stripe's 3-day retry window
+    product_archive_after_days: int = 30  # Soft-deleted products no hot order item refers to
+    
+    # Admission control: per-client token buckets for routes that spend Stripe quota
+    checkout_rate_limit_per_minute: float = 10.0  # 0 disables a policy
+    checkout_rate_limit_burst: int = 5
+    stripe_sync_rate_limit_per_minute: float = 30.0  # Admin create/update/resync
+    stripe_sync_rate_limit_burst: int = 10
+    trust_forwarded_for: bool = False  # Key clients by X-Forwarded-For (only behind a trusted proxy)
+    
+    # Concurrent calls per upstream (0 = unlimited); callers queue briefly, then get a 503
+    supabase_max_concurrency: int = 64
+    stripe_max_concurrency: int = 16
+    upstream_queue_timeout_seconds: float = 2.0
+    upstream_max_waiting: int = 128  # Shed immediately once this many calls are queued
+    
+    # Per-product cache for GET /products/{id} and GET /products?ids=...
+    product_cache_size: int = 5000
+    product_cache_ttl_seconds: float = 60.0
+    
+    # Storefront facets (GET /products/categories); rebuilt at least this often
+    facet_index_max_age_seconds: float = 300.0
+    
+    # Order status streaming (GET /orders/by-session/{id}/events)
+    order_events_timeout_seconds: float = 120.0  # Close the stream if the order stays pending this long
+    order_events_keepalive_seconds: float = 15.0
+    order_events_poll_seconds: float = 2.0  # First re-read interval when polling; doubles up to the keepalive
+    web_concurrency: int = 1  # Worker processes (WEB_CONCURRENCY, as read by uvicorn and gunicorn)
+    
+    # Image proxy (GET /images/{signature}); product image URLs point at it when enabled
+    image_proxy_enabled: bool = False
+    public_api_url: str = "http://localhost:8000"  # Base of the rewritten image URLs
+    image_proxy_secret: Optional[str] = None  # Signs proxied URLs; defaults to one derived from supabase_key
+    image_cache_dir: str = ".image_cache"
+    image_cache_max_bytes: int = 512 * 1024 * 1024  # Per worker: LRU eviction past this; a shared dir may reach workers x this
+    image_fetch_timeout_seconds: float = 10.0
+    image_max_source_bytes: int = 20 * 1024 * 1024
+    image_resize_workers: int = 2  # Processes generating resized variants
+
+    # Startup: warm clients and caches before reporting ready (GET /health/ready)
+    warmup_enabled: bool = True
+    warmup_retry_seconds: float = 5.0  # Delay before retrying a failed warm-up
+    
+    # Instrumentation
+    server_timing_enabled: bool = False  # Emit Server-Timing headers with upstream breakdown
+    query_budget_mode: str = "off"  # 'off', 'warn' or 'raise' (dev/test N+1 and round-trip budget checks)
+    query_repeat_threshold: int = 2  # Same-shape queries per request before flagging a possible N+1
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
         extra = "ignore"  # Ignore extra fields in .env (like old database_url)
 
 
-settings = Settings()
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Settings read from the environment on first use, not at import."""
+    return Settings()
+
+
+class _LazySettings:
+    """Module-level ``settings`` that defers to ``get_settings()`` on attribute access."""
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+
+settings: Settings = _LazySettings()  # type: ignore[assignment]
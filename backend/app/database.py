@@ -1,21 +1,31 @@
 """Supabase client initialization with retry logic and connection handling."""
 import logging
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional
 from supabase import create_client, Client
 from app.config import settings
+from app.instrumentation import InstrumentedClient
 
 logger = logging.getLogger(__name__)
 
-# Initialize Supabase client
+# Initialize Supabase clients (primary for writes, optional read replica)
 supabase_client: Optional[Client] = None
+supabase_read_client: Optional[Client] = None
 
+# Keys recently written through this worker -> monotonic deadline for primary reads,
+# kept in deadline order so expired pins can be dropped from the front
+_primary_pins: "OrderedDict[str, float]" = OrderedDict()
+_primary_pins_lock = threading.Lock()
 
-def _create_supabase_client() -> Client:
+
+def _create_supabase_client(url: Optional[str] = None, key: Optional[str] = None, replica: bool = False) -> Client:
     """Create a new Supabase client."""
     try:
-        client = create_client(settings.supabase_url, settings.supabase_key)
-        logger.info("Supabase client created successfully")
-        return client
+        client = create_client(url or settings.supabase_url, key or settings.supabase_key)
+        logger.info(f"Supabase {'read replica' if replica else 'primary'} client created successfully")
+        return InstrumentedClient(client, replica=replica)
     except Exception as e:
         logger.error(f"Failed to create Supabase client: {e}")
         raise
@@ -31,9 +41,52 @@ def get_supabase() -> Client:
     return supabase_client
 
 
+def get_supabase_read() -> Client:
+    """Dependency for read-only queries.
+
+    Returns the read-replica client when ``SUPABASE_READ_URL`` is configured,
+    otherwise the primary client. Replicas lag the primary, so callers that
+    must see their own writes should check ``is_pinned_to_primary`` first.
+    """
+    global supabase_read_client
+
+    if supabase_read_client is None and settings.supabase_read_url:
+        supabase_read_client = _create_supabase_client(
+            settings.supabase_read_url,
+            settings.supabase_read_key,
+            replica=True
+        )
+
+    return supabase_read_client or get_supabase()
+
+
+def pin_to_primary(key: str):
+    """Route reads of ``key`` to the primary for the read-your-writes window."""
+    with _primary_pins_lock:
+        now = time.monotonic()
+        while _primary_pins and next(iter(_primary_pins.values())) <= now:
+            _primary_pins.popitem(last=False)
+        _primary_pins.pop(key, None)
+        _primary_pins[key] = now + settings.read_your_writes_seconds
+
+
+def is_pinned_to_primary(key: str) -> bool:
+    """Whether ``key`` was written by this worker within the read-your-writes window."""
+    deadline = _primary_pins.get(key)
+    return deadline is not None and deadline > time.monotonic()
+
+
 def reset_supabase_client():
     """Reset the Supabase client (useful for connection recovery)."""
-    global supabase_client
+    global supabase_client, supabase_read_client
     logger.warning("Resetting Supabase client")
     supabase_client = None
     supabase_client = _create_supabase_client()
+    supabase_read_client = None
+
+
+def use_supabase_client(client: Client, read_client: Optional[Client] = None):
+    """Install externally created clients (e.g. local stand-ins for benchmarks)."""
+    global supabase_client, supabase_read_client
+    supabase_client = InstrumentedClient(client)
+    supabase_read_client = InstrumentedClient(read_client, replica=True) if read_client is not None else None
@@ -0,0 +1,235 @@
+"""Per-request timing of Supabase and Stripe round trips.
+
+Every Supabase ``.execute()`` and every ``app.stripe_client`` call is wrapped
+in a span. Spans are recorded into Prometheus-style histograms and, while a
+request is in flight, into that request's ``RequestStats`` so the middleware
+can count round trips and emit a ``Server-Timing`` header.
+"""
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request
+
+from app.config import settings
+from app.metrics import DEFAULT_COUNT_BUCKETS, registry
+from app.rate_limit import get_upstream_limiter
+
+REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests.",
+    ("method", "route", "status"),
+)
+UPSTREAM_DURATION = registry.histogram(
+    "upstream_request_duration_seconds",
+    "Time spent in Supabase and Stripe calls.",
+    ("upstream", "operation"),
+)
+UPSTREAM_ERRORS = registry.counter(
+    "upstream_errors_total",
+    "Supabase and Stripe calls that raised.",
+    ("upstream", "operation"),
+)
+ROUND_TRIPS = registry.histogram(
+    "http_request_upstream_round_trips",
+    "Upstream round trips issued while handling one HTTP request.",
+    ("route", "upstream"),
+    buckets=DEFAULT_COUNT_BUCKETS,
+)
+
+UPSTREAMS = ("supabase", "stripe")
+
+_FILTER_METHODS = {
+    "eq", "neq", "gt", "gte", "lt", "lte", "is_", "in_", "like", "ilike",
+    "match", "contains", "contained_by", "filter", "or_",
+}
+_QUERY_METHODS = {"select", "insert", "update", "upsert", "delete"}
+
+
+@dataclass
+class Span:
+    """A single timed upstream call."""
+    upstream: str
+    operation: str
+    duration: float
+    shape: str = ""
+
+
+@dataclass
+class RequestStats:
+    """Upstream calls made while handling the current request."""
+    spans: List[Span] = field(default_factory=list)
+
+    def round_trips(self, upstream: str) -> int:
+        return sum(1 for span in self.spans if span.upstream == upstream)
+
+    def time_in(self, upstream: str) -> float:
+        return sum(span.duration for span in self.spans if span.upstream == upstream)
+
+    def repeated_shapes(self, threshold: int = 2) -> Dict[str, int]:
+        """Query shapes issued at least ``threshold`` times (likely N+1 patterns)."""
+        counts: Dict[str, int] = {}
+        for span in self.spans:
+            if span.upstream == "supabase":
+                counts[span.shape] = counts.get(span.shape, 0) + 1
+        return {shape: count for shape, count in counts.items() if count >= threshold}
+
+
+_current_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    """Stats for the request being handled, or None outside a request."""
+    return _current_stats.get()
+
+
+@contextmanager
+def collect_stats():
+    """Record upstream calls made inside the block into a fresh ``RequestStats``."""
+    stats = RequestStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def span(upstream: str, operation: str, shape: str = ""):
+    """Time an upstream call and attribute it to the current request.
+    
+    The call first takes a slot from the upstream's concurrency limiter and
+    may be shed with ``UpstreamOverloaded``; time spent queueing is not counted.
+    """
+    limiter = get_upstream_limiter(upstream)
+    if limiter is not None:
+        limiter.acquire()
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_ERRORS.inc(upstream, operation)
+        raise
+    finally:
+        if limiter is not None:
+            limiter.release()
+        duration = time.perf_counter() - started
+        UPSTREAM_DURATION.observe(duration, upstream, operation)
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.spans.append(Span(upstream, operation, duration, shape or operation))
+
+
+def traced(upstream: str, operation: Optional[str] = None) -> Callable:
+    """Decorator timing each call of the wrapped function as one upstream span."""
+    def decorator(func: Callable) -> Callable:
+        name = operation or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(upstream, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _TracedQuery:
+    """Proxy around a postgrest request builder that times ``execute()``."""
+
+    __slots__ = ("_builder", "_table", "_method", "_filters")
+
+    def __init__(self, builder: Any, table: str, method: str = "select", filters: Tuple[str, ...] = ()):
+        self._builder = builder
+        self._table = table
+        self._method = method
+        self._filters = filters
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            # Builder-returning properties such as ``not_`` stay traced
+            if hasattr(attr, "execute"):
+                return _TracedQuery(attr, self._table, self._method, self._filters)
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            method = name if name in _QUERY_METHODS else self._method
+            filters = self._filters
+            if name in _FILTER_METHODS:
+                column = args[0] if args and isinstance(args[0], str) else ""
+                filters = filters + (f"{column}:{name.rstrip('_')}",)
+            return _TracedQuery(result, self._table, method, filters)
+        return call
+
+    @property
+    def operation(self) -> str:
+        return f"{self._table}.{self._method}"
+
+    @property
+    def shape(self) -> str:
+        """Query identity without values, e.g. ``products.select[id:eq,published:eq]``."""
+        return f"{self.operation}[{','.join(sorted(self._filters))}]"
+
+    def execute(self):
+        with span("supabase", self.operation, self.shape):
+            return self._builder.execute()
+
+
+class InstrumentedClient:
+    """Supabase client proxy whose table and RPC queries are traced.
+
+    Queries through a read-replica client are labelled ``<table>@replica``.
+    """
+
+    def __init__(self, client: Any, replica: bool = False):
+        self._client = client
+        self._suffix = "@replica" if replica else ""
+
+    def table(self, table_name: str) -> _TracedQuery:
+        return _TracedQuery(self._client.table(table_name), table_name + self._suffix)
+
+    def from_(self, table_name: str) -> _TracedQuery:
+        return _TracedQuery(self._client.from_(table_name), table_name + self._suffix)
+
+    def rpc(self, fn: str, params: Dict[Any, Any]) -> _TracedQuery:
+        return _TracedQuery(self._client.rpc(fn, params), f"rpc.{fn}{self._suffix}", "call")
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+
+def _server_timing(stats: RequestStats, total: float) -> str:
+    entries = []
+    for upstream in UPSTREAMS:
+        calls = stats.round_trips(upstream)
+        if calls:
+            entries.append(f'{upstream};dur={stats.time_in(upstream) * 1000:.1f};desc="{calls} calls"')
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+async def instrument_request(request: Request, call_next):
+    """HTTP middleware recording request latency and upstream round trips."""
+    stats = RequestStats()
+    token = _current_stats.set(stats)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        total = time.perf_counter() - started
+        _current_stats.reset(token)
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        REQUEST_DURATION.observe(total, request.method, route_path, str(status))
+        for upstream in UPSTREAMS:
+            ROUND_TRIPS.observe(stats.round_trips(upstream), route_path, upstream)
+
+    if settings.server_timing_enabled:
+        response.headers["Server-Timing"] = _server_timing(stats, total)
+    return response
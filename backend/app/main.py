@@ -1,29 +1,116 @@
 """FastAPI application main file."""
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.config import settings
-from app.api import products, checkout, orders, webhooks
+from app.api import products, cart, checkout, orders, webhooks, analytics, images
+from app.change_feed import PostgresChangeListener
+from app.instrumentation import instrument_request
+from app.metrics import CONTENT_TYPE, registry
+from app.query_budget import enforce_query_budget
+from app.rate_limit import enforce_rate_limits
+from app.services.archive_service import Archiver
+from app.services.image_service import shutdown_resize_pool
+from app.services.inventory_service import InventoryReaper
+from app.warmup import run_warmup, state as warmup_state
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background workers and the warm-up; stop them on shutdown."""
+    # Cross-worker cache invalidation via Postgres LISTEN/NOTIFY
+    change_listener = PostgresChangeListener(settings.change_feed_database_url) if settings.change_feed_database_url else None
+    # Frees inventory held by checkouts that were abandoned without an expiry webhook
+    inventory_reaper = InventoryReaper(settings.inventory_reaper_interval_seconds) if settings.inventory_reaper_interval_seconds > 0 else None
+    # Moves closed orders, old Stripe events and deleted products to the archive tables
+    archiver = Archiver(settings.archive_interval_seconds, settings.archive_batch_size) if settings.archive_interval_seconds > 0 else None
+    
+    if change_listener:
+        change_listener.start()
+    if inventory_reaper:
+        inventory_reaper.start()
+    if archiver:
+        archiver.start()
+    # Serve (and answer liveness probes) while warming; readiness flips when done
+    warmup_task = asyncio.create_task(run_warmup())
+    
+    yield
+    
+    warmup_task.cancel()
+    if change_listener:
+        change_listener.stop()
+    if inventory_reaper:
+        inventory_reaper.stop()
+    if archiver:
+        archiver.stop()
+    shutdown_resize_pool()
+
+
+class _SettingsCORSMiddleware(CORSMiddleware):
+    """CORS for the configured frontend; settings are read when the middleware stack is built, not at import."""
+
+    def __init__(self, app, **options):
+        super().__init__(app, allow_origins=[settings.frontend_url, "http://localhost:3000", "http://localhost:5173"], **options)
+
+
+app = FastAPI(title="Ecommerce Demo API", version="1.0.0", lifespan=lifespan)
 
-app = FastAPI(title="Ecommerce Demo API", version="1.0.0")
+# Round-trip budgets (dev/test, QUERY_BUDGET_MODE); registered first so it runs inside instrument_request
+app.middleware("http")(enforce_query_budget)
 
-# CORS middleware
+# Per-client rate limits (429) for routes that spend Stripe quota
+app.middleware("http")(enforce_rate_limits)
+
+# Request timing and upstream round-trip accounting
+app.middleware("http")(instrument_request)
+
+# CORS middleware (added last so it is outermost and 429/503 responses carry CORS headers)
 app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[settings.frontend_url, "http://localhost:3000", "http://localhost:5173"],
+    _SettingsCORSMiddleware,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
 # Include routers
 app.include_router(products.router)
+app.include_router(cart.router)
 app.include_router(checkout.router)
 app.include_router(orders.router)
 app.include_router(webhooks.router)
+app.include_router(analytics.router)
+app.include_router(images.router)
 
 
 @app.get("/")
 def root():
     """Root endpoint."""
     return {"message": "Ecommerce Demo API"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/health/live", include_in_schema=False)
+def liveness():
+    """Liveness probe: the process is serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready", include_in_schema=False)
+def readiness():
+    """Readiness probe: 503 until clients and caches are warm."""
+    if not warmup_state.ready:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "warming", "pending": warmup_state.pending, "last_error": warmup_state.last_error},
+        )
+    return {"status": "ready", "warmup_seconds": round(warmup_state.ready_after, 3)}
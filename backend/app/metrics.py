@@ -0,0 +1,138 @@
+"""Minimal Prometheus-style metrics registry (text exposition format 0.0.4)."""
+import bisect
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+DEFAULT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Sequence[str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(label) for label in labels)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed upper bounds."""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (per-bucket counts incl. +Inf, sum, count)
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, *labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    """Holds metrics in registration order and renders them for scraping."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
@@ -0,0 +1,110 @@
+"""Development-mode N+1 detection and per-endpoint round-trip budgets.
+
+Endpoints declare how many upstream round trips they may issue::
+
+    @router.get("/{order_id}")
+    @round_trip_budget(supabase=1)
+    def get_order(...):
+
+With ``QUERY_BUDGET_MODE=warn`` every request logs repeated same-shape
+queries and budget overruns and reports its query counts in ``X-Query-*``
+headers. With ``QUERY_BUDGET_MODE=raise`` an overrun turns the response into
+a 500, so test and benchmark runs fail instead of silently regressing.
+"""
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+from app.instrumentation import UPSTREAMS, RequestStats, collect_stats, current_stats
+
+logger = logging.getLogger(__name__)
+
+BUDGET_ATTRIBUTE = "__round_trip_budget__"
+
+
+class RoundTripBudgetExceeded(AssertionError):
+    """Raised when code issues more upstream round trips than it declared."""
+
+
+def _budget(supabase: Optional[int], stripe: Optional[int]) -> Dict[str, int]:
+    return {name: limit for name, limit in (("supabase", supabase), ("stripe", stripe)) if limit is not None}
+
+
+def round_trip_budget(supabase: Optional[int] = None, stripe: Optional[int] = None) -> Callable:
+    """Declare the maximum Supabase/Stripe round trips an endpoint may issue."""
+    budget = _budget(supabase, stripe)
+
+    def decorator(func: Callable) -> Callable:
+        setattr(func, BUDGET_ATTRIBUTE, budget)
+        return func
+    return decorator
+
+
+@dataclass
+class BudgetReport:
+    """Outcome of checking one request's upstream calls."""
+    counts: Dict[str, int]
+    repeated: Dict[str, int]
+    violations: List[str]
+
+
+def evaluate(stats: RequestStats, budget: Optional[Dict[str, int]], repeat_threshold: int = 2) -> BudgetReport:
+    """Compare recorded calls against a budget and find repeated query shapes."""
+    counts = {upstream: stats.round_trips(upstream) for upstream in UPSTREAMS}
+    violations = [
+        f"{upstream}: {counts[upstream]} round trips > budget {limit}"
+        for upstream, limit in (budget or {}).items()
+        if counts.get(upstream, 0) > limit
+    ]
+    return BudgetReport(counts, stats.repeated_shapes(repeat_threshold), violations)
+
+
+@contextmanager
+def expect_round_trips(supabase: Optional[int] = None, stripe: Optional[int] = None):
+    """Fail with ``RoundTripBudgetExceeded`` if the block exceeds the given budget.
+
+    For exercising service functions directly, outside an HTTP request.
+    """
+    with collect_stats() as stats:
+        yield stats
+    report = evaluate(stats, _budget(supabase, stripe), settings.query_repeat_threshold)
+    if report.violations:
+        raise RoundTripBudgetExceeded("; ".join(report.violations))
+
+
+async def enforce_query_budget(request: Request, call_next):
+    """HTTP middleware applying budgets; must run inside ``instrument_request``."""
+    if settings.query_budget_mode == "off":
+        return await call_next(request)
+    response = await call_next(request)
+    stats = current_stats()
+    route = request.scope.get("route")
+    if stats is None or route is None:
+        return response
+
+    budget = getattr(route.endpoint, BUDGET_ATTRIBUTE, None)
+    report = evaluate(stats, budget, settings.query_repeat_threshold)
+    label = f"{request.method} {route.path}"
+
+    for shape, count in report.repeated.items():
+        logger.warning(f"{label}: query {shape} issued {count} times (possible N+1)")
+    if budget is None:
+        logger.info(f"{label}: no round-trip budget declared")
+    for violation in report.violations:
+        logger.warning(f"{label}: round-trip budget exceeded ({violation})")
+
+    if report.violations and settings.query_budget_mode == "raise":
+        response = JSONResponse(
+            status_code=500,
+            content={"detail": f"Round-trip budget exceeded for {label}: {'; '.join(report.violations)}"},
+        )
+
+    response.headers["X-Query-Count"] = ", ".join(f"{name}={count}" for name, count in report.counts.items())
+    if report.repeated:
+        response.headers["X-Query-Repeats"] = ", ".join(f"{shape}x{count}" for shape, count in report.repeated.items())
+    return response
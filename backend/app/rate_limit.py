@@ -0,0 +1,221 @@
+"""Admission control: per-client rate limits and per-upstream concurrency limits.
+
+Routes that spend Stripe quota declare a named rate-limit policy with
+``@rate_limit("checkout")``; ``enforce_rate_limits`` gives every client (IP)
+a token bucket per policy and answers 429 with ``Retry-After`` once it is
+empty.
+
+Independently, every Supabase and Stripe call passes through an
+``UpstreamLimiter`` (see ``instrumentation.span``) that caps concurrent calls
+per upstream. Callers queue for a slot for at most
+``upstream_queue_timeout_seconds``, and a call arriving when
+``upstream_max_waiting`` callers are already queued is shed at once, as a 503
+with ``Retry-After``, so latency stays bounded when an upstream slows down.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from starlette.routing import Match
+
+from app.config import settings
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+POLICY_ATTRIBUTE = "__rate_limit_policy__"
+
+RATE_LIMITED = registry.counter(
+    "rate_limited_total",
+    "Requests rejected with 429 by a per-client rate limit.",
+    ("policy",),
+)
+SHED = registry.counter(
+    "upstream_shed_total",
+    "Upstream calls rejected because the upstream's concurrency limit was saturated.",
+    ("upstream", "reason"),
+)
+
+
+def _policies() -> Dict[str, Tuple[float, int]]:
+    """Policy name -> (tokens per minute, burst size); 0 per minute disables the policy."""
+    return {
+        "checkout": (settings.checkout_rate_limit_per_minute, settings.checkout_rate_limit_burst),
+        "stripe_sync": (settings.stripe_sync_rate_limit_per_minute, settings.stripe_sync_rate_limit_burst),
+    }
+
+
+def rate_limit(policy: str) -> Callable:
+    """Apply the named per-client rate-limit policy to an endpoint."""
+    def decorator(func: Callable) -> Callable:
+        setattr(func, POLICY_ATTRIBUTE, policy)
+        return func
+    return decorator
+
+
+class TokenBucket:
+    """Refills ``rate`` tokens per second up to ``burst``."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token; returns 0 on success, else seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets per client, keeping at most ``max_clients`` (least recently seen dropped)."""
+
+    def __init__(self, per_minute: float, burst: int, max_clients: int = 10000):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client: str) -> float:
+        """0 if ``client`` may proceed, else the number of seconds to wait."""
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+            return bucket.take()
+
+
+class UpstreamOverloaded(HTTPException):
+    """An upstream's concurrency limit is saturated; the request is shed with 503."""
+
+    def __init__(self, upstream: str, retry_after: int):
+        super().__init__(
+            status_code=503,
+            detail=f"{upstream} is overloaded, please retry",
+            headers={"Retry-After": str(retry_after)},
+        )
+        self.upstream = upstream
+
+
+class UpstreamLimiter:
+    """Caps concurrent calls to one upstream, with a bounded wait queue."""
+
+    def __init__(self, upstream: str, max_concurrent: int, queue_timeout: float, max_waiting: int):
+        self.upstream = upstream
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.max_waiting = max_waiting
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a slot or raise ``UpstreamOverloaded``."""
+        if self._slots.acquire(blocking=False):
+            return
+        with self._lock:
+            if self._waiting >= self.max_waiting:
+                SHED.inc(self.upstream, "queue_full")
+                raise UpstreamOverloaded(self.upstream, self.retry_after)
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            SHED.inc(self.upstream, "timeout")
+            raise UpstreamOverloaded(self.upstream, self.retry_after)
+
+    def release(self):
+        self._slots.release()
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_timeout))
+
+
+_rate_limiters: Dict[str, Optional[RateLimiter]] = {}
+_upstream_limiters: Dict[str, Optional[UpstreamLimiter]] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(policy: str) -> Optional[RateLimiter]:
+    """The limiter for ``policy``, or None when the policy is disabled."""
+    with _limiters_lock:
+        if policy not in _rate_limiters:
+            per_minute, burst = _policies()[policy]
+            _rate_limiters[policy] = RateLimiter(per_minute, max(1, burst)) if per_minute > 0 else None
+        return _rate_limiters[policy]
+
+
+def get_upstream_limiter(upstream: str) -> Optional[UpstreamLimiter]:
+    """The limiter for ``upstream``, or None when its concurrency is unlimited."""
+    limiter = _upstream_limiters.get(upstream, False)
+    if limiter is not False:
+        return limiter
+    with _limiters_lock:
+        if upstream not in _upstream_limiters:
+            max_concurrent = {
+                "supabase": settings.supabase_max_concurrency,
+                "stripe": settings.stripe_max_concurrency,
+            }.get(upstream, 0)
+            _upstream_limiters[upstream] = UpstreamLimiter(
+                upstream,
+                max_concurrent,
+                settings.upstream_queue_timeout_seconds,
+                settings.upstream_max_waiting,
+            ) if max_concurrent > 0 else None
+        return _upstream_limiters[upstream]
+
+
+def client_id(request: Request) -> str:
+    """Rate-limit key: the client IP (first X-Forwarded-For hop when behind a trusted proxy)."""
+    if settings.trust_forwarded_for:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _route_policy(request: Request) -> Optional[str]:
+    # Routing happens inside call_next, so match the route here
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(getattr(route, "endpoint", None), POLICY_ATTRIBUTE, None)
+    return None
+
+
+async def enforce_rate_limits(request: Request, call_next):
+    """HTTP middleware rejecting clients that exceed their route's rate-limit policy."""
+    policy = _route_policy(request)
+    limiter = get_rate_limiter(policy) if policy is not None else None
+    if limiter is not None:
+        wait = limiter.take(client_id(request))
+        if wait > 0:
+            RATE_LIMITED.inc(policy)
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests, please retry later"},
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+    return await call_next(request)
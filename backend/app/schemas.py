@@ -1,5 +1,5 @@
 """Pydantic schemas for request/response validation."""
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional
 from pydantic import BaseModel, Field
 
@@ -19,7 +19,7 @@ class ProductBase(BaseModel):
 
 class ProductCreate(ProductBase):
     """Schema for creating a product."""
-    pass
+    stock_quantity: Optional[int] = Field(None, ge=0)  # Set to track inventory; omit for unlimited stock
 
 
 class ProductUpdate(BaseModel):
@@ -32,6 +32,7 @@ class ProductUpdate(BaseModel):
     currency: Optional[str] = Field(None, max_length=3)
     current_price_amount: Optional[int] = Field(None, gt=0)
     published: Optional[bool] = None
+    stock_quantity: Optional[int] = Field(None, ge=0)  # New stock, open checkout holds included; null stops tracking inventory
 
 
 class ProductResponse(ProductBase):
@@ -41,6 +42,7 @@ class ProductResponse(ProductBase):
     active_stripe_price_id: Optional[str] = None
     last_sync_status: Optional[str] = None
     last_sync_at: Optional[datetime] = None
+    track_inventory: bool = False
     created_at: datetime
     updated_at: datetime
     formatted_price: Optional[str] = None  # Added for display convenience
@@ -60,6 +62,26 @@ class ProductPublic(ProductBase):
         from_attributes = True
 
 
+class CategoryFacet(BaseModel):
+    """Number of storefront products in a category."""
+    name: str
+    count: int
+
+
+class PriceRangeFacet(BaseModel):
+    """Number of storefront products priced in [min_amount, max_amount)."""
+    min_amount: int  # in minor units
+    max_amount: Optional[int] = None  # None for the open-ended top range
+    count: int
+
+
+class ProductFacetsResponse(BaseModel):
+    """Schema for storefront filter facets."""
+    categories: List[CategoryFacet]
+    price_ranges: List[PriceRangeFacet]
+    total: int
+
+
 # Checkout Schemas
 class CheckoutItem(BaseModel):
     """Schema for checkout item."""
@@ -74,6 +96,34 @@ class CheckoutSessionRequest(BaseModel):
     cancel_url: str
 
 
+class CartQuoteRequest(BaseModel):
+    """Schema for pricing a cart."""
+    items: List[CheckoutItem] = Field(..., min_items=1)
+
+
+class CartQuoteLine(BaseModel):
+    """One priced cart line."""
+    product_id: int
+    quantity: int
+    title: Optional[str] = None
+    unit_amount: Optional[int] = None  # current price in minor units; None if unavailable
+    formatted_unit_price: Optional[str] = None
+    line_total: int = 0
+    available: bool  # can be checked out as-is
+    stock_available: Optional[int] = None  # None when stock is not tracked
+    problem: Optional[str] = None
+
+
+class CartQuoteResponse(BaseModel):
+    """Schema for cart quote response."""
+    lines: List[CartQuoteLine]
+    currency: str
+    subtotal: int  # in minor units, over available lines
+    formatted_subtotal: str
+    item_count: int
+    checkout_ready: bool  # every line is available
+
+
 class CheckoutSessionResponse(BaseModel):
     """Schema for checkout session response."""
     checkout_url: str
@@ -103,3 +153,32 @@ class OrderResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+# Analytics Schemas
+class SalesRollupRow(BaseModel):
+    """One day of sales for a product or category."""
+    day: date
+    product_id: Optional[int] = None
+    category: Optional[str] = None  # None for uncategorized products
+    currency: str
+    units: int
+    gross_amount: int  # in minor units
+    orders: int
+
+
+class SalesDailyTotal(BaseModel):
+    """All sales on one day."""
+    day: date
+    currency: str
+    units: int
+    gross_amount: int
+
+
+class SalesAnalyticsResponse(BaseModel):
+    """Schema for sales analytics response."""
+    start: date
+    end: date
+    group_by: str
+    rows: List[SalesRollupRow]
+    totals: List[SalesDailyTotal]
@@ -0,0 +1,66 @@
+"""Sales analytics served from incrementally maintained daily rollups.
+
+``record_order_sales`` adds a paid order to ``sales_daily_product`` and
+``sales_daily_category`` exactly once, so reports read O(days) rollup rows
+instead of scanning orders and order items.
+"""
+from datetime import date
+from typing import Any, Dict, List
+
+from supabase import Client
+
+ROLLUP_TABLES = {
+    "product": "sales_daily_product",
+    "category": "sales_daily_category",
+}
+ROLLUP_KEYS = {"product": "product_id", "category": "category"}
+
+# Rows per request; must not exceed PostgREST's max_rows (1000 on Supabase),
+# or a capped page would look like the last one
+ROLLUP_PAGE_SIZE = 1000
+MAX_ROLLUP_PAGES = 25
+
+
+class RollupTooLarge(ValueError):
+    """A report would need more than ``MAX_ROLLUP_PAGES`` pages of rollup rows."""
+
+
+def record_order_sales(supabase: Client, order_id: int) -> List[Dict[str, Any]]:
+    """Count a paid order in the rollups; returns no rows if it was already counted."""
+    result = supabase.rpc("record_order_sales", {"p_order_id": order_id}).execute()
+    return result.data or []
+
+
+def get_sales_rollup(supabase: Client, group_by: str, start: date, end: date) -> List[Dict[str, Any]]:
+    """Rollup rows for ``start``..``end`` (inclusive), grouped by 'product' or 'category'.
+
+    Reads ``ROLLUP_PAGE_SIZE`` rows at a time until a short page, so PostgREST's
+    row cap never truncates a report; raises ``RollupTooLarge`` past ``MAX_ROLLUP_PAGES``.
+    """
+    rows: List[Dict[str, Any]] = []
+    for page in range(MAX_ROLLUP_PAGES):
+        result = (
+            supabase.table(ROLLUP_TABLES[group_by])
+            .select("*")
+            .gte("day", start.isoformat())
+            .lte("day", end.isoformat())
+            .order(f"day,{ROLLUP_KEYS[group_by]},currency")  # The primary key, so pages never overlap
+            .limit(ROLLUP_PAGE_SIZE)
+            .offset(page * ROLLUP_PAGE_SIZE)
+            .execute()
+        )
+        rows += result.data or []
+        if len(result.data or []) < ROLLUP_PAGE_SIZE:
+            return rows
+    raise RollupTooLarge(f"More than {MAX_ROLLUP_PAGES * ROLLUP_PAGE_SIZE} rollup rows")
+
+
+def daily_totals(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sum rollup rows into one row per day and currency."""
+    totals: Dict[tuple, Dict[str, Any]] = {}
+    for row in rows:
+        key = (row["day"], row["currency"])
+        total = totals.setdefault(key, {"day": row["day"], "currency": row["currency"], "units": 0, "gross_amount": 0})
+        total["units"] += row["units"]
+        total["gross_amount"] += row["gross_amount"]
+    return [totals[key] for key in sorted(totals)]
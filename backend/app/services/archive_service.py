@@ -0,0 +1,93 @@
+"""Move cold rows out of the hot tables.
+
+Closed orders (with their items), processed Stripe events and soft-deleted
+products are moved in batches into ``*_archive`` tables by SQL functions in
+``supabase_schema.sql``, once they are older than their retention setting.
+The hot tables and their indexes then only hold rows the request paths still
+read. Order lookups fall back to the archive (see ``order_service``).
+"""
+import logging
+import threading
+from typing import Dict, Optional
+
+from supabase import Client
+
+from app.config import settings
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED = registry.counter(
+    "archived_rows_total",
+    "Rows moved from hot tables to their archive tables.",
+    ("table",),
+)
+
+# Source table -> (SQL function, setting holding its age threshold in days).
+# Orders go before products: a product is archived only once no hot order item refers to it.
+ARCHIVE_FUNCTIONS = {
+    "orders": ("archive_closed_orders", "order_archive_after_days"),
+    "stripe_events": ("archive_processed_stripe_events", "stripe_event_retention_days"),
+    "products": ("archive_deleted_products", "product_archive_after_days"),
+}
+
+
+def archive_batch(supabase: Client, table: str, limit: int = 500) -> int:
+    """Archive up to ``limit`` eligible rows of ``table``; returns how many were moved."""
+    function, days_setting = ARCHIVE_FUNCTIONS[table]
+    result = supabase.rpc(function, {
+        "p_older_than_days": getattr(settings, days_setting),
+        "p_limit": limit,
+    }).execute()
+    archived = len(result.data or [])
+    if archived:
+        ARCHIVED.inc(table, amount=archived)
+    return archived
+
+
+class Archiver:
+    """Background thread draining eligible rows into the archive tables, a batch at a time."""
+
+    def __init__(self, interval: float, batch_size: int = 500):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="archiver", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self) -> Dict[str, int]:
+        from app.database import get_supabase
+
+        supabase = get_supabase()
+        totals = {}
+        for table in ARCHIVE_FUNCTIONS:
+            total = 0
+            # Short transactions: each batch commits before the next one is taken
+            while not self._stop.is_set():
+                archived = archive_batch(supabase, table, self.batch_size)
+                total += archived
+                if archived < self.batch_size:
+                    break
+            totals[table] = total
+        if any(totals.values()):
+            logger.info("Archived " + ", ".join(f"{count} {table}" for table, count in totals.items() if count))
+        return totals
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Archiver failed: {e}")
@@ -0,0 +1,94 @@
+"""Bounded in-process LRU cache with per-entry TTL.
+
+Entries are invalidated explicitly (usually from the change feed) and expire
+after ``ttl`` seconds as a backstop for missed events. A read that misses
+takes a ``generation`` token before querying and passes it to ``set``; if the
+key was invalidated in the meantime the (possibly stale) result is not stored.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple, Union
+
+from app.metrics import registry
+
+LOOKUPS = registry.counter(
+    "cache_lookups_total",
+    "In-process cache lookups.",
+    ("cache", "result"),
+)
+
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache; ``get`` returns ``MISSING`` on a miss (None is a valid value).
+
+    ``max_entries`` and ``ttl`` may be callables, read when needed, so a
+    module-level cache can be sized from settings without reading them at import.
+    """
+
+    def __init__(self, name: str, max_entries: Union[int, Callable[[], int]], ttl: Union[float, Callable[[], float]]):
+        self.name = name
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries() if callable(self._max_entries) else self._max_entries
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl() if callable(self._ttl) else self._ttl
+
+    @property
+    def generation(self) -> int:
+        """Token to pass to ``set`` for a value read after this call."""
+        return self._generation
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                LOOKUPS.inc(self.name, "hit")
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+        LOOKUPS.inc(self.name, "miss")
+        return MISSING
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Cached values for ``keys``; misses are left out."""
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not MISSING:
+                found[key] = value
+        return found
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            max_entries = self.max_entries
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
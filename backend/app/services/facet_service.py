@@ -0,0 +1,132 @@
+"""Precomputed storefront facets: product counts per category and price range.
+
+The index holds one small entry per published, non-deleted product and is
+built with a single query on first use. After that it is kept current from
+the change feed, so ``GET /products/categories`` does not touch the database.
+Events without a row (oversized notifications, RESYNC) drop the index and the
+next request rebuilds it; ``facet_index_max_age_seconds`` bounds how long an
+index can live, as a safety net for missed events.
+"""
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from supabase import Client
+
+from app.change_feed import RESYNC, ChangeEvent, ChangeFeed, feed
+from app.config import settings
+
+# Upper bounds (exclusive, minor units) of the price-range buckets; the last is open-ended
+PRICE_BUCKET_BOUNDS = [1000, 2500, 5000, 10000, 25000]
+
+
+def price_bucket(amount: int) -> int:
+    """Index of the price-range bucket containing ``amount``."""
+    for index, bound in enumerate(PRICE_BUCKET_BOUNDS):
+        if amount < bound:
+            return index
+    return len(PRICE_BUCKET_BOUNDS)
+
+
+def _facet_entry(product: Dict[str, Any]) -> Optional[Tuple[Optional[str], int]]:
+    """(category, price bucket) for a storefront-visible product, else None."""
+    if not product.get("published") or product.get("deleted_at"):
+        return None
+    return product.get("category"), price_bucket(product["current_price_amount"])
+
+
+class FacetIndex:
+    """Category and price-range counts, maintained incrementally."""
+
+    def __init__(self, change_feed: ChangeFeed = feed):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._entries: Dict[int, Tuple[Optional[str], int]] = {}
+        self._categories: Counter = Counter()
+        self._buckets: Counter = Counter()
+        self._loaded_at: Optional[float] = None
+        # Bumped on invalidation so a build racing with it is discarded
+        self._generation = 0
+        # Changes that arrive while a build query is in flight, replayed on top of it
+        self._pending: Optional[List[ChangeEvent]] = None
+        change_feed.subscribe("products", self._on_change)
+
+    def snapshot(self, supabase: Client) -> Dict[str, Any]:
+        """Current facets, building the index first if needed."""
+        if not self._fresh():
+            # One build at a time; requests queued behind it reuse its result
+            with self._build_lock:
+                if not self._fresh():
+                    self._build(supabase)
+        with self._lock:
+            return {
+                "categories": sorted((name, count) for name, count in self._categories.items() if name and count),
+                "price_buckets": [self._buckets.get(index, 0) for index in range(len(PRICE_BUCKET_BOUNDS) + 1)],
+                "total": len(self._entries),
+            }
+
+    def _fresh(self) -> bool:
+        with self._lock:
+            return self._loaded_at is not None and time.monotonic() - self._loaded_at < settings.facet_index_max_age_seconds
+
+    def invalidate(self):
+        with self._lock:
+            self._reset()
+
+    def _build(self, supabase: Client):
+        with self._lock:
+            generation = self._generation
+            self._pending = []
+        result = (
+            supabase.table("products")
+            .select("id, category, current_price_amount, published, deleted_at")
+            .eq("published", True)
+            .is_("deleted_at", "null")
+            .execute()
+        )
+        with self._lock:
+            if generation != self._generation:
+                return  # Invalidated mid-build; serve what we have, rebuild next time
+            pending, self._pending = self._pending or [], None
+            self._entries.clear()
+            self._categories.clear()
+            self._buckets.clear()
+            for product in result.data or []:
+                self._set(product["id"], _facet_entry(product))
+            for event in pending:
+                self._apply(event)
+            if self._generation == generation:
+                self._loaded_at = time.monotonic()
+
+    def _on_change(self, event: ChangeEvent):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(event)
+            elif self._loaded_at is not None:
+                self._apply(event)
+
+    def _apply(self, event: ChangeEvent):
+        # Caller holds the lock
+        if event.op == RESYNC or (event.record is None and event.op != "DELETE"):
+            self._reset()
+        elif event.id is not None:
+            self._set(event.id, None if event.op == "DELETE" else _facet_entry(event.record))
+
+    def _set(self, product_id: int, entry: Optional[Tuple[Optional[str], int]]):
+        previous = self._entries.pop(product_id, None)
+        if previous is not None:
+            self._categories[previous[0]] -= 1
+            self._buckets[previous[1]] -= 1
+        if entry is not None:
+            self._entries[product_id] = entry
+            self._categories[entry[0]] += 1
+            self._buckets[entry[1]] += 1
+
+    def _reset(self):
+        self._generation += 1
+        self._loaded_at = None
+        self._pending = None
+
+
+facet_index = FacetIndex()
@@ -0,0 +1,373 @@
+"""Image proxy: product images served from a local disk cache, with resized variants.
+
+``GET /images/{signature}?url=...&v=...&w=...`` (``app.api.images``) serves a product
+image from this worker's disk cache, fetching the original from its origin on
+the first request. With ``w`` it serves a WebP copy scaled down to that width,
+generated once in a process pool. Files are content-addressed and never
+change, so responses can be cached by browsers and CDNs for a year.
+
+URLs are signed with an HMAC so the endpoint only fetches URLs this backend
+handed out (see ``proxy_image_url``) and cannot be used as an open proxy.
+"""
+import hashlib
+import hmac
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Set, Tuple, Union
+from urllib.parse import urlencode
+
+import httpx
+
+from app.config import settings
+from app.instrumentation import traced
+from app.metrics import registry
+from app.services.cache import LOOKUPS
+from app.services.singleflight import coalesce
+
+# Widths a variant may be requested at; a fixed set bounds how many files one image can produce
+IMAGE_WIDTHS = (160, 320, 640, 1280)
+# Originals are served as fetched; anything else (notably SVG, which can carry script) is refused
+SOURCE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+VARIANT_TYPE = "image/webp"
+VARIANT_QUALITY = 80
+
+EVICTED = registry.counter(
+    "image_cache_evicted_bytes_total",
+    "Bytes of cached images evicted to stay under image_cache_max_bytes.",
+)
+
+
+class ImageFetchError(Exception):
+    """The origin did not return a usable image (or one Pillow can decode)."""
+
+
+@dataclass(frozen=True)
+class CachedImage:
+    """An image file in the disk cache; ``digest`` (sha256 of the bytes) doubles as its ETag."""
+    digest: str
+    path: str
+    content_type: str
+    size: int
+
+
+def _secret() -> bytes:
+    if settings.image_proxy_secret:
+        return settings.image_proxy_secret.encode()
+    return hashlib.sha256(b"image-proxy:" + settings.supabase_key.encode()).digest()
+
+
+def sign_image_url(url: str, version: Optional[str] = None) -> str:
+    message = url if version is None else f"{url}\n{version}"
+    return hmac.new(_secret(), message.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def verify_image_url(url: str, signature: str, version: Optional[str] = None) -> bool:
+    return hmac.compare_digest(sign_image_url(url, version), signature)
+
+
+def proxy_image_url(url: str, width: Optional[int] = None, version: Optional[str] = None) -> str:
+    """Absolute URL of ``url`` (optionally resized to ``width``) on the image proxy.
+
+    ``version`` (the product's ``updated_at``) is signed and part of the cache
+    key, so an image replaced at the same source URL gets a new proxy URL once
+    its product is saved, while the old one stays cacheable forever.
+    """
+    query = {"url": url}
+    if version is not None:
+        query["v"] = version
+    if width is not None:
+        query["w"] = width
+    return f"{settings.public_api_url.rstrip('/')}/images/{sign_image_url(url, version)}?{urlencode(query)}"
+
+
+class ImageCache:
+    """Content-addressed image files on disk, kept under ``max_bytes`` by LRU eviction.
+
+    ``objects/<aa>/<digest>`` holds each distinct body once; ``refs/<key>``
+    maps a (source URL, width, version) key to an object and its content type.
+    Recency and size are tracked in memory, seeded from file modification
+    times when the cache is first used, so ``max_bytes`` bounds what this
+    worker adds: workers sharing a directory can fill it to about their
+    number times ``max_bytes``. Evicting an object also removes the refs to it that this
+    worker knows of; refs left dangling by other workers are treated as a
+    miss and swept the next time the cache is loaded. Like
+    ``TTLCache``, ``root`` and ``max_bytes`` may be callables read when needed.
+    """
+
+    def __init__(self, root: Union[str, Callable[[], str]], max_bytes: Union[int, Callable[[], int]]):
+        self._root = root
+        self._max_bytes = max_bytes
+        self._objects: "OrderedDict[str, int]" = OrderedDict()  # digest -> size, least recent first
+        self._refs: Dict[str, Set[str]] = defaultdict(set)  # digest -> ref keys pointing at it
+        self._total = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    @property
+    def root(self) -> str:
+        return self._root() if callable(self._root) else self._root
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes() if callable(self._max_bytes) else self._max_bytes
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _ref_path(self, key: str) -> str:
+        return os.path.join(self.root, "refs", key)
+
+    def _read_ref(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._ref_path(key)) as f:
+                ref = json.load(f)
+            return ref if "object" in ref and "content_type" in ref else None
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _remove_ref(self, key: str, digest: str):
+        """Delete ref ``key`` unless it has since been pointed at another object."""
+        ref = self._read_ref(key)
+        if ref is not None and ref["object"] != digest:
+            return
+        try:
+            os.remove(self._ref_path(key))
+        except FileNotFoundError:
+            pass
+
+    def _remove_object(self, digest: str):
+        """Drop an object and its refs from the index and the disk (caller holds the lock)."""
+        self._total -= self._objects.pop(digest)
+        for key in self._refs.pop(digest, ()):
+            self._remove_ref(key, digest)
+        try:
+            os.remove(self._object_path(digest))
+        except FileNotFoundError:
+            pass
+
+    def _load(self):
+        """Index the objects and refs already on disk, oldest first (caller holds the lock)."""
+        if self._loaded:
+            return
+        os.makedirs(os.path.join(self.root, "refs"), exist_ok=True)
+        found = []
+        for directory, _, files in os.walk(os.path.join(self.root, "objects")):
+            for name in files:
+                if name.startswith("."):
+                    continue  # An interrupted write
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime, name, stat.st_size))
+        for _, digest, size in sorted(found):
+            self._objects[digest] = size
+            self._total += size
+        for key in os.listdir(os.path.join(self.root, "refs")):
+            if key.startswith("."):
+                continue
+            ref = self._read_ref(key)
+            if ref is not None and ref["object"] in self._objects:
+                self._refs[ref["object"]].add(key)
+            else:
+                self._remove_ref(key, ref["object"] if ref else "")
+        self._loaded = True
+        self._evict()
+
+    def _evict(self):
+        # Never evicts the most recent object, even if it alone exceeds the bound
+        while self._total > self.max_bytes and len(self._objects) > 1:
+            digest = next(iter(self._objects))
+            EVICTED.inc(amount=self._objects[digest])
+            self._remove_object(digest)
+
+    def _write(self, path: str, data: bytes):
+        """Write ``data`` to ``path`` atomically, so readers never see a partial file."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, key: str) -> Optional[CachedImage]:
+        with self._lock:
+            self._load()
+        ref = self._read_ref(key)
+        if ref is None:
+            return None
+        path = self._object_path(ref["object"])
+        try:
+            size = os.path.getsize(path)
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another worker
+            self._remove_ref(key, ref["object"])
+            return None
+        with self._lock:
+            if ref["object"] not in self._objects:
+                self._total += size  # Written by another worker
+            self._objects[ref["object"]] = size
+            self._objects.move_to_end(ref["object"])
+            self._refs[ref["object"]].add(key)
+        return CachedImage(ref["object"], path, ref["content_type"], size)
+
+    def put(self, key: str, data: bytes, content_type: str) -> CachedImage:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        with self._lock:
+            self._load()
+        if not os.path.exists(path):
+            self._write(path, data)
+        self._write(self._ref_path(key), json.dumps({"object": digest, "content_type": content_type}).encode())
+        with self._lock:
+            if digest not in self._objects:
+                self._total += len(data)
+            self._objects[digest] = len(data)
+            self._objects.move_to_end(digest)
+            self._refs[digest].add(key)
+            self._evict()
+        return CachedImage(digest, path, content_type, len(data))
+
+    def discard(self, key: str):
+        """Forget ``key``; its object goes too unless another ref still points at it."""
+        ref = self._read_ref(key)
+        if ref is None:
+            return
+        with self._lock:
+            self._remove_ref(key, ref["object"])
+            keys = self._refs.get(ref["object"], set())
+            keys.discard(key)
+            if not keys and ref["object"] in self._objects:
+                self._remove_object(ref["object"])
+
+
+image_cache = ImageCache(lambda: settings.image_cache_dir, lambda: settings.image_cache_max_bytes)
+
+
+def _cache_key(url: str, width: Optional[int], version: Optional[str] = None) -> str:
+    return hashlib.sha256(f"{url}|{width or ''}|{version or ''}".encode()).hexdigest()
+
+
+@traced("image_origin", "fetch")
+def _fetch_original(url: str) -> Tuple[bytes, str]:
+    """Download ``url``, refusing non-image responses and bodies over ``image_max_source_bytes``."""
+    try:
+        with httpx.stream("GET", url, timeout=settings.image_fetch_timeout_seconds, follow_redirects=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type not in SOURCE_TYPES:
+                raise ImageFetchError(f"Unsupported content type {content_type or 'none'!r}")
+            body = bytearray()
+            for chunk in response.iter_bytes():
+                body += chunk
+                if len(body) > settings.image_max_source_bytes:
+                    raise ImageFetchError("Image too large")
+    except httpx.HTTPError as e:
+        raise ImageFetchError(str(e)) from e
+    return bytes(body), content_type
+
+
+def check_image(data: bytes):
+    """Raise ``ImageFetchError`` unless ``data`` decodes fully (runs in the resize pool)."""
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+    except Exception as e:
+        raise ImageFetchError(f"Undecodable image: {e}")
+
+
+def resize_image(data: bytes, width: int) -> bytes:
+    """Scale an image down (never up) to at most ``width`` pixels wide and encode it as WebP.
+
+    Runs in the resize process pool; Pillow is imported there, on first use.
+    Decoding failures are raised as ``ImageFetchError``.
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            image = ImageOps.exif_transpose(source)
+            image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+            if image.width > width:
+                image = image.resize((width, max(1, round(image.height * width / image.width))), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, "WEBP", quality=VARIANT_QUALITY, method=4)
+    except Exception as e:
+        raise ImageFetchError(f"Undecodable image: {e}")
+    return output.getvalue()
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _resize_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: forking a process with running threads can deadlock the child
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, settings.image_resize_workers),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_resize_pool():
+    """Stop the resize workers (called from the lifespan on shutdown)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+@coalesce(ignore=())
+def get_image(url: str, width: Optional[int] = None, version: Optional[str] = None) -> CachedImage:
+    """The cached image for ``url`` at ``version`` (resized to ``width``), fetching or generating it on a miss.
+
+    Concurrent requests for the same image share one fetch or resize.
+    """
+    key = _cache_key(url, width, version)
+    cached = image_cache.get(key)
+    LOOKUPS.inc("images", "hit" if cached else "miss")
+    if cached is not None:
+        return cached
+
+    if width is None:
+        data, content_type = _fetch_original(url)
+        # Served as-is, so make sure it is an image before caching it for a year
+        _resize_pool().submit(check_image, data).result()
+        return image_cache.put(key, data, content_type)
+
+    original = get_image(url, version=version)
+    try:
+        with open(original.path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        # Evicted by another worker between the lookup and the read
+        data, _ = _fetch_original(url)
+    try:
+        resized = _resize_pool().submit(resize_image, data, width).result()
+    except ImageFetchError:
+        # Never keep an original that cannot be decoded
+        image_cache.discard(_cache_key(url, None, version))
+        raise
+    return image_cache.put(key, resized, VARIANT_TYPE)
@@ -0,0 +1,164 @@
+"""Inventory reservations backed by sharded stock counters.
+
+A tracked product's (``products.track_inventory``) available stock is split
+across ``inventory_shards`` rows so concurrent checkouts of a hot product
+decrement different rows instead of serializing on one row lock. Checkout
+reserves the whole cart with a single ``reserve_inventory`` call; the hold is
+committed when Stripe reports payment and released when the session expires
+(webhook) or the hold runs out (``InventoryReaper``). The SQL functions live in
+``supabase_schema.sql``.
+"""
+import logging
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from postgrest.exceptions import APIError
+from supabase import Client
+
+from app.config import settings
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+INSUFFICIENT_STOCK = "insufficient_stock"
+DEADLOCK_DETECTED = "40P01"
+
+RESERVATIONS = registry.counter(
+    "inventory_reservations_total",
+    "Inventory reservation outcomes.",
+    ("outcome",),
+)
+
+
+class InsufficientStock(ValueError):
+    """A cart asked for more of a product than is available."""
+
+    def __init__(self, product_id: int):
+        super().__init__(f"Product {product_id} is out of stock")
+        self.product_id = product_id
+
+
+def new_reservation_id() -> str:
+    return uuid.uuid4().hex
+
+
+def tracked_items(items: Iterable[Any], products: Dict[int, Dict[str, Any]]) -> List[Dict[str, int]]:
+    """Cart lines (``CheckoutItem``-like) for products whose inventory is tracked."""
+    return [
+        {"product_id": item.product_id, "quantity": item.quantity}
+        for item in items
+        if products.get(item.product_id, {}).get("track_inventory")
+    ]
+
+
+def reserve_inventory(supabase: Client, reservation_id: str, items: List[Dict[str, int]], ttl_seconds: int) -> List[Dict[str, Any]]:
+    """Hold stock for every item in one call, all or nothing.
+    
+    Raises ``InsufficientStock`` naming the first product that cannot be covered.
+    """
+    if not items:
+        return []
+    params = {"p_reservation_id": reservation_id, "p_items": items, "p_ttl_seconds": ttl_seconds}
+    for attempt in range(2):
+        try:
+            result = supabase.rpc("reserve_inventory", params).execute()
+            RESERVATIONS.inc("reserved")
+            return result.data or []
+        except APIError as e:
+            message = e.message or ""
+            if message.startswith(INSUFFICIENT_STOCK):
+                RESERVATIONS.inc("insufficient")
+                raise InsufficientStock(int(message.split(":", 1)[1]))
+            # reserve_inventory waits for shards in a fixed order, but a release restocking
+            # several shards at once can still lock them in another; Postgres aborted this one
+            if e.code == DEADLOCK_DETECTED and attempt == 0:
+                logger.warning(f"Inventory reservation {reservation_id} deadlocked, retrying")
+                continue
+            raise
+
+
+def release_reservation(supabase: Client, reservation_id: str) -> List[Dict[str, Any]]:
+    """Return a checkout's held stock (no-op if already released or committed)."""
+    result = supabase.rpc("release_inventory", {"p_reservation_id": reservation_id}).execute()
+    if result.data:
+        RESERVATIONS.inc("released")
+    return result.data or []
+
+
+def commit_reservation(supabase: Client, reservation_id: str) -> List[Dict[str, Any]]:
+    """Mark a paid checkout's holds as sold."""
+    result = supabase.rpc("commit_inventory", {"p_reservation_id": reservation_id}).execute()
+    if result.data:
+        RESERVATIONS.inc("committed")
+    else:
+        # Paid after the hold was released (or redelivered); stock may be oversold
+        logger.warning(f"No open inventory hold to commit for reservation {reservation_id}")
+    return result.data or []
+
+
+def release_expired_reservations(supabase: Client, limit: int = 500) -> int:
+    """Release up to ``limit`` expired holds; returns how many rows were released."""
+    result = supabase.rpc("release_expired_inventory", {"p_limit": limit}).execute()
+    released = len(result.data or [])
+    if released:
+        RESERVATIONS.inc("expired", amount=released)
+    return released
+
+
+def set_product_stock(supabase: Client, product_id: int, quantity: Optional[int]) -> List[Dict[str, Any]]:
+    """Set a product's stock, counting units held by open checkouts (None stops tracking its inventory)."""
+    result = supabase.rpc("set_product_stock", {
+        "p_product_id": product_id,
+        "p_quantity": quantity,
+        "p_shards": settings.inventory_shard_count,
+    }).execute()
+    return result.data or []
+
+
+class InventoryReaper:
+    """Background thread releasing holds whose checkout was never completed.
+    
+    Stripe's ``checkout.session.expired`` webhook normally releases holds;
+    this catches missed or delayed deliveries.
+    """
+
+    def __init__(self, interval: float, batch_size: int = 500):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="inventory-reaper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self) -> int:
+        from app.database import get_supabase
+
+        supabase = get_supabase()
+        total = 0
+        while not self._stop.is_set():
+            released = release_expired_reservations(supabase, self.batch_size)
+            total += released
+            if released < self.batch_size:
+                break
+        if total:
+            logger.info(f"Released {total} expired inventory holds")
+        return total
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Inventory reaper failed: {e}")
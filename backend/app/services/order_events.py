@@ -0,0 +1,102 @@
+"""Wake order-status streams when an order changes.
+
+Order writes (checkout, the Stripe webhook) reach the change feed either
+directly from this worker or via LISTEN/NOTIFY from another one. The watcher
+turns those events into per-session wakeups for the SSE endpoint, so a waiting
+client costs no queries until its order actually changes.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Set
+
+from app.change_feed import ChangeEvent, ChangeFeed, feed
+
+
+class OrderWaiter:
+    """One stream's subscription; ``wait`` returns the latest changed order row."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._event = asyncio.Event()
+        self._record: Optional[Dict[str, Any]] = None
+
+    def _notify(self, record: Optional[Dict[str, Any]]):
+        # Called from whichever thread published the change
+        def deliver():
+            self._record = record
+            self._event.set()
+        try:
+            self._loop.call_soon_threadsafe(deliver)
+        except RuntimeError:
+            pass  # Event loop already closed; the stream is gone
+
+    async def wait(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Wait up to ``timeout`` seconds for a change.
+
+        Returns the changed row, ``{}`` when the order changed but the event
+        carried no row (re-read it), or None on timeout.
+        """
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._event.clear()
+        record, self._record = self._record, None
+        return record or {}
+
+
+class OrderStatusWatcher:
+    """Routes ``orders`` change events to waiters by checkout session id."""
+
+    def __init__(self, change_feed: ChangeFeed = feed):
+        self._waiters: Dict[str, Set[OrderWaiter]] = defaultdict(set)
+        self._lock = threading.Lock()
+        # RESYNC events are delivered to every subscriber, so this covers them too
+        change_feed.subscribe("orders", self._on_change)
+
+    def register(self, session_id: str) -> OrderWaiter:
+        """Start collecting changes for ``session_id``; pair with ``unregister``."""
+        waiter = OrderWaiter(asyncio.get_running_loop())
+        with self._lock:
+            self._waiters[session_id].add(waiter)
+        return waiter
+
+    def unregister(self, session_id: str, waiter: OrderWaiter):
+        with self._lock:
+            waiters = self._waiters.get(session_id)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[session_id]
+
+    @contextmanager
+    def watch(self, session_id: str):
+        """Register a waiter for ``session_id`` for the duration of the block."""
+        waiter = self.register(session_id)
+        try:
+            yield waiter
+        finally:
+            self.unregister(session_id, waiter)
+
+    def _on_change(self, event: ChangeEvent):
+        if event.op == "DELETE":
+            return  # Only closed orders are deleted (moved to the archive); nobody waits on those
+        session_id = (event.record or {}).get("stripe_checkout_session_id")
+        with self._lock:
+            if session_id:
+                waiters = list(self._waiters.get(session_id, ()))
+            else:
+                # Row too large for the notification, or a resync; everyone re-reads
+                waiters = [waiter for group in self._waiters.values() for waiter in group]
+        for waiter in waiters:
+            waiter._notify(event.record if session_id else None)
+
+    def waiting(self) -> int:
+        """Number of open waiters (for diagnostics)."""
+        with self._lock:
+            return sum(len(group) for group in self._waiters.values())
+
+
+watcher = OrderStatusWatcher()
@@ -1,38 +1,96 @@
 """Order service for business logic."""
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from supabase import Client
+from app.change_feed import publish_change
+from app.database import is_pinned_to_primary, pin_to_primary
 from app.schemas import CheckoutItem
+from app.services.analytics_service import record_order_sales
+from app.services.singleflight import coalesce
+
+
+def order_pin_key(stripe_checkout_session_id: str) -> str:
+    """Read-your-writes key for an order created by checkout."""
+    return f"order-session:{stripe_checkout_session_id}"
+
+
+def get_checkout_products(supabase: Client, product_ids: List[int], with_stock: bool = False) -> Dict[int, Dict[str, Any]]:
+    """Fetch the published, non-deleted products in a cart with a single query.
+    
+    With ``with_stock``, each product also carries its ``inventory_shards``
+    (embedded in the same query) for ``available_stock``.
+    """
+    if not product_ids:
+        return {}
+    columns = "*, inventory_shards(available)" if with_stock else "*"
+    result = supabase.table("products").select(columns).in_("id", sorted(set(product_ids))).is_("deleted_at", "null").eq("published", True).execute()
+    return {product["id"]: product for product in (result.data or [])}
+
+
+def available_stock(product: Dict[str, Any]) -> Optional[int]:
+    """Unreserved stock of a product fetched ``with_stock``; None if inventory is not tracked."""
+    if not product.get("track_inventory"):
+        return None
+    return sum(shard["available"] for shard in product.get("inventory_shards") or [])
+
+
+def snapshot_cart_items(items: List[CheckoutItem], products: Dict[int, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Price each cart line from the current product rows.
+    
+    Every line has the order item fields (``product_id``, ``quantity``,
+    ``stripe_price_id_used``, ``unit_amount_snapshot``) plus ``product`` and
+    ``problem``: None when the line can be bought, else the reason it cannot.
+    """
+    lines = []
+    for item in items:
+        product = products.get(item.product_id)
+        line = {
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+            "product": product,
+            "stripe_price_id_used": None,
+            "unit_amount_snapshot": None,
+            "problem": None,
+        }
+        
+        if not product:
+            line["problem"] = f"Product {item.product_id} not found or not published"
+        elif not product.get("active_stripe_price_id"):
+            line["problem"] = f"Product {item.product_id} has no active Stripe price"
+        else:
+            line["stripe_price_id_used"] = product["active_stripe_price_id"]
+            line["unit_amount_snapshot"] = product["current_price_amount"]
+        
+        lines.append(line)
+    return lines
 
 
 def create_order_from_checkout(
     supabase: Client,
     items: List[CheckoutItem],
-    stripe_checkout_session_id: str
+    stripe_checkout_session_id: str,
+    products: Optional[Dict[int, Dict[str, Any]]] = None
 ) -> Dict[str, Any]:
-    """Create an order from checkout items."""
+    """Create an order from checkout items.
+    
+    ``products`` may be passed in when the caller already looked them up
+    (see ``get_checkout_products``) to avoid fetching them a second time.
+    """
+    if products is None:
+        products = get_checkout_products(supabase, [item.product_id for item in items])
+    
     total_amount = 0
     order_items = []
     
-    for item in items:
-        # Get product from Supabase
-        result = supabase.table("products").select("*").eq("id", item.product_id).is_("deleted_at", "null").eq("published", True).execute()
-        
-        if not result.data:
-            raise ValueError(f"Product {item.product_id} not found or not published")
-        
-        product = result.data[0]
-        
-        if not product.get("active_stripe_price_id"):
-            raise ValueError(f"Product {item.product_id} has no active Stripe price")
-        
-        item_total = product["current_price_amount"] * item.quantity
-        total_amount += item_total
+    for line in snapshot_cart_items(items, products):
+        if line["problem"]:
+            raise ValueError(line["problem"])
         
+        total_amount += line["unit_amount_snapshot"] * line["quantity"]
         order_items.append({
-            "product_id": product["id"],
-            "quantity": item.quantity,
-            "stripe_price_id_used": product["active_stripe_price_id"],
-            "unit_amount_snapshot": product["current_price_amount"]
+            "product_id": line["product_id"],
+            "quantity": line["quantity"],
+            "stripe_price_id_used": line["stripe_price_id_used"],
+            "unit_amount_snapshot": line["unit_amount_snapshot"]
         })
     
     # Create order
@@ -49,14 +107,16 @@ def create_order_from_checkout(
     if not order:
         raise ValueError("Failed to create order")
     
-    # Create order items
+    # Create order items in one bulk insert; the returned rows complete the order
     for item_data in order_items:
         item_data["order_id"] = order["id"]
-        supabase.table("order_items").insert(item_data).execute()
+    items_result = supabase.table("order_items").insert(order_items).execute()
     
-    # Fetch complete order with items
-    order_result = supabase.table("orders").select("*, order_items(*)").eq("id", order["id"]).execute()
-    return order_result.data[0] if order_result.data else order
+    # The shopper is redirected to the success page next; read this order from the primary
+    pin_to_primary(order_pin_key(stripe_checkout_session_id))
+    order = {**order, "order_items": items_result.data or []}
+    publish_change("orders", "INSERT", order)
+    return order
 
 
 def update_order_status(supabase: Client, stripe_checkout_session_id: str, status: str, customer_email: str = None) -> Dict[str, Any]:
@@ -73,4 +133,62 @@ def update_order_status(supabase: Client, stripe_checkout_session_id: str, statu
         update_data["customer_email"] = customer_email
     
     result = supabase.table("orders").update(update_data).eq("id", order["id"]).execute()
-    return result.data[0] if result.data else order
+    pin_to_primary(order_pin_key(stripe_checkout_session_id))
+    order = result.data[0] if result.data else {**order, **update_data}
+    publish_change("orders", "UPDATE", order)
+    
+    # Count the sale in the daily rollups (idempotent, so webhook retries are safe)
+    if status == "paid":
+        record_order_sales(supabase, order["id"])
+    
+    return order
+
+
+def _select_order(client: Client, column: str, value: Any) -> Optional[Dict[str, Any]]:
+    result = client.table("orders").select("*, order_items(*)").eq(column, value).execute()
+    return result.data[0] if result.data else None
+
+
+def _select_archived_order(client: Client, column: str, value: Any) -> Optional[Dict[str, Any]]:
+    result = client.table("orders_archive").select("*, order_items_archive(*)").eq(column, value).execute()
+    if not result.data:
+        return None
+    order = dict(result.data[0])
+    order["order_items"] = order.pop("order_items_archive", None) or []
+    return order
+
+
+def _read_order(supabase: Client, replica: Optional[Client], column: str, value: Any, pin_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Read an order from the replica, falling back to the primary, then the archive.
+    
+    The primary is used directly for orders this worker just wrote, and on a
+    replica miss, since the row may simply not have replicated yet. Orders
+    missing from both have been archived (or never existed); archived orders
+    are old, so the replica serves them.
+    """
+    if replica is not None and replica is not supabase and not (pin_key and is_pinned_to_primary(pin_key)):
+        order = _select_order(replica, column, value)
+        if order:
+            return order
+    order = _select_order(supabase, column, value)
+    if order:
+        return order
+    return _select_archived_order(replica if replica is not None else supabase, column, value)
+
+
+@coalesce(ignore=("supabase", "replica"))
+def get_order(supabase: Client, order_id: int, replica: Optional[Client] = None) -> Optional[Dict[str, Any]]:
+    """Get an order with its items by ID, including archived orders (concurrent lookups share one query)."""
+    return _read_order(supabase, replica, "id", order_id)
+
+
+@coalesce(ignore=("supabase", "replica"))
+def get_order_by_session(supabase: Client, stripe_checkout_session_id: str, replica: Optional[Client] = None) -> Optional[Dict[str, Any]]:
+    """Get an order with its items by Stripe Checkout Session ID, including archived orders (concurrent lookups share one query)."""
+    return _read_order(
+        supabase,
+        replica,
+        "stripe_checkout_session_id",
+        stripe_checkout_session_id,
+        pin_key=order_pin_key(stripe_checkout_session_id)
+    )
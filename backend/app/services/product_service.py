@@ -1,15 +1,35 @@
 """Product service for business logic."""
 import logging
 import time
-from typing import List, Optional, Callable
+from typing import Dict, List, Optional, Callable
 from supabase import Client
 from httpx import WriteError, ReadError, ConnectError
 from app.schemas import ProductCreate, ProductUpdate
+from app.change_feed import RESYNC, ChangeEvent, feed, publish_change
+from app.config import settings
+from app.services.cache import TTLCache
+from app.services.image_service import proxy_image_url
+from app.services.inventory_service import set_product_stock
+from app.services.singleflight import coalesce
 from app.services.stripe_sync import sync_product_to_stripe
 from app.database import reset_supabase_client, get_supabase
+from app.rate_limit import UpstreamOverloaded
 
 logger = logging.getLogger(__name__)
 
+# Non-deleted products by id (None caches "not found"); kept current from the change feed
+product_cache = TTLCache("products", lambda: settings.product_cache_size, lambda: settings.product_cache_ttl_seconds)
+
+
+def _invalidate_cached_product(event: ChangeEvent):
+    if event.op == RESYNC:
+        product_cache.clear()
+    elif event.id is not None:
+        product_cache.invalidate(event.id)
+
+
+feed.subscribe("products", _invalidate_cached_product)
+
 
 def format_price(amount: int, currency: str = "usd") -> str:
     """Format price amount to display string."""
@@ -22,8 +42,12 @@ def format_price(amount: int, currency: str = "usd") -> str:
         return f"{major_units:.2f} {currency.upper()}"
 
 
-def _convert_to_product_dict(data: dict) -> dict:
-    """Convert Supabase response to product dict, handling images field."""
+def _convert_to_product_dict(data: dict, proxy_images: bool = False) -> dict:
+    """Convert Supabase response to product dict, handling images field.
+    
+    With ``proxy_images`` (and ``image_proxy_enabled``), image URLs point at
+    the image proxy instead of their origin.
+    """
     # Handle images: convert from JSONB array or single image_url
     images = data.get("images", [])
     if isinstance(images, str):
@@ -40,6 +64,11 @@ def _convert_to_product_dict(data: dict) -> dict:
     if not images and data.get("image_url"):
         images = [data["image_url"]]
     
+    if proxy_images and settings.image_proxy_enabled:
+        # Versioned by updated_at, so saving the product refreshes replaced images
+        version = str(data["updated_at"]) if data.get("updated_at") else None
+        images = [proxy_image_url(url, version=version) for url in images]
+    
     result = {**data, "images": images}
     # Remove image_url if it exists (we use images now)
     if "image_url" in result:
@@ -47,6 +76,15 @@ def _convert_to_product_dict(data: dict) -> dict:
     return result
 
 
+def storefront_product(product: dict) -> dict:
+    """Copy of ``product`` for the storefront, with image URLs on the image proxy when enabled.
+    
+    Stored and cached products keep their original URLs, which are what
+    admin edits and Stripe see.
+    """
+    return _convert_to_product_dict(product, proxy_images=True)
+
+
 def create_product(supabase: Client, product_data: ProductCreate) -> dict:
     """Create a new product and sync to Stripe."""
     # Convert product_data to dict, handling images
@@ -59,36 +97,27 @@ def create_product(supabase: Client, product_data: ProductCreate) -> dict:
     elif "images" not in product_dict:
         product_dict["images"] = []
     
-    # Insert into Supabase
+    stock_quantity = product_dict.pop("stock_quantity", None)
+    
+    # Insert into Supabase; the inserted row is returned
     result = supabase.table("products").insert(product_dict).execute()
     product = result.data[0] if result.data else None
     
     if not product:
         raise ValueError("Failed to create product")
     
-    # Sync to Stripe
+    if stock_quantity is not None:
+        set_product_stock(supabase, product["id"], stock_quantity)
+        product["track_inventory"] = True
+    
+    # Sync to Stripe (merges the sync fields into product)
     sync_product_to_stripe(supabase, product)
     
-    # Refresh from database
-    result = supabase.table("products").select("*").eq("id", product["id"]).execute()
-    return _convert_to_product_dict(result.data[0]) if result.data else product
+    return _convert_to_product_dict(product)
 
 
 def update_product(supabase: Client, product_id: int, product_data: ProductUpdate) -> dict:
     """Update a product and sync changes to Stripe."""
-    # Get existing product
-    result = supabase.table("products").select("*").eq("id", product_id).is_("deleted_at", "null").execute()
-    if not result.data:
-        raise ValueError("Product not found")
-    
-    product = result.data[0]
-    
-    # Track if price changed
-    price_changed = (
-        product_data.current_price_amount is not None and
-        product_data.current_price_amount != product["current_price_amount"]
-    )
-    
     # Convert update data to dict
     update_dict = product_data.model_dump(exclude_unset=True)
     
@@ -97,29 +126,41 @@ def update_product(supabase: Client, product_id: int, product_data: ProductUpdat
         update_dict["images"] = [update_dict["image_url"]]
         del update_dict["image_url"]
     
-    # Update in Supabase
+    # Stock lives in inventory_shards, not on the product row
+    update_stock = "stock_quantity" in update_dict
+    stock_quantity = update_dict.pop("stock_quantity", None)
+    
+    # Update in Supabase, getting the updated row back; read it only if there is nothing to write
     if update_dict:
-        result = supabase.table("products").update(update_dict).eq("id", product_id).execute()
-        product = result.data[0] if result.data else product
+        result = supabase.table("products").update(update_dict).eq("id", product_id).is_("deleted_at", "null").execute()
+    else:
+        result = supabase.table("products").select("*").eq("id", product_id).is_("deleted_at", "null").execute()
+    
+    if not result.data:
+        raise ValueError("Product not found")
+    
+    product = result.data[0]
     
-    # Sync to Stripe if any changes
+    if update_stock:
+        set_product_stock(supabase, product_id, stock_quantity)
+        product["track_inventory"] = stock_quantity is not None
+    
+    # Sync to Stripe if any changes (merges the sync fields into product)
     sync_product_to_stripe(supabase, product)
     
-    # Refresh from database
-    result = supabase.table("products").select("*").eq("id", product_id).execute()
-    return _convert_to_product_dict(result.data[0]) if result.data else product
+    return _convert_to_product_dict(product)
 
 
 def delete_product(supabase: Client, product_id: int) -> bool:
     """Soft delete a product."""
     from datetime import datetime
     
-    result = supabase.table("products").select("id").eq("id", product_id).is_("deleted_at", "null").execute()
+    # Soft delete by setting deleted_at; no rows back means missing or already deleted
+    result = supabase.table("products").update({"deleted_at": datetime.utcnow().isoformat()}).eq("id", product_id).is_("deleted_at", "null").execute()
     if not result.data:
         return False
     
-    # Soft delete by setting deleted_at
-    supabase.table("products").update({"deleted_at": datetime.utcnow().isoformat()}).eq("id", product_id).execute()
+    publish_change("products", "UPDATE", result.data[0])
     return True
 
 
@@ -140,6 +181,8 @@ def _execute_with_retry(supabase: Client, operation_name: str, operation_func: C
     for attempt in range(max_retries):
         try:
             return operation_func(current_client)
+        except UpstreamOverloaded:
+            raise  # Retrying would only add to the queue
         except (WriteError, ReadError, ConnectError, Exception) as e:
             error_type = type(e).__name__
             if attempt < max_retries - 1:
@@ -162,6 +205,13 @@ def _execute_with_retry(supabase: Client, operation_name: str, operation_func: C
                 raise
 
 
+def _normalize_search(search: Optional[str]) -> Optional[str]:
+    """Search ignores case and surrounding whitespace; the query and the coalescing key both use this form."""
+    return search.strip().lower() or None if search else None
+
+
+# Keyed on the client too, so a primary read (e.g. preload_catalog) never shares a replica result
+@coalesce(ignore=(), normalize={"search": _normalize_search})
 def get_products(
     supabase: Client,
     published_only: bool = False,
@@ -170,8 +220,11 @@ def get_products(
 ) -> List[dict]:
     """Get products, optionally filtered by published status, category, and search.
     
-    Includes retry logic for connection errors.
+    Includes retry logic for connection errors. Concurrent identical calls
+    share one query; the returned list is shared and must not be mutated.
     """
+    search = _normalize_search(search)
+    
     def _execute_query(client: Client):
         query = client.table("products").select("*").is_("deleted_at", "null")
         
@@ -192,10 +245,9 @@ def get_products(
         
         # Filter by search term if provided (case-insensitive)
         if search:
-            search_lower = search.lower()
             products = [
                 p for p in products
-                if search_lower in (p.get("title") or "").lower() or search_lower in (p.get("description") or "").lower()
+                if search in (p.get("title") or "").lower() or search in (p.get("description") or "").lower()
             ]
         
         return [_convert_to_product_dict(item) for item in products]
@@ -203,9 +255,39 @@ def get_products(
     return _execute_with_retry(supabase, "get_products", _execute_query)
 
 
+def preload_catalog(supabase: Client) -> int:
+    """Fill the product cache with published products (pass the primary client).
+    
+    Returns the number of products cached.
+    """
+    generation = product_cache.generation
+    products = get_products(supabase, published_only=True)[:product_cache.max_entries]
+    for product in products:
+        product_cache.set(product["id"], product, generation)
+    return len(products)
+
+
 def get_product(supabase: Client, product_id: int) -> Optional[dict]:
-    """Get a single product by ID."""
-    result = supabase.table("products").select("*").eq("id", product_id).is_("deleted_at", "null").execute()
-    if not result.data:
-        return None
-    return _convert_to_product_dict(result.data[0])
+    """Get a single product by ID (served from the product cache when possible)."""
+    return get_products_by_ids(supabase, [product_id]).get(product_id)
+
+
+def get_products_by_ids(supabase: Client, product_ids: List[int]) -> Dict[int, dict]:
+    """Get non-deleted products by ID, fetching all cache misses with one query.
+    
+    Products that do not exist (or are deleted) are left out. Returned dicts
+    are shared with the cache and must not be mutated.
+    """
+    cached = product_cache.get_many(product_ids)
+    missing = sorted(set(product_ids) - set(cached))
+    
+    if missing:
+        generation = product_cache.generation
+        result = supabase.table("products").select("*").in_("id", missing).is_("deleted_at", "null").execute()
+        fetched = {row["id"]: _convert_to_product_dict(row) for row in (result.data or [])}
+        for product_id in missing:
+            product = fetched.get(product_id)
+            product_cache.set(product_id, product, generation)
+            cached[product_id] = product
+    
+    return {product_id: product for product_id, product in cached.items() if product is not None}
@@ -0,0 +1,109 @@
+"""Single-flight request coalescing for concurrent identical reads.
+
+When many requests ask for the same thing at once, the first caller (the
+leader) runs the query and every caller that arrives while it is in flight
+waits for and shares its result. Nothing is cached after the leader returns.
+"""
+import functools
+import inspect
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+from app.metrics import registry
+
+CALLS = registry.counter(
+    "singleflight_calls_total",
+    "Calls to coalesced service functions.",
+    ("function",),
+)
+COALESCED = registry.counter(
+    "singleflight_coalesced_total",
+    "Calls that shared an in-flight result instead of querying upstream.",
+    ("function",),
+)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """Run ``func`` unless a call with ``key`` is in flight; then share its outcome."""
+        CALLS.inc(self.name)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COALESCED.inc(self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def coalesce(ignore: Iterable[str] = ("supabase",), normalize: Optional[Dict[str, Callable[[Any], Any]]] = None) -> Callable:
+    """Decorator coalescing concurrent calls with equal (normalized) arguments.
+
+    Args:
+        ignore: Parameters left out of the key, such as the client.
+        normalize: Per-parameter functions mapping equivalent values to one key,
+            e.g. case-folding a case-insensitive search term.
+
+    The shared result is returned to every caller, so callers must not mutate it.
+    """
+    ignored = set(ignore)
+    normalizers = normalize or {}
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        group = SingleFlight(func.__name__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(
+                (name, _freeze(normalizers[name](value) if name in normalizers else value))
+                for name, value in bound.arguments.items()
+                if name not in ignored
+            )
+            return group.do(key, lambda: func(*args, **kwargs))
+
+        wrapper.single_flight = group
+        return wrapper
+    return decorator
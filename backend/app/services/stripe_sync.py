@@ -3,12 +3,22 @@ from datetime import datetime
 from typing import Optional, Dict, Any
 from supabase import Client
 
+from app.change_feed import publish_change
+from app.rate_limit import UpstreamOverloaded
 from app.stripe_client import create_product, update_product, create_price, deactivate_price
 
 
-def sync_product_to_stripe(supabase: Client, product: Dict[str, Any], deactivate_old_price: bool = True) -> tuple[bool, Optional[str]]:
+def sync_product_to_stripe(
+    supabase: Client,
+    product: Dict[str, Any],
+    deactivate_old_price: bool = True,
+    raise_overloaded: bool = False
+) -> tuple[bool, Optional[str]]:
     """
     Sync product to Stripe.
+    The sync fields written to Supabase are merged into ``product`` in place.
+    With ``raise_overloaded``, a call shed by the Stripe concurrency limit is
+    re-raised (a 503 the caller can retry) after the failure is recorded.
     Returns (success, error_message).
     """
     try:
@@ -62,7 +72,9 @@ def sync_product_to_stripe(supabase: Client, product: Dict[str, Any], deactivate
             "last_sync_at": datetime.utcnow().isoformat()
         }
         
-        supabase.table("products").update(update_data).eq("id", product["id"]).execute()
+        result = supabase.table("products").update(update_data).eq("id", product["id"]).execute()
+        product.update(result.data[0] if result.data else update_data)
+        publish_change("products", "UPDATE", product)
         
         return True, None
         
@@ -72,7 +84,11 @@ def sync_product_to_stripe(supabase: Client, product: Dict[str, Any], deactivate
             "last_sync_status": f"failed: {str(e)}",
             "last_sync_at": datetime.utcnow().isoformat()
         }
-        supabase.table("products").update(update_data).eq("id", product["id"]).execute()
+        result = supabase.table("products").update(update_data).eq("id", product["id"]).execute()
+        product.update(result.data[0] if result.data else update_data)
+        publish_change("products", "UPDATE", product)
+        if raise_overloaded and isinstance(e, UpstreamOverloaded):
+            raise
         return False, str(e)
 
 
@@ -83,4 +99,4 @@ def resync_product(supabase: Client, product_id: int) -> tuple[bool, Optional[st
         return False, "Product not found"
     
     product = result.data[0]
-    return sync_product_to_stripe(supabase, product)
+    return sync_product_to_stripe(supabase, product, raise_overloaded=True)
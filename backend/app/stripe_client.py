@@ -1,12 +1,52 @@
-"""Stripe API client wrapper."""
-import stripe
+"""Stripe API client wrapper.
+
+The ``stripe`` package is imported and configured on first use (or by
+``warm_up`` at startup) rather than when this module is imported.
+"""
+import threading
+from types import ModuleType
 from typing import Optional, Dict, Any
 
 from app.config import settings
+from app.instrumentation import traced
+
+_stripe: Optional[ModuleType] = None
+_stripe_lock = threading.Lock()
+
+
+def get_stripe() -> ModuleType:
+    """The configured ``stripe`` module.
+    
+    Unless an HTTP client was installed already (e.g. a stand-in for
+    benchmarks), all threads share one pooled ``requests`` session, so
+    connections opened by ``warm_up`` are reused by request threads (the
+    library's default client keeps a separate session per thread).
+    """
+    global _stripe
+    if _stripe is None:
+        with _stripe_lock:
+            if _stripe is None:
+                import requests
+                import stripe
+                from requests.adapters import HTTPAdapter
+                
+                stripe.api_key = settings.stripe_secret_key
+                if stripe.default_http_client is None:
+                    session = requests.Session()
+                    pool_size = max(settings.stripe_max_concurrency, 10)
+                    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+                    stripe.default_http_client = stripe.http_client.RequestsClient(session=session)
+                _stripe = stripe
+    return _stripe
+
 
-stripe.api_key = settings.stripe_secret_key
+@traced("stripe")
+def warm_up() -> None:
+    """Open a connection to the Stripe API (one cheap authenticated read)."""
+    get_stripe().Product.list(limit=1)
 
 
+@traced("stripe")
 def create_product(title: str, description: Optional[str] = None, images: Optional[list] = None) -> Dict[str, Any]:
     """Create a Stripe product."""
     params = {
@@ -17,9 +57,10 @@ def create_product(title: str, description: Optional[str] = None, images: Option
     if images:
         params["images"] = images
     
-    return stripe.Product.create(**params)
+    return get_stripe().Product.create(**params)
 
 
+@traced("stripe")
 def update_product(stripe_product_id: str, title: Optional[str] = None, description: Optional[str] = None, images: Optional[list] = None) -> Dict[str, Any]:
     """Update a Stripe product."""
     params = {}
@@ -31,36 +72,54 @@ def update_product(stripe_product_id: str, title: Optional[str] = None, descript
         params["images"] = images
     
     if not params:
-        return stripe.Product.retrieve(stripe_product_id)
+        return get_stripe().Product.retrieve(stripe_product_id)
     
-    return stripe.Product.modify(stripe_product_id, **params)
+    return get_stripe().Product.modify(stripe_product_id, **params)
 
 
+@traced("stripe")
 def create_price(product_id: str, amount: int, currency: str = "usd") -> Dict[str, Any]:
     """Create a Stripe price."""
-    return stripe.Price.create(
+    return get_stripe().Price.create(
         product=product_id,
         unit_amount=amount,
         currency=currency,
     )
 
 
+@traced("stripe")
 def deactivate_price(price_id: str) -> Dict[str, Any]:
     """Deactivate a Stripe price."""
-    return stripe.Price.modify(price_id, active=False)
+    return get_stripe().Price.modify(price_id, active=False)
 
 
-def create_checkout_session(line_items: list, success_url: str, cancel_url: str) -> Dict[str, Any]:
+@traced("stripe")
+def create_checkout_session(
+    line_items: list,
+    success_url: str,
+    cancel_url: str,
+    client_reference_id: Optional[str] = None,
+    expires_at: Optional[int] = None
+) -> Dict[str, Any]:
     """Create a Stripe checkout session."""
-    return stripe.checkout.Session.create(
+    return get_stripe().checkout.Session.create(
         payment_method_types=["card"],
         line_items=line_items,
         mode="payment",
         success_url=success_url,
         cancel_url=cancel_url,
+        client_reference_id=client_reference_id,
+        expires_at=expires_at,
     )
 
 
+@traced("stripe")
+def expire_checkout_session(session_id: str) -> Dict[str, Any]:
+    """Expire an open Stripe checkout session so it can no longer be paid."""
+    return get_stripe().checkout.Session.expire(session_id)
+
+
+@traced("stripe")
 def retrieve_checkout_session(session_id: str) -> Dict[str, Any]:
     """Retrieve a Stripe checkout session."""
-    return stripe.checkout.Session.retrieve(session_id)
+    return get_stripe().checkout.Session.retrieve(session_id)
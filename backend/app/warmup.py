@@ -0,0 +1,91 @@
+"""Startup warm-up and readiness.
+
+The lifespan in ``app.main`` runs ``run_warmup`` in the background as soon as
+the worker starts. It opens the Supabase and Stripe connections and loads the
+published catalog into the product cache and the facet index, so the first
+requests after a deploy or scale-out do not pay for client construction, TLS
+handshakes and cold caches. ``GET /health/ready`` answers 503 until every
+step has succeeded; a failed step is retried after ``warmup_retry_seconds``.
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import get_supabase, get_supabase_read
+from app.metrics import registry
+from app.services.facet_service import facet_index
+from app.services.product_service import preload_catalog
+from app import stripe_client
+
+logger = logging.getLogger(__name__)
+
+WARMUP_DURATION = registry.histogram(
+    "startup_warmup_duration_seconds",
+    "Time spent in each startup warm-up step.",
+    ("step",),
+)
+
+
+def _connect_supabase():
+    """Create the primary and read clients and open a connection on each."""
+    clients = {id(client): client for client in (get_supabase(), get_supabase_read())}
+    for client in clients.values():
+        client.table("products").select("id").limit(1).execute()
+
+
+def _preload_catalog():
+    primary = get_supabase()
+    count = preload_catalog(primary)
+    facet_index.snapshot(primary)
+    logger.info(f"Preloaded {count} published products")
+
+
+STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("supabase", _connect_supabase),
+    ("catalog", _preload_catalog),
+    ("stripe", stripe_client.warm_up),
+]
+
+
+class WarmupState:
+    """Progress of the warm-up, reported by ``GET /health/ready``."""
+
+    def __init__(self):
+        self.ready = False
+        self.completed: Dict[str, float] = {}  # step -> seconds
+        self.last_error: Optional[str] = None
+        self.ready_after: Optional[float] = None  # Seconds from start of warm-up
+
+    @property
+    def pending(self) -> List[str]:
+        return [name for name, _ in STEPS if name not in self.completed]
+
+
+state = WarmupState()
+
+
+async def run_warmup(warmup_state: WarmupState = state):
+    """Run the warm-up steps in order (retrying failures), then mark the worker ready."""
+    started = time.perf_counter()
+    if settings.warmup_enabled:
+        for name, step in STEPS:
+            while True:
+                step_started = time.perf_counter()
+                try:
+                    await run_in_threadpool(step)
+                    break
+                except Exception as e:
+                    warmup_state.last_error = f"{name}: {e}"
+                    logger.warning(f"Warm-up step {name} failed, retrying in {settings.warmup_retry_seconds}s: {e}")
+                    await asyncio.sleep(settings.warmup_retry_seconds)
+            elapsed = time.perf_counter() - step_started
+            WARMUP_DURATION.observe(elapsed, name)
+            warmup_state.completed[name] = elapsed
+        warmup_state.last_error = None
+    warmup_state.ready_after = time.perf_counter() - started
+    warmup_state.ready = True
+    logger.info(f"Warm-up finished in {warmup_state.ready_after:.3f}s; ready")
@@ -0,0 +1,14 @@
+"""Local stand-ins for the Stripe and Supabase APIs."""
+from benchmarks.fakes.postgrest import FAKE_SUPABASE_KEY, FAKE_SUPABASE_URL, FakePostgREST, FakePostgrestError
+from benchmarks.fakes.rpcs import register_rpcs
+from benchmarks.fakes.stripe_api import FakeStripe, sign_payload
+
+__all__ = [
+    "FAKE_SUPABASE_KEY",
+    "FAKE_SUPABASE_URL",
+    "FakePostgREST",
+    "FakePostgrestError",
+    "FakeStripe",
+    "register_rpcs",
+    "sign_payload",
+]
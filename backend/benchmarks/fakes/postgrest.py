@@ -0,0 +1,531 @@
+"""SQLite-backed stand-in for the Supabase PostgREST API.
+
+The fake is an ``httpx`` transport, so the real ``supabase.Client`` and its
+query builders are used unchanged; only the HTTP round trip is replaced by an
+in-process SQLite database.
+"""
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+import httpx
+from postgrest.utils import SyncClient
+from supabase import Client, create_client
+
+FAKE_SUPABASE_URL = "http://supabase.fake"
+# Shaped like a JWT so it passes the client's key validation
+FAKE_SUPABASE_KEY = "fake.service-role.key"
+
+_NOW = "(strftime('%Y-%m-%dT%H:%M:%f', 'now'))"
+
+SCHEMA = f"""
+CREATE TABLE products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    description TEXT,
+    images JSON DEFAULT '[]',
+    category TEXT,
+    currency TEXT NOT NULL DEFAULT 'usd',
+    current_price_amount INTEGER NOT NULL,
+    published BOOLEAN DEFAULT 0,
+    track_inventory BOOLEAN DEFAULT 0,
+    stripe_product_id TEXT,
+    active_stripe_price_id TEXT,
+    last_sync_status TEXT,
+    last_sync_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT {_NOW},
+    updated_at TIMESTAMP DEFAULT {_NOW},
+    deleted_at TIMESTAMP
+);
+CREATE INDEX idx_products_category ON products(category);
+
+CREATE TABLE orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    status TEXT NOT NULL DEFAULT 'pending_payment',
+    stripe_checkout_session_id TEXT UNIQUE,
+    total_amount_snapshot INTEGER NOT NULL,
+    currency TEXT NOT NULL DEFAULT 'usd',
+    customer_email TEXT,
+    sales_recorded_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT {_NOW},
+    updated_at TIMESTAMP DEFAULT {_NOW}
+);
+
+CREATE TABLE order_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+    product_id INTEGER NOT NULL REFERENCES products(id),
+    quantity INTEGER NOT NULL,
+    stripe_price_id_used TEXT NOT NULL,
+    unit_amount_snapshot INTEGER NOT NULL
+);
+CREATE INDEX idx_order_items_order_id ON order_items(order_id);
+
+CREATE TABLE stripe_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stripe_event_id TEXT UNIQUE NOT NULL,
+    event_type TEXT NOT NULL,
+    processed BOOLEAN DEFAULT 0,
+    processed_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT {_NOW}
+);
+
+CREATE TABLE inventory_shards (
+    product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    shard INTEGER NOT NULL,
+    available INTEGER NOT NULL CHECK (available >= 0),
+    PRIMARY KEY (product_id, shard)
+);
+
+CREATE TABLE inventory_reservations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    reservation_id TEXT NOT NULL,
+    product_id INTEGER NOT NULL REFERENCES products(id),
+    shard INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'reserved',
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT {_NOW},
+    updated_at TIMESTAMP DEFAULT {_NOW}
+);
+CREATE INDEX idx_inventory_reservations_reservation_id ON inventory_reservations(reservation_id);
+
+CREATE TABLE sales_daily_product (
+    day DATE NOT NULL,
+    product_id INTEGER NOT NULL,
+    currency TEXT NOT NULL DEFAULT 'usd',
+    units INTEGER NOT NULL DEFAULT 0,
+    gross_amount INTEGER NOT NULL DEFAULT 0,
+    orders INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, product_id, currency)
+);
+
+CREATE TABLE sales_daily_category (
+    day DATE NOT NULL,
+    category TEXT NOT NULL,
+    currency TEXT NOT NULL DEFAULT 'usd',
+    units INTEGER NOT NULL DEFAULT 0,
+    gross_amount INTEGER NOT NULL DEFAULT 0,
+    orders INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, category, currency)
+);
+
+CREATE TABLE products_archive (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    images JSON DEFAULT '[]',
+    category TEXT,
+    currency TEXT NOT NULL DEFAULT 'usd',
+    current_price_amount INTEGER NOT NULL,
+    published BOOLEAN DEFAULT 0,
+    track_inventory BOOLEAN DEFAULT 0,
+    stripe_product_id TEXT,
+    active_stripe_price_id TEXT,
+    last_sync_status TEXT,
+    last_sync_at TIMESTAMP,
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    deleted_at TIMESTAMP,
+    archived_at TIMESTAMP NOT NULL DEFAULT {_NOW}
+);
+
+CREATE TABLE orders_archive (
+    id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL,
+    stripe_checkout_session_id TEXT UNIQUE,
+    total_amount_snapshot INTEGER NOT NULL,
+    currency TEXT NOT NULL DEFAULT 'usd',
+    customer_email TEXT,
+    sales_recorded_at TIMESTAMP,
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    archived_at TIMESTAMP NOT NULL DEFAULT {_NOW}
+);
+
+CREATE TABLE order_items_archive (
+    id INTEGER PRIMARY KEY,
+    order_id INTEGER NOT NULL REFERENCES orders_archive(id) ON DELETE CASCADE,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    stripe_price_id_used TEXT NOT NULL,
+    unit_amount_snapshot INTEGER NOT NULL,
+    archived_at TIMESTAMP NOT NULL DEFAULT {_NOW}
+);
+CREATE INDEX idx_order_items_archive_order_id ON order_items_archive(order_id);
+
+CREATE TABLE stripe_events_archive (
+    id INTEGER PRIMARY KEY,
+    stripe_event_id TEXT NOT NULL,
+    event_type TEXT NOT NULL,
+    processed BOOLEAN DEFAULT 0,
+    processed_at TIMESTAMP,
+    created_at TIMESTAMP,
+    archived_at TIMESTAMP NOT NULL DEFAULT {_NOW}
+);
+
+CREATE TABLE inventory_reservations_archive (
+    id INTEGER PRIMARY KEY,
+    reservation_id TEXT NOT NULL,
+    product_id INTEGER NOT NULL,
+    shard INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    archived_at TIMESTAMP NOT NULL DEFAULT {_NOW}
+);
+"""
+
+# Embedded resources: (parent table, child table) -> foreign key column on child
+RELATIONSHIPS = {
+    ("orders", "order_items"): "order_id",
+    ("orders_archive", "order_items_archive"): "order_id",
+    ("products", "inventory_shards"): "product_id",
+}
+
+# Tables whose row changes are announced, like the notify_row_change() triggers
+NOTIFY_TABLES = {"products", "orders"}
+
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+class FakePostgrestError(Exception):
+    """Error surfaced to the client the way PostgREST reports failures."""
+
+    def __init__(self, message: str, code: str = "P0001", status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.status_code = status_code
+
+
+def _split_top_level(spec: str) -> List[str]:
+    """Split a select spec on commas that are not nested in parentheses."""
+    parts, depth, current = [], 0, ""
+    for char in spec:
+        if char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        current += char
+    parts.append(current)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _parse_in_list(arg: str) -> List[str]:
+    """Parse a PostgREST ``in.(a,"b,c")`` argument into raw values."""
+    inner = arg.strip()[1:-1]
+    values, current, quoted = [], "", False
+    for char in inner:
+        if char == '"':
+            quoted = not quoted
+            continue
+        if char == "," and not quoted:
+            values.append(current)
+            current = ""
+            continue
+        current += char
+    if current or inner:
+        values.append(current)
+    return values
+
+
+class FakePostgREST(httpx.BaseTransport):
+    """In-process PostgREST implementation over a shared SQLite connection.
+
+    Args:
+        latency: Seconds to sleep per request, emulating the network round trip.
+        schema: DDL used to initialise the database.
+        max_rows: Cap on rows a select returns, like PostgREST's ``db-max-rows``
+            (1000 on Supabase).
+    """
+
+    def __init__(self, latency: float = 0.0, schema: str = SCHEMA, max_rows: int = 1000):
+        self.latency = latency
+        self.max_rows = max_rows
+        self.request_count = 0
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.executescript(schema)
+        self._columns: Dict[str, Dict[str, str]] = {}
+        self._rpcs: Dict[str, Callable[[sqlite3.Connection, dict], Any]] = {}
+        self._change_listeners: List[Callable[[str, str, dict], None]] = []
+        self._pending_changes = threading.local()
+
+    # ------------------------------------------------------------------
+    # Public helpers
+    # ------------------------------------------------------------------
+
+    def create_client(self) -> Client:
+        """Create a real Supabase client whose PostgREST traffic hits this fake."""
+        client = create_client(FAKE_SUPABASE_URL, FAKE_SUPABASE_KEY)
+        postgrest = client.postgrest
+        postgrest.session = SyncClient(
+            base_url=postgrest.session.base_url,
+            headers=postgrest.session.headers,
+            transport=self,
+        )
+        return client
+
+    def register_rpc(self, name: str, func: Callable[[sqlite3.Connection, dict], Any]):
+        """Register a Python implementation of a Postgres function for ``client.rpc``."""
+        self._rpcs[name] = func
+
+    def on_change(self, callback: Callable[[str, str, dict], None]):
+        """Call ``callback(table, op, row)`` after writes to ``NOTIFY_TABLES`` (trigger stand-in)."""
+        self._change_listeners.append(callback)
+
+    def seed(self, table: str, rows: List[dict]) -> List[dict]:
+        """Insert rows directly, bypassing latency and request accounting."""
+        with self._lock:
+            return self._insert(table, rows, on_conflict=None)
+
+    def query(self, sql: str, params: Tuple = ()) -> List[dict]:
+        """Run raw SQL against the backing database (for assertions and reports)."""
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    # ------------------------------------------------------------------
+    # Transport
+    # ------------------------------------------------------------------
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            time.sleep(self.latency)
+        self.request_count += 1
+
+        path = request.url.path
+        prefix = "/rest/v1/"
+        resource = path[len(prefix):] if path.startswith(prefix) else path.lstrip("/")
+        params = list(request.url.params.multi_items())
+        prefer = request.headers.get("prefer", "")
+        body = json.loads(request.content) if request.content else None
+        self._pending_changes.items = []
+
+        try:
+            with self._lock:
+                if resource.startswith("rpc/"):
+                    data = self._call_rpc(resource[len("rpc/"):], body or {})
+                elif request.method == "GET":
+                    data = self._select(resource, params)
+                elif request.method == "POST":
+                    on_conflict = None
+                    if "resolution=merge-duplicates" in prefer:
+                        on_conflict = dict(params).get("on_conflict") or "id"
+                    data = self._insert(resource, body, on_conflict=on_conflict)
+                elif request.method == "PATCH":
+                    data = self._update(resource, body or {}, params)
+                elif request.method == "DELETE":
+                    data = self._delete(resource, params)
+                else:
+                    raise FakePostgrestError(f"Unsupported method {request.method}", "PGRST000", 405)
+        except FakePostgrestError as e:
+            return httpx.Response(e.status_code, json={"message": e.message, "code": e.code, "hint": None, "details": None})
+        except sqlite3.IntegrityError as e:
+            return httpx.Response(409, json={"message": str(e), "code": "23505", "hint": None, "details": None})
+
+        # Announce changes outside the lock, as NOTIFY is delivered after commit
+        for table, op, row in self._pending_changes.items:
+            for callback in self._change_listeners:
+                callback(table, op, row)
+
+        if request.method != "GET" and "return=minimal" in prefer and not resource.startswith("rpc/"):
+            return httpx.Response(201 if request.method == "POST" else 204)
+        return httpx.Response(200, json=data)
+
+    # ------------------------------------------------------------------
+    # Query execution
+    # ------------------------------------------------------------------
+
+    def _table_columns(self, table: str) -> Dict[str, str]:
+        if table not in self._columns:
+            info = self._conn.execute(f"PRAGMA table_info({table})").fetchall()
+            if not info:
+                raise FakePostgrestError(f'relation "public.{table}" does not exist', "42P01", 404)
+            self._columns[table] = {row["name"]: (row["type"] or "").upper() for row in info}
+        return self._columns[table]
+
+    def _encode(self, table: str, row: dict) -> dict:
+        columns = self._table_columns(table)
+        encoded = {}
+        for key, value in row.items():
+            if key not in columns:
+                raise FakePostgrestError(
+                    f"Could not find the '{key}' column of '{table}' in the schema cache", "PGRST204"
+                )
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value)
+            elif isinstance(value, bool):
+                value = int(value)
+            encoded[key] = value
+        return encoded
+
+    def _decode(self, table: str, row: sqlite3.Row) -> dict:
+        columns = self._table_columns(table)
+        decoded = {}
+        for key in row.keys():
+            value = row[key]
+            column_type = columns.get(key, "")
+            if value is not None and column_type == "BOOLEAN":
+                value = bool(value)
+            elif value is not None and column_type == "JSON":
+                value = json.loads(value)
+            decoded[key] = value
+        return decoded
+
+    def _coerce(self, table: str, column: str, raw: str) -> Any:
+        column_type = self._table_columns(table).get(column, "")
+        if column_type == "BOOLEAN":
+            return 1 if raw.lower() == "true" else 0
+        if column_type == "INTEGER":
+            try:
+                return int(raw)
+            except ValueError:
+                return raw
+        return raw
+
+    def _where(self, table: str, params: List[Tuple[str, str]]) -> Tuple[str, List[Any]]:
+        clauses, args = [], []
+        columns = self._table_columns(table)
+        for key, value in params:
+            if key in _RESERVED_PARAMS:
+                continue
+            if key not in columns:
+                raise FakePostgrestError(f"column {table}.{key} does not exist", "42703")
+            negate = value.startswith("not.")
+            if negate:
+                value = value[len("not."):]
+            op, _, arg = value.partition(".")
+            if op == "is":
+                literal = {"null": "NULL", "true": "1", "false": "0"}[arg.lower()]
+                clause = f"{key} IS {literal}"
+            elif op == "in":
+                values = [self._coerce(table, key, v) for v in _parse_in_list(arg)]
+                clause = f"{key} IN ({', '.join('?' for _ in values)})" if values else "0"
+                args.extend(values)
+            elif op in ("like", "ilike"):
+                clause = f"{key} LIKE ?"
+                args.append(unquote(arg).replace("*", "%"))
+            else:
+                sql_op = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}.get(op)
+                if sql_op is None:
+                    raise FakePostgrestError(f"Unsupported filter operator {op}", "PGRST100")
+                clause = f"{key} {sql_op} ?"
+                args.append(self._coerce(table, key, arg))
+            clauses.append(f"NOT ({clause})" if negate else clause)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def _record_changes(self, table: str, op: str, rows: List[dict]):
+        if table in NOTIFY_TABLES and self._change_listeners:
+            pending = getattr(self._pending_changes, "items", None)
+            if pending is not None:
+                pending.extend((table, op, row) for row in rows)
+
+    def _select(self, table: str, params: List[Tuple[str, str]]) -> List[dict]:
+        options = dict(params)
+        where, args = self._where(table, params)
+        sql = f"SELECT * FROM {table}{where}"
+        if options.get("order"):
+            terms = []
+            for term in options["order"].split(","):
+                column, *modifiers = term.split(".")
+                terms.append(f"{column} {'DESC' if 'desc' in modifiers else 'ASC'}")
+            sql += " ORDER BY " + ", ".join(terms)
+        limit = min(int(options.get("limit") or self.max_rows), self.max_rows)
+        sql += f" LIMIT {limit}"
+        if options.get("offset"):
+            sql += f" OFFSET {int(options['offset'])}"
+        rows = [self._decode(table, row) for row in self._conn.execute(sql, args).fetchall()]
+        return self._project(table, rows, options.get("select", "*"))
+
+    def _project(self, table: str, rows: List[dict], select: str) -> List[dict]:
+        columns, embeds = [], []
+        for part in _split_top_level(select):
+            if "(" in part:
+                name, _, inner = part.partition("(")
+                embeds.append((name.strip(), inner[:-1]))
+            else:
+                columns.append(part)
+        if "*" not in columns:
+            rows = [{key: row[key] for key in columns if key in row} for row in rows]
+        for child, child_select in embeds:
+            foreign_key = RELATIONSHIPS.get((table, child))
+            if foreign_key is None:
+                raise FakePostgrestError(f"Could not find a relationship between '{table}' and '{child}'", "PGRST200")
+            parent_ids = [row["id"] for row in rows if "id" in row]
+            children: Dict[Any, List[dict]] = {parent_id: [] for parent_id in parent_ids}
+            if parent_ids:
+                placeholders = ", ".join("?" for _ in parent_ids)
+                child_rows = self._conn.execute(
+                    f"SELECT * FROM {child} WHERE {foreign_key} IN ({placeholders})", parent_ids
+                ).fetchall()
+                decoded = [self._decode(child, row) for row in child_rows]
+                # Group before projecting, since the selection may leave out the foreign key
+                for child_row, projected in zip(decoded, self._project(child, decoded, child_select)):
+                    children.setdefault(child_row[foreign_key], []).append(projected)
+            for row in rows:
+                row[child] = children.get(row.get("id"), [])
+        return rows
+
+    def _insert(self, table: str, body: Any, on_conflict: Optional[str]) -> List[dict]:
+        rows = body if isinstance(body, list) else [body]
+        inserted = []
+        for row in rows:
+            encoded = self._encode(table, row)
+            keys = list(encoded)
+            sql = f"INSERT INTO {table} ({', '.join(keys)}) VALUES ({', '.join('?' for _ in keys)})"
+            if on_conflict:
+                updates = [key for key in keys if key not in on_conflict.split(",")]
+                action = (
+                    "DO UPDATE SET " + ", ".join(f"{key} = excluded.{key}" for key in updates)
+                    if updates else "DO NOTHING"
+                )
+                sql += f" ON CONFLICT ({on_conflict}) {action}"
+            sql += " RETURNING *"
+            inserted.extend(self._decode(table, r) for r in self._conn.execute(sql, list(encoded.values())).fetchall())
+        self._record_changes(table, "INSERT", inserted)
+        return inserted
+
+    def _update(self, table: str, body: dict, params: List[Tuple[str, str]]) -> List[dict]:
+        changes = dict(body)
+        if "updated_at" in self._table_columns(table) and "updated_at" not in changes:
+            changes["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
+        encoded = self._encode(table, changes)
+        if not encoded:
+            return []
+        where, args = self._where(table, params)
+        assignments = ", ".join(f"{key} = ?" for key in encoded)
+        sql = f"UPDATE {table} SET {assignments}{where} RETURNING *"
+        rows = [self._decode(table, row) for row in self._conn.execute(sql, list(encoded.values()) + args).fetchall()]
+        self._record_changes(table, "UPDATE", rows)
+        return rows
+
+    def _delete(self, table: str, params: List[Tuple[str, str]]) -> List[dict]:
+        where, args = self._where(table, params)
+        rows = [self._decode(table, row) for row in self._conn.execute(f"DELETE FROM {table}{where} RETURNING *", args).fetchall()]
+        self._record_changes(table, "DELETE", rows)
+        return rows
+
+    def _call_rpc(self, name: str, params: dict) -> Any:
+        func = self._rpcs.get(name)
+        if func is None:
+            raise FakePostgrestError(f"Could not find the function public.{name}", "PGRST202", 404)
+        self._conn.execute("BEGIN")
+        try:
+            result = func(self._conn, params)
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+        return result
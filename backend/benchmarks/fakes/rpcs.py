@@ -0,0 +1,228 @@
+"""Python versions of the Postgres functions in ``supabase_schema.sql``.
+
+Each runs inside the fake's per-call transaction, so raising rolls back every
+write the function made, as in Postgres.
+"""
+import random
+import sqlite3
+from typing import List
+
+from benchmarks.fakes.postgrest import FakePostgREST, FakePostgrestError
+
+
+def _rows(cursor: sqlite3.Cursor) -> List[dict]:
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def reserve_inventory(conn: sqlite3.Connection, params: dict) -> List[dict]:
+    quantities = {}
+    for item in params["p_items"]:
+        quantities[int(item["product_id"])] = quantities.get(int(item["product_id"]), 0) + int(item["quantity"])
+
+    reserved = []
+    for product_id in sorted(quantities):
+        remaining = quantities[product_id]
+        shards = conn.execute(
+            "SELECT shard, available FROM inventory_shards WHERE product_id = ? AND available > 0",
+            (product_id,),
+        ).fetchall()
+        random.shuffle(shards)
+        for shard, available in shards:
+            if remaining == 0:
+                break
+            taken = min(available, remaining)
+            conn.execute(
+                "UPDATE inventory_shards SET available = available - ? WHERE product_id = ? AND shard = ? AND available >= ?",
+                (taken, product_id, shard, taken),
+            )
+            remaining -= taken
+            reserved += _rows(conn.execute(
+                "INSERT INTO inventory_reservations (reservation_id, product_id, shard, quantity, expires_at) "
+                "VALUES (?, ?, ?, ?, strftime('%Y-%m-%dT%H:%M:%f', 'now', ?)) RETURNING *",
+                (params["p_reservation_id"], product_id, shard, taken, f"+{int(params['p_ttl_seconds'])} seconds"),
+            ))
+        if remaining > 0:
+            raise FakePostgrestError(f"insufficient_stock:{product_id}")
+    return reserved
+
+
+def _release(conn: sqlite3.Connection, where: str, args: tuple) -> List[dict]:
+    released = _rows(conn.execute(
+        "UPDATE inventory_reservations SET status = 'released', updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now') "
+        f"WHERE status = 'reserved' AND {where} RETURNING *",
+        args,
+    ))
+    for row in released:
+        conn.execute(
+            "UPDATE inventory_shards SET available = available + ? WHERE product_id = ? AND shard = ?",
+            (row["quantity"], row["product_id"], row["shard"]),
+        )
+    return released
+
+
+def release_inventory(conn: sqlite3.Connection, params: dict) -> List[dict]:
+    return _release(conn, "reservation_id = ?", (params["p_reservation_id"],))
+
+
+def release_expired_inventory(conn: sqlite3.Connection, params: dict) -> List[dict]:
+    return _release(
+        conn,
+        "id IN (SELECT id FROM inventory_reservations WHERE status = 'reserved' "
+        "AND expires_at < strftime('%Y-%m-%dT%H:%M:%f', 'now') ORDER BY expires_at LIMIT ?)",
+        (int(params.get("p_limit", 500)),),
+    )
+
+
+def commit_inventory(conn: sqlite3.Connection, params: dict) -> List[dict]:
+    return _rows(conn.execute(
+        "UPDATE inventory_reservations SET status = 'committed', updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now') "
+        "WHERE reservation_id = ? AND status = 'reserved' RETURNING *",
+        (params["p_reservation_id"],),
+    ))
+
+
+def set_product_stock(conn: sqlite3.Connection, params: dict) -> List[dict]:
+    product_id, quantity = params["p_product_id"], params.get("p_quantity")
+    shards = int(params.get("p_shards", 8))
+    conn.execute("UPDATE products SET track_inventory = ? WHERE id = ?", (quantity is not None, product_id))
+    if quantity is None:
+        conn.execute("DELETE FROM inventory_shards WHERE product_id = ?", (product_id,))
+        return []
+    # Open holds count towards the quantity and keep the shards they were taken from
+    held = conn.execute(
+        "SELECT COALESCE(SUM(quantity), 0) FROM inventory_reservations WHERE product_id = ? AND status = 'reserved'",
+        (product_id,),
+    ).fetchone()[0]
+    stock = max(quantity - held, 0)
+    conn.execute(
+        "DELETE FROM inventory_shards WHERE product_id = ? AND shard >= ? AND NOT EXISTS ("
+        "SELECT 1 FROM inventory_reservations r WHERE r.product_id = inventory_shards.product_id "
+        "AND r.shard = inventory_shards.shard AND r.status = 'reserved')",
+        (product_id, shards),
+    )
+    conn.execute("UPDATE inventory_shards SET available = 0 WHERE product_id = ? AND shard >= ?", (product_id, shards))
+    conn.executemany(
+        "INSERT INTO inventory_shards (product_id, shard, available) VALUES (?, ?, ?) "
+        "ON CONFLICT (product_id, shard) DO UPDATE SET available = excluded.available",
+        [(product_id, n, stock // shards + (1 if n < stock % shards else 0)) for n in range(shards)],
+    )
+    return _rows(conn.execute("SELECT * FROM inventory_shards WHERE product_id = ? ORDER BY shard", (product_id,)))
+
+
+def record_order_sales(conn: sqlite3.Connection, params: dict) -> List[dict]:
+    claimed = conn.execute(
+        "UPDATE orders SET sales_recorded_at = strftime('%Y-%m-%dT%H:%M:%f', 'now') "
+        "WHERE id = ? AND status = 'paid' AND sales_recorded_at IS NULL "
+        "RETURNING id, currency, date(sales_recorded_at) AS day",
+        (params["p_order_id"],),
+    ).fetchone()
+    if claimed is None:
+        return []
+    lines = conn.execute(
+        "SELECT i.product_id, COALESCE(p.category, '') AS category, SUM(i.quantity) AS units, "
+        "SUM(i.quantity * i.unit_amount_snapshot) AS gross_amount "
+        "FROM order_items i JOIN products p ON p.id = i.product_id WHERE i.order_id = ? "
+        "GROUP BY i.product_id, p.category",
+        (claimed["id"],),
+    ).fetchall()
+
+    categories = {}
+    for line in lines:
+        units, gross = categories.get(line["category"], (0, 0))
+        categories[line["category"]] = (units + line["units"], gross + line["gross_amount"])
+    for category, (units, gross) in categories.items():
+        conn.execute(
+            "INSERT INTO sales_daily_category (day, category, currency, units, gross_amount, orders) "
+            "VALUES (?, ?, ?, ?, ?, 1) ON CONFLICT (day, category, currency) DO UPDATE SET "
+            "units = units + excluded.units, gross_amount = gross_amount + excluded.gross_amount, orders = orders + 1",
+            (claimed["day"], category, claimed["currency"], units, gross),
+        )
+
+    recorded = []
+    for line in lines:
+        recorded += _rows(conn.execute(
+            "INSERT INTO sales_daily_product (day, product_id, currency, units, gross_amount, orders) "
+            "VALUES (?, ?, ?, ?, ?, 1) ON CONFLICT (day, product_id, currency) DO UPDATE SET "
+            "units = units + excluded.units, gross_amount = gross_amount + excluded.gross_amount, orders = orders + 1 "
+            "RETURNING *",
+            (claimed["day"], line["product_id"], claimed["currency"], line["units"], line["gross_amount"]),
+        ))
+    return recorded
+
+
+def _delete(conn: sqlite3.Connection, table: str, ids: List[int], key: str = "id"):
+    if ids:
+        conn.execute(f"DELETE FROM {table} WHERE {key} IN ({', '.join('?' * len(ids))})", ids)
+
+
+def _archive(conn: sqlite3.Connection, source: str, ids: List[int], key: str = "id", delete: bool = True) -> List[dict]:
+    """Copy ``source`` rows whose ``key`` is in ``ids`` to ``<source>_archive`` (and delete them)."""
+    if not ids:
+        return []
+    archived = _rows(conn.execute(
+        f"INSERT INTO {source}_archive SELECT *, strftime('%Y-%m-%dT%H:%M:%f', 'now') FROM {source} "
+        f"WHERE {key} IN ({', '.join('?' * len(ids))}) RETURNING *",
+        ids,
+    ))
+    if delete:
+        _delete(conn, source, ids, key)
+    return archived
+
+
+def _cutoff(params: dict) -> str:
+    return f"-{int(params['p_older_than_days'])} days"
+
+
+def archive_closed_orders(conn: sqlite3.Connection, params: dict) -> List[dict]:
+    ids = [row[0] for row in conn.execute(
+        "SELECT id FROM orders WHERE updated_at < strftime('%Y-%m-%dT%H:%M:%f', 'now', ?) "
+        "AND (status IN ('failed', 'cancelled') OR (status = 'paid' AND sales_recorded_at IS NOT NULL)) "
+        "ORDER BY updated_at LIMIT ?",
+        (_cutoff(params), int(params.get("p_limit", 500))),
+    )]
+    # Items after their orders (foreign key), and before deleting the orders cascades to them
+    archived = _archive(conn, "orders", ids, delete=False)
+    _archive(conn, "order_items", ids, key="order_id")
+    _delete(conn, "orders", ids)
+    return archived
+
+
+def archive_processed_stripe_events(conn: sqlite3.Connection, params: dict) -> List[dict]:
+    ids = [row[0] for row in conn.execute(
+        "SELECT id FROM stripe_events WHERE processed AND processed_at < strftime('%Y-%m-%dT%H:%M:%f', 'now', ?) "
+        "ORDER BY processed_at LIMIT ?",
+        (_cutoff(params), int(params.get("p_limit", 500))),
+    )]
+    return _archive(conn, "stripe_events", ids)
+
+
+def archive_deleted_products(conn: sqlite3.Connection, params: dict) -> List[dict]:
+    ids = [row[0] for row in conn.execute(
+        "SELECT p.id FROM products p WHERE p.deleted_at < strftime('%Y-%m-%dT%H:%M:%f', 'now', ?) "
+        "AND NOT EXISTS (SELECT 1 FROM order_items i WHERE i.product_id = p.id) "
+        "AND NOT EXISTS (SELECT 1 FROM inventory_reservations r WHERE r.product_id = p.id AND r.status = 'reserved') "
+        "ORDER BY p.deleted_at LIMIT ?",
+        (_cutoff(params), int(params.get("p_limit", 500))),
+    )]
+    # Finished holds (committed or released) go with the product, before it (foreign key)
+    _archive(conn, "inventory_reservations", ids, key="product_id")
+    return _archive(conn, "products", ids)
+
+
+RPCS = {
+    "reserve_inventory": reserve_inventory,
+    "release_inventory": release_inventory,
+    "release_expired_inventory": release_expired_inventory,
+    "commit_inventory": commit_inventory,
+    "set_product_stock": set_product_stock,
+    "record_order_sales": record_order_sales,
+    "archive_closed_orders": archive_closed_orders,
+    "archive_processed_stripe_events": archive_processed_stripe_events,
+    "archive_deleted_products": archive_deleted_products,
+}
+
+
+def register_rpcs(db: FakePostgREST):
+    """Register every schema function on ``db``."""
+    for name, func in RPCS.items():
+        db.register_rpc(name, func)
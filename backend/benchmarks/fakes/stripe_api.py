@@ -0,0 +1,221 @@
+"""In-process stand-in for the Stripe HTTP API.
+
+``FakeStripe`` plugs into the ``stripe`` library as its HTTP client, so
+``app.stripe_client`` runs unchanged while products, prices and checkout
+sessions live in memory. It also builds signed webhook payloads.
+"""
+import hashlib
+import hmac
+import itertools
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from stripe.http_client import HTTPClient
+
+_ROUTES = [
+    (re.compile(r"^/v1/products$"), "products", False),
+    (re.compile(r"^/v1/products/(?P<id>[^/]+)$"), "products", True),
+    (re.compile(r"^/v1/prices$"), "prices", False),
+    (re.compile(r"^/v1/prices/(?P<id>[^/]+)$"), "prices", True),
+    (re.compile(r"^/v1/checkout/sessions$"), "checkout_sessions", False),
+    (re.compile(r"^/v1/checkout/sessions/(?P<id>[^/]+)$"), "checkout_sessions", True),
+    (re.compile(r"^/v1/checkout/sessions/(?P<id>[^/]+)/expire$"), "checkout_sessions", True),
+]
+
+# Stripe's minimum lifetime for a checkout session, checked against expires_at on creation
+MIN_SESSION_EXPIRY_SECONDS = 1800
+
+_ID_PREFIXES = {"products": "prod", "prices": "price", "checkout_sessions": "cs_test"}
+_OBJECT_NAMES = {"products": "product", "prices": "price", "checkout_sessions": "checkout.session"}
+
+
+def _coerce(value: str) -> Any:
+    if value in ("true", "false"):
+        return value == "true"
+    if re.fullmatch(r"-?\d+", value):
+        return int(value)
+    return value
+
+
+def decode_form(post_data: Optional[str]) -> Dict[str, Any]:
+    """Decode Stripe's bracketed form encoding (``line_items[0][price]=...``)."""
+    result: Dict[str, Any] = {}
+    for key, value in parse_qsl(post_data or "", keep_blank_values=True):
+        parts = re.findall(r"[^\[\]]+", key)
+        target = result
+        for part, following in zip(parts, parts[1:]):
+            container = [] if following.isdigit() else {}
+            if isinstance(target, list):
+                index = int(part)
+                while len(target) <= index:
+                    target.append(None)
+                if target[index] is None:
+                    target[index] = container
+                target = target[index]
+            else:
+                target = target.setdefault(part, container)
+        last = parts[-1]
+        if isinstance(target, list):
+            index = int(last)
+            while len(target) <= index:
+                target.append(None)
+            target[index] = _coerce(value)
+        else:
+            target[last] = _coerce(value)
+    return result
+
+
+def sign_payload(payload: str, secret: str, timestamp: Optional[int] = None) -> str:
+    """Build a ``Stripe-Signature`` header value for a webhook payload."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signed = f"{timestamp}.{payload}".encode("utf-8")
+    signature = hmac.new(secret.encode("utf-8"), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+class FakeStripe(HTTPClient):
+    """Stripe API double backed by in-memory dictionaries.
+
+    Args:
+        latency: Seconds to sleep per request, emulating the network round trip.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.request_count = 0
+        self._objects: Dict[str, Dict[str, dict]] = {kind: {} for kind in _ID_PREFIXES}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # HTTPClient interface
+    # ------------------------------------------------------------------
+
+    def request(self, method, url, headers, post_data=None):
+        if self.latency:
+            time.sleep(self.latency)
+        self.request_count += 1
+
+        path, _, query = re.sub(r"^https?://[^/]+", "", url).partition("?")
+        params = decode_form(post_data if method.lower() == "post" else query)
+        with self._lock:
+            status, body = self._dispatch(method.lower(), path, params)
+        return json.dumps(body), status, {"request-id": f"req_{next(self._ids)}"}
+
+    def request_stream(self, method, url, headers, post_data=None):
+        raise NotImplementedError("Streaming is not supported by the fake Stripe API")
+
+    def close(self):
+        pass
+
+    # ------------------------------------------------------------------
+    # Helpers for driving webhook scenarios
+    # ------------------------------------------------------------------
+
+    def get(self, kind: str, object_id: str) -> Optional[dict]:
+        return self._objects[kind].get(object_id)
+
+    def complete_checkout_session(self, session_id: str, email: str = "customer@example.com") -> dict:
+        """Mark a session paid and return the ``checkout.session.completed`` event."""
+        with self._lock:
+            session = self._objects["checkout_sessions"][session_id]
+            session.update({
+                "status": "complete",
+                "payment_status": "paid",
+                "customer_details": {"email": email},
+            })
+            return self.build_event("checkout.session.completed", dict(session))
+
+    def expire_checkout_session(self, session_id: str) -> dict:
+        """Mark a session expired and return the ``checkout.session.expired`` event."""
+        with self._lock:
+            session = self._objects["checkout_sessions"][session_id]
+            session.update({"status": "expired"})
+            return self.build_event("checkout.session.expired", dict(session))
+
+    def build_event(self, event_type: str, obj: dict) -> dict:
+        return {
+            "id": f"evt_{next(self._ids):06d}",
+            "object": "event",
+            "api_version": "2023-10-16",
+            "created": int(time.time()),
+            "type": event_type,
+            "data": {"object": obj},
+        }
+
+    def webhook_request(self, event: dict, secret: str) -> Tuple[str, Dict[str, str]]:
+        """Serialize an event and return ``(payload, headers)`` for ``POST /stripe/webhook``."""
+        payload = json.dumps(event)
+        return payload, {"stripe-signature": sign_payload(payload, secret), "content-type": "application/json"}
+
+    # ------------------------------------------------------------------
+    # Resource handlers
+    # ------------------------------------------------------------------
+
+    def _dispatch(self, method: str, path: str, params: dict) -> Tuple[int, dict]:
+        for pattern, kind, has_id in _ROUTES:
+            match = pattern.match(path)
+            if not match:
+                continue
+            if not has_id:
+                if method == "get":
+                    return 200, self._list(kind, params)
+                if method != "post":
+                    break
+                expires_at = params.get("expires_at")
+                if kind == "checkout_sessions" and expires_at and expires_at < time.time() + MIN_SESSION_EXPIRY_SECONDS:
+                    return 400, self._error("The `expires_at` timestamp must be at least 30 minutes from Checkout Session creation.")
+                return 200, self._create(kind, params)
+            obj = self._objects[kind].get(match.group("id"))
+            if obj is None:
+                return 404, self._error(f"No such {_OBJECT_NAMES[kind]}: '{match.group('id')}'")
+            if path.endswith("/expire"):
+                if obj.get("status") != "open":
+                    return 400, self._error(f"Only open sessions can be expired (status: {obj.get('status')})")
+                obj["status"] = "expired"
+            elif method == "post":
+                obj.update(params)
+            return 200, obj
+        return 404, self._error(f"Unrecognized request URL ({method.upper()}: {path})")
+
+    def _create(self, kind: str, params: dict) -> dict:
+        object_id = f"{_ID_PREFIXES[kind]}_{next(self._ids):08d}"
+        obj = {"id": object_id, "object": _OBJECT_NAMES[kind], "livemode": False, "created": int(time.time())}
+        if kind == "products":
+            obj.update({"active": True, "images": [], "description": None})
+        elif kind == "prices":
+            obj.update({"active": True, "type": "one_time"})
+        else:
+            amount_total = 0
+            for line in params.get("line_items", []):
+                price = self._objects["prices"].get(line.get("price"), {})
+                amount_total += price.get("unit_amount", 0) * line.get("quantity", 1)
+            obj.update({
+                "url": f"https://checkout.stripe.test/c/pay/{object_id}",
+                "status": "open",
+                "payment_status": "unpaid",
+                "amount_total": amount_total,
+                "currency": "usd",
+                "customer_details": None,
+                "client_reference_id": None,
+                "metadata": {},
+            })
+        obj.update(params)
+        self._objects[kind][object_id] = obj
+        return obj
+
+    def _list(self, kind: str, params: dict) -> dict:
+        objects = list(self._objects[kind].values())
+        limit = params.get("limit", 10)
+        return {"object": "list", "url": f"/v1/{kind}", "data": objects[:limit], "has_more": len(objects) > limit}
+
+    @staticmethod
+    def _error(message: str) -> dict:
+        return {"error": {"type": "invalid_request_error", "message": message}}
@@ -0,0 +1,100 @@
+"""Boot the FastAPI app against the local Stripe and Supabase stand-ins."""
+import os
+import random
+from dataclasses import dataclass, field
+from typing import List
+
+from benchmarks.fakes import FAKE_SUPABASE_KEY, FAKE_SUPABASE_URL, FakePostgREST, FakeStripe, register_rpcs
+
+WEBHOOK_SECRET = "whsec_benchmark"
+
+CATEGORIES = ["apparel", "books", "electronics", "home", "outdoors", "toys"]
+WORDS = ["classic", "deluxe", "eco", "mini", "pro", "smart", "travel", "vintage", "wireless", "organic"]
+
+
+def configure_environment():
+    """Point settings at the fakes; must run before ``app.config`` is imported."""
+    os.environ.update({
+        "SUPABASE_URL": FAKE_SUPABASE_URL,
+        "SUPABASE_KEY": FAKE_SUPABASE_KEY,
+        "STRIPE_SECRET_KEY": "sk_test_benchmark",
+        "STRIPE_PUBLISHABLE_KEY": "pk_test_benchmark",
+        "STRIPE_WEBHOOK_SECRET": WEBHOOK_SECRET,
+    })
+    # Budget overruns surface as failed requests in the report
+    os.environ.setdefault("QUERY_BUDGET_MODE", "raise")
+    # The load generator is a single client; per-client rate limits would reject most of its requests
+    os.environ.setdefault("CHECKOUT_RATE_LIMIT_PER_MINUTE", "0")
+    os.environ.setdefault("STRIPE_SYNC_RATE_LIMIT_PER_MINUTE", "0")
+
+
+@dataclass
+class BenchContext:
+    """Everything a scenario needs to build requests."""
+    app: object
+    db: FakePostgREST
+    stripe: FakeStripe
+    product_ids: List[int] = field(default_factory=list)
+    categories: List[str] = field(default_factory=lambda: list(CATEGORIES))
+    search_terms: List[str] = field(default_factory=lambda: list(WORDS))
+    rng: random.Random = field(default_factory=lambda: random.Random(1234))
+
+
+def build_context(db_latency: float = 0.0, stripe_latency: float = 0.0, products: int = 200) -> BenchContext:
+    """Create the app wired to fresh fakes and seed a catalog."""
+    configure_environment()
+
+    import stripe
+    from app import database
+    from app.change_feed import ChangeEvent, feed
+    from app.main import app
+
+    db = FakePostgREST(latency=db_latency)
+    register_rpcs(db)
+    fake_stripe = FakeStripe(latency=stripe_latency)
+    stripe.default_http_client = fake_stripe
+    # The replica shares the primary's data, so routing is exercised without lag
+    database.use_supabase_client(db.create_client(), read_client=db.create_client())
+    # Deliver the fake's write notifications as if they came from LISTEN/NOTIFY
+    db.on_change(lambda table, op, row: feed.publish(
+        ChangeEvent(table, op, row.get("id"), None if op == "DELETE" else row, origin="postgres")
+    ))
+
+    context = BenchContext(app=app, db=db, stripe=fake_stripe)
+    context.product_ids = seed_catalog(context, products)
+    return context
+
+
+def seed_catalog(context: BenchContext, count: int) -> List[int]:
+    """Insert ``count`` published, Stripe-synced products and return their ids."""
+    rng = random.Random(42)
+    rows = []
+    for index in range(count):
+        title = f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} item {index}"
+        amount = rng.randint(5, 500) * 100
+        stripe_product = context.stripe._create("products", {"name": title})
+        stripe_price = context.stripe._create("prices", {
+            "product": stripe_product["id"], "unit_amount": amount, "currency": "usd",
+        })
+        rows.append({
+            "title": title,
+            "description": f"A {rng.choice(WORDS)} product for benchmarking",
+            "images": [f"https://images.example.com/{index}.jpg"],
+            "category": CATEGORIES[index % len(CATEGORIES)],
+            "currency": "usd",
+            "current_price_amount": amount,
+            "published": index % 10 != 0,
+            # Every third product tracks inventory, so checkouts exercise reservations
+            "track_inventory": index % 3 == 0,
+            "stripe_product_id": stripe_product["id"],
+            "active_stripe_price_id": stripe_price["id"],
+            "last_sync_status": "success",
+        })
+    inserted = context.db.seed("products", rows)
+
+    context.db.seed("inventory_shards", [
+        {"product_id": row["id"], "shard": shard, "available": 100_000}
+        for row in inserted if row["track_inventory"]
+        for shard in range(8)
+    ])
+    return [row["id"] for row in inserted if row["published"]]
@@ -0,0 +1,155 @@
+"""Run the offline load scenarios and report throughput and latency percentiles.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios browse,checkout --requests 1000 --concurrency 50
+    python -m benchmarks.run --json baseline.json
+    python -m benchmarks.run --baseline baseline.json --max-regression 0.25
+
+With ``--baseline`` the process exits non-zero when any endpoint's p95 grows,
+or its throughput drops, by more than ``--max-regression`` (a fraction).
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.harness import build_context
+from benchmarks.scenarios import SCENARIOS
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``samples`` (``pct`` in 0-100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+async def run_scenario(context, scenario, requests: int, concurrency: int) -> List[dict]:
+    """Drive one scenario and return a result row per endpoint."""
+    transport = httpx.ASGITransport(app=context.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await scenario.setup(context, client, requests)
+        specs = [scenario.next_request(context, index) for index in range(requests)]
+
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        errors: Dict[str, int] = defaultdict(int)
+        queue: asyncio.Queue = asyncio.Queue()
+        for spec in specs:
+            queue.put_nowait(spec)
+
+        async def worker():
+            while not queue.empty():
+                spec = queue.get_nowait()
+                started = time.perf_counter()
+                try:
+                    response = await client.request(spec.method, spec.url, **spec.kwargs)
+                    failed = response.status_code >= 400
+                except Exception:
+                    failed = True
+                latencies[spec.endpoint].append((time.perf_counter() - started) * 1000)
+                if failed:
+                    errors[spec.endpoint] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return [
+        {
+            "scenario": scenario.name,
+            "endpoint": endpoint,
+            "requests": len(samples),
+            "errors": errors[endpoint],
+            "throughput_rps": len(samples) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(samples, 50),
+            "p95_ms": percentile(samples, 95),
+            "p99_ms": percentile(samples, 99),
+        }
+        for endpoint, samples in sorted(latencies.items())
+    ]
+
+
+def print_report(rows: List[dict]):
+    header = f"{'scenario':<10} {'endpoint':<34} {'reqs':>6} {'errs':>5} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['scenario']:<10} {row['endpoint']:<34} {row['requests']:>6} {row['errors']:>5} "
+            f"{row['throughput_rps']:>9.1f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f}"
+        )
+
+
+def compare_to_baseline(rows: List[dict], baseline: List[dict], max_regression: float) -> List[str]:
+    """Return a description of every endpoint that regressed beyond the threshold."""
+    previous = {(row["scenario"], row["endpoint"]): row for row in baseline}
+    failures = []
+    for row in rows:
+        before = previous.get((row["scenario"], row["endpoint"]))
+        if not before:
+            continue
+        label = f"{row['scenario']} {row['endpoint']}"
+        if before["p95_ms"] and row["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            failures.append(f"{label}: p95 {before['p95_ms']:.2f}ms -> {row['p95_ms']:.2f}ms")
+        if before["throughput_rps"] and row["throughput_rps"] < before["throughput_rps"] * (1 - max_regression):
+            failures.append(f"{label}: throughput {before['throughput_rps']:.1f} -> {row['throughput_rps']:.1f} rps")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenario names")
+    parser.add_argument("--requests", type=int, default=300, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent in-flight requests")
+    parser.add_argument("--products", type=int, default=200, help="Catalog size to seed")
+    parser.add_argument("--db-latency-ms", type=float, default=2.0, help="Simulated Supabase round trip")
+    parser.add_argument("--stripe-latency-ms", type=float, default=20.0, help="Simulated Stripe round trip")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a previous --json output")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed fractional regression")
+    args = parser.parse_args(argv)
+
+    context = build_context(
+        db_latency=args.db_latency_ms / 1000,
+        stripe_latency=args.stripe_latency_ms / 1000,
+        products=args.products,
+    )
+
+    rows = []
+    for name in args.scenarios.split(","):
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        rows.extend(asyncio.run(run_scenario(context, SCENARIOS[name](), args.requests, args.concurrency)))
+
+    print_report(rows)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(rows, f, indent=2)
+
+    status = 0
+    if any(row["errors"] for row in rows):
+        print("\nSome requests failed; see the errs column.", file=sys.stderr)
+        status = 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare_to_baseline(rows, json.load(f), args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        if failures:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""Load scenarios for the storefront, checkout and webhook hot paths."""
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.harness import WEBHOOK_SECRET, BenchContext
+
+
+@dataclass
+class RequestSpec:
+    """One request issued by a scenario; ``endpoint`` is the reporting label."""
+    endpoint: str
+    method: str
+    url: str
+    kwargs: Dict = field(default_factory=dict)
+
+
+class Scenario:
+    """Base scenario: optional async setup, then one request per index."""
+    name = ""
+    description = ""
+
+    async def setup(self, context: BenchContext, client: httpx.AsyncClient, requests: int):
+        pass
+
+    def next_request(self, context: BenchContext, index: int) -> RequestSpec:
+        raise NotImplementedError
+
+
+class BrowseScenario(Scenario):
+    name = "browse"
+    description = "Storefront listing, unfiltered and by category, and the category facets"
+
+    def next_request(self, context, index):
+        if index % 6 == 0:
+            return RequestSpec("GET /products/categories", "GET", "/products/categories")
+        if index % 3 == 0:
+            return RequestSpec("GET /products", "GET", "/products")
+        category = context.rng.choice(context.categories)
+        return RequestSpec("GET /products?category", "GET", "/products", {"params": {"category": category}})
+
+
+class SearchScenario(Scenario):
+    name = "search"
+    description = "Storefront search by title/description term"
+
+    def next_request(self, context, index):
+        params = {"search": context.rng.choice(context.search_terms)}
+        if index % 4 == 0:
+            params["category"] = context.rng.choice(context.categories)
+        return RequestSpec("GET /products?search", "GET", "/products", {"params": params})
+
+
+class ProductDetailScenario(Scenario):
+    name = "product"
+    description = "Product page and cart rehydration lookups by ID, half revalidated with If-None-Match"
+
+    def __init__(self):
+        self._etags: Dict[int, str] = {}
+
+    async def setup(self, context, client, requests):
+        for product_id in context.product_ids:
+            response = await client.get(f"/products/{product_id}")
+            response.raise_for_status()
+            self._etags[product_id] = response.headers["etag"]
+
+    def next_request(self, context, index):
+        if index % 4 == 0:
+            ids = ",".join(str(product_id) for product_id in context.rng.sample(context.product_ids, 5))
+            return RequestSpec("GET /products?ids", "GET", "/products", {"params": {"ids": ids}})
+        product_id = context.rng.choice(context.product_ids)
+        headers = {"if-none-match": self._etags[product_id]} if index % 2 else {}
+        return RequestSpec("GET /products/{id}", "GET", f"/products/{product_id}", {"headers": headers})
+
+
+def _cart(context: BenchContext) -> List[dict]:
+    size = context.rng.randint(1, 5)
+    return [
+        {"product_id": product_id, "quantity": context.rng.randint(1, 3)}
+        for product_id in context.rng.sample(context.product_ids, size)
+    ]
+
+
+def _checkout_body(context: BenchContext) -> dict:
+    return {
+        "items": _cart(context),
+        "success_url": "http://localhost:3000/success?session_id={CHECKOUT_SESSION_ID}",
+        "cancel_url": "http://localhost:3000/cancel",
+    }
+
+
+class CartQuoteScenario(Scenario):
+    name = "quote"
+    description = "Cart re-pricing on every cart change, 1-5 item carts"
+
+    def next_request(self, context, index):
+        return RequestSpec("POST /cart/quote", "POST", "/cart/quote", {"json": {"items": _cart(context)}})
+
+
+class CheckoutScenario(Scenario):
+    name = "checkout"
+    description = "Checkout session creation for 1-5 item carts"
+
+    def next_request(self, context, index):
+        return RequestSpec("POST /checkout/session", "POST", "/checkout/session", {"json": _checkout_body(context)})
+
+
+class WebhookBurstScenario(Scenario):
+    name = "webhook"
+    description = "Burst of signed checkout.session.completed events, ~10% redelivered"
+
+    def __init__(self):
+        self._deliveries: List[tuple] = []
+
+    async def setup(self, context, client, requests):
+        unique = max(1, int(requests * 0.9))
+        events = []
+        for _ in range(unique):
+            response = await client.post("/checkout/session", json=_checkout_body(context))
+            response.raise_for_status()
+            session_id = response.json()["session_id"]
+            events.append(context.stripe.complete_checkout_session(session_id))
+        deliveries = list(events)
+        while len(deliveries) < requests:
+            deliveries.append(context.rng.choice(events))
+        context.rng.shuffle(deliveries)
+        self._deliveries = [context.stripe.webhook_request(event, WEBHOOK_SECRET) for event in deliveries]
+
+    def next_request(self, context, index):
+        payload, headers = self._deliveries[index % len(self._deliveries)]
+        return RequestSpec("POST /stripe/webhook", "POST", "/stripe/webhook", {"content": payload, "headers": headers})
+
+
+class OrderLookupScenario(Scenario):
+    name = "orders"
+    description = "Success-page order lookups by checkout session, many per session"
+
+    def __init__(self):
+        self._session_ids: List[str] = []
+
+    async def setup(self, context, client, requests):
+        for _ in range(max(1, requests // 10)):
+            response = await client.post("/checkout/session", json=_checkout_body(context))
+            response.raise_for_status()
+            self._session_ids.append(response.json()["session_id"])
+
+    def next_request(self, context, index):
+        session_id = context.rng.choice(self._session_ids)
+        return RequestSpec("GET /orders/by-session/{id}", "GET", f"/orders/by-session/{session_id}")
+
+
+class AdminScenario(Scenario):
+    name = "admin"
+    description = "Admin create, update, resync and delete (Stripe sync on the write path)"
+
+    def __init__(self):
+        self._disposable: List[int] = []
+
+    async def setup(self, context, client, requests):
+        rows = context.db.seed("products", [
+            {"title": f"Disposable {index}", "current_price_amount": 1000, "images": []}
+            for index in range(requests // 4 + 1)
+        ])
+        self._disposable = [row["id"] for row in rows]
+
+    def next_request(self, context, index):
+        step = index % 4
+        if step == 0:
+            body = {"title": f"New product {index}", "current_price_amount": 2500, "category": "books", "published": True}
+            return RequestSpec("POST /products/admin", "POST", "/products/admin", {"json": body})
+        if step == 1:
+            product_id = context.rng.choice(context.product_ids)
+            body = {"current_price_amount": context.rng.randint(5, 500) * 100}
+            return RequestSpec("PUT /products/admin/{id}", "PUT", f"/products/admin/{product_id}", {"json": body})
+        if step == 2:
+            product_id = context.rng.choice(context.product_ids)
+            return RequestSpec("POST /products/admin/{id}/resync", "POST", f"/products/admin/{product_id}/resync")
+        product_id = self._disposable[(index // 4) % len(self._disposable)]
+        return RequestSpec("DELETE /products/admin/{id}", "DELETE", f"/products/admin/{product_id}")
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        BrowseScenario, SearchScenario, ProductDetailScenario, CartQuoteScenario, CheckoutScenario, WebhookBurstScenario, OrderLookupScenario, AdminScenario,
+    )
+}
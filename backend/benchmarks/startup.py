@@ -0,0 +1,127 @@
+"""Measure cold start: import time, time to ready, and first-request latency.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 5 --products 2000 --db-latency-ms 5
+
+Each run boots the app in a fresh interpreter against the local fakes, enters
+the lifespan, polls ``GET /health/ready`` until it answers 200, and then times
+the first and a repeated request to a few hot endpoints. Runs alternate
+between warm-up enabled and ``WARMUP_ENABLED=false``; the report shows the
+median of each. The fakes model round-trip latency but not connection or TLS
+setup, so the first-request gap shown here comes from the caches alone.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+FIRST_REQUESTS = [
+    ("GET /products/{id}", "GET", "/products/{product_id}", None),
+    ("GET /products/categories", "GET", "/products/categories", None),
+    ("POST /checkout/session", "POST", "/checkout/session", "checkout"),
+]
+
+
+async def _measure(context, timings: Dict[str, float]):
+    from benchmarks.scenarios import _checkout_body
+
+    app = context.app
+    started = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        timings["lifespan_ms"] = (time.perf_counter() - started) * 1000
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            while (await client.get("/health/ready")).status_code != 200:
+                await asyncio.sleep(0.002)
+            timings["ready_ms"] = (time.perf_counter() - started) * 1000
+
+            product_id = context.product_ids[0]
+            for label, method, url, body in FIRST_REQUESTS:
+                for attempt in ("first", "repeat"):
+                    kwargs = {"json": _checkout_body(context)} if body == "checkout" else {}
+                    request_started = time.perf_counter()
+                    response = await client.request(method, url.format(product_id=product_id), **kwargs)
+                    response.raise_for_status()
+                    timings[f"{label} {attempt}_ms"] = (time.perf_counter() - request_started) * 1000
+
+
+def run_child(args) -> Dict[str, float]:
+    """One boot in this (fresh) interpreter."""
+    from benchmarks.harness import build_context, configure_environment
+
+    configure_environment()
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    import app.main  # noqa: F401  (timed: the first import of the app)
+    timings["import_ms"] = (time.perf_counter() - started) * 1000
+
+    context = build_context(
+        db_latency=args.db_latency_ms / 1000,
+        stripe_latency=args.stripe_latency_ms / 1000,
+        products=args.products,
+    )
+    asyncio.run(_measure(context, timings))
+    return timings
+
+
+def boot(args, warmup: bool) -> Dict[str, float]:
+    command = [
+        sys.executable, "-m", "benchmarks.startup", "--child",
+        "--products", str(args.products),
+        "--db-latency-ms", str(args.db_latency_ms),
+        "--stripe-latency-ms", str(args.stripe_latency_ms),
+    ]
+    env = dict(os.environ, WARMUP_ENABLED="true" if warmup else "false")
+    output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_report(results: Dict[str, List[Dict[str, float]]]):
+    metrics = list(results["warm-up"][0])
+    header = f"{'metric':<40} {'warm-up ms':>12} {'no warm-up ms':>14}"
+    print(header)
+    print("-" * len(header))
+    for metric in metrics:
+        label = metric[:-3]
+        warm = statistics.median(run[metric] for run in results["warm-up"])
+        cold = statistics.median(run[metric] for run in results["no warm-up"])
+        print(f"{label:<40} {warm:>12.2f} {cold:>14.2f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Boots per mode; the median is reported")
+    parser.add_argument("--products", type=int, default=1000, help="Catalog size to seed")
+    parser.add_argument("--db-latency-ms", type=float, default=5.0, help="Simulated Supabase round trip")
+    parser.add_argument("--stripe-latency-ms", type=float, default=50.0, help="Simulated Stripe round trip")
+    parser.add_argument("--json", dest="json_path", help="Write the raw timings to this JSON file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_child(args)))
+        return 0
+
+    results = {"warm-up": [], "no warm-up": []}
+    for _ in range(args.runs):
+        results["warm-up"].append(boot(args, warmup=True))
+        results["no warm-up"].append(boot(args, warmup=False))
+    print_report(results)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,6 +14,7 @@ CREATE TABLE IF NOT EXISTS products (
     currency VARCHAR(3) NOT NULL DEFAULT 'usd',
     current_price_amount INTEGER NOT NULL,  -- in minor units (cents)
     published BOOLEAN DEFAULT FALSE,
+    track_inventory BOOLEAN DEFAULT FALSE,  -- stock kept in inventory_shards; untracked products never sell out
     
     -- Stripe integration fields
     stripe_product_id VARCHAR(255),
@@ -27,11 +28,15 @@ CREATE TABLE IF NOT EXISTS products (
     deleted_at TIMESTAMP  -- soft delete
 );
 
+-- Columns added since the first release, for databases created before them
+ALTER TABLE products ADD COLUMN IF NOT EXISTS track_inventory BOOLEAN DEFAULT FALSE;
+
 -- Indexes for products
 CREATE INDEX IF NOT EXISTS idx_products_published ON products(published) WHERE deleted_at IS NULL;
 CREATE INDEX IF NOT EXISTS idx_products_stripe_product_id ON products(stripe_product_id);
 CREATE INDEX IF NOT EXISTS idx_products_category ON products(category) WHERE deleted_at IS NULL;
 CREATE INDEX IF NOT EXISTS idx_products_deleted_at ON products(deleted_at) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_products_archivable ON products(deleted_at) WHERE deleted_at IS NOT NULL;
 
 -- Orders table
 CREATE TABLE IF NOT EXISTS orders (
@@ -41,15 +46,20 @@ CREATE TABLE IF NOT EXISTS orders (
     total_amount_snapshot INTEGER NOT NULL,  -- in minor units
     currency VARCHAR(3) NOT NULL DEFAULT 'usd',
     customer_email VARCHAR(255),
+    sales_recorded_at TIMESTAMP,  -- set once the paid order is counted in the sales rollups
     
     -- Metadata
     created_at TIMESTAMP DEFAULT NOW(),
     updated_at TIMESTAMP DEFAULT NOW()
 );
 
+-- Columns added since the first release, for databases created before them
+ALTER TABLE orders ADD COLUMN IF NOT EXISTS sales_recorded_at TIMESTAMP;
+
 -- Indexes for orders
 CREATE INDEX IF NOT EXISTS idx_orders_session_id ON orders(stripe_checkout_session_id);
 CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
+CREATE INDEX IF NOT EXISTS idx_orders_updated_at ON orders(updated_at);
 
 -- Order items table
 CREATE TABLE IF NOT EXISTS order_items (
@@ -77,6 +87,7 @@ CREATE TABLE IF NOT EXISTS stripe_events (
 
 -- Index for stripe_events
 CREATE UNIQUE INDEX IF NOT EXISTS idx_stripe_events_event_id ON stripe_events(stripe_event_id);
+CREATE INDEX IF NOT EXISTS idx_stripe_events_processed_at ON stripe_events(processed_at) WHERE processed;
 
 -- Function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -94,3 +105,388 @@ CREATE TRIGGER update_products_updated_at BEFORE UPDATE ON products
 -- Trigger to auto-update updated_at on orders
 CREATE TRIGGER update_orders_updated_at BEFORE UPDATE ON orders
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Change feed: announce row changes on products and orders so every backend
+-- worker can update or invalidate its in-process state (see app/change_feed.py)
+CREATE OR REPLACE FUNCTION notify_row_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    payload JSONB;
+BEGIN
+    payload := jsonb_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'id', CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END,
+        'record', CASE WHEN TG_OP = 'DELETE' THEN NULL ELSE to_jsonb(NEW) END
+    );
+    -- NOTIFY payloads are limited to 8000 bytes; listeners re-read the row by id
+    IF octet_length(payload::text) > 7900 THEN
+        payload := payload - 'record';
+    END IF;
+    PERFORM pg_notify('row_changes', payload::text);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER products_change_feed AFTER INSERT OR UPDATE OR DELETE ON products
+    FOR EACH ROW EXECUTE FUNCTION notify_row_change();
+
+CREATE TRIGGER orders_change_feed AFTER INSERT OR UPDATE OR DELETE ON orders
+    FOR EACH ROW EXECUTE FUNCTION notify_row_change();
+
+-- Inventory: a tracked product's available stock is split across several
+-- inventory_shards rows, so concurrent checkouts of a hot product decrement
+-- different rows instead of queueing behind one row lock
+-- (see app/services/inventory_service.py)
+CREATE TABLE IF NOT EXISTS inventory_shards (
+    product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    shard SMALLINT NOT NULL,
+    available INTEGER NOT NULL CHECK (available >= 0),
+    PRIMARY KEY (product_id, shard)
+);
+
+-- Stock held by a checkout; one row per shard it was taken from
+CREATE TABLE IF NOT EXISTS inventory_reservations (
+    id SERIAL PRIMARY KEY,
+    reservation_id VARCHAR(64) NOT NULL,  -- one per checkout, sent to Stripe as client_reference_id
+    product_id INTEGER NOT NULL REFERENCES products(id),
+    shard SMALLINT NOT NULL,
+    quantity INTEGER NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'reserved',  -- 'reserved', 'committed', 'released'
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_inventory_reservations_reservation_id ON inventory_reservations(reservation_id);
+CREATE INDEX IF NOT EXISTS idx_inventory_reservations_expires_at ON inventory_reservations(expires_at) WHERE status = 'reserved';
+
+-- Reserve every item of a cart ([{"product_id": 1, "quantity": 2}, ...]) in
+-- one transaction, or nothing: raises 'insufficient_stock:<product_id>' when
+-- a product cannot be covered. Each shard is decremented with a conditional
+-- UPDATE; the first pass skips shards locked by other checkouts. If that is
+-- not enough, the pass is rolled back (its subtransaction releases the shard
+-- locks it took in random order) and the product is reserved again waiting
+-- for every shard in shard order, so two checkouts cannot deadlock on it.
+CREATE OR REPLACE FUNCTION reserve_inventory(p_reservation_id TEXT, p_items JSONB, p_ttl_seconds INTEGER)
+RETURNS SETOF inventory_reservations AS $$
+DECLARE
+    item RECORD;
+    candidate RECORD;
+    remaining INTEGER;
+    taken INTEGER;
+    expires TIMESTAMP := NOW() + make_interval(secs => p_ttl_seconds);
+BEGIN
+    FOR item IN
+        SELECT (value->>'product_id')::INTEGER AS product_id, SUM((value->>'quantity')::INTEGER) AS quantity
+        FROM jsonb_array_elements(p_items)
+        GROUP BY 1
+        ORDER BY 1
+    LOOP
+        remaining := item.quantity;
+
+        BEGIN
+            FOR candidate IN
+                SELECT s.shard, s.available FROM inventory_shards s
+                WHERE s.product_id = item.product_id AND s.available > 0
+                ORDER BY random()
+                FOR UPDATE SKIP LOCKED
+            LOOP
+                EXIT WHEN remaining = 0;
+                taken := LEAST(candidate.available, remaining);
+                UPDATE inventory_shards SET available = available - taken
+                WHERE product_id = item.product_id AND shard = candidate.shard AND available >= taken;
+                remaining := remaining - taken;
+                INSERT INTO inventory_reservations (reservation_id, product_id, shard, quantity, expires_at)
+                VALUES (p_reservation_id, item.product_id, candidate.shard, taken, expires);
+            END LOOP;
+            IF remaining > 0 THEN
+                RAISE EXCEPTION 'retry_in_shard_order';
+            END IF;
+        EXCEPTION WHEN raise_exception THEN
+            remaining := item.quantity;
+        END;
+
+        -- Not enough in unlocked shards: wait for all of them, in a fixed order
+        IF remaining > 0 THEN
+            FOR candidate IN
+                SELECT s.shard, s.available FROM inventory_shards s
+                WHERE s.product_id = item.product_id AND s.available > 0
+                ORDER BY s.shard
+                FOR UPDATE
+            LOOP
+                EXIT WHEN remaining = 0;
+                taken := LEAST(candidate.available, remaining);
+                UPDATE inventory_shards SET available = available - taken
+                WHERE product_id = item.product_id AND shard = candidate.shard AND available >= taken;
+                remaining := remaining - taken;
+                INSERT INTO inventory_reservations (reservation_id, product_id, shard, quantity, expires_at)
+                VALUES (p_reservation_id, item.product_id, candidate.shard, taken, expires);
+            END LOOP;
+        END IF;
+
+        IF remaining > 0 THEN
+            RAISE EXCEPTION 'insufficient_stock:%', item.product_id;
+        END IF;
+    END LOOP;
+
+    -- Returned at the end: rows added to the result inside a rolled-back pass would stay in it
+    RETURN QUERY SELECT * FROM inventory_reservations WHERE reservation_id = p_reservation_id ORDER BY id;
+END;
+$$ language 'plpgsql';
+
+-- Return a checkout's held stock to its shards (idempotent)
+CREATE OR REPLACE FUNCTION release_inventory(p_reservation_id TEXT)
+RETURNS SETOF inventory_reservations AS $$
+    WITH released AS (
+        UPDATE inventory_reservations SET status = 'released', updated_at = NOW()
+        WHERE reservation_id = p_reservation_id AND status = 'reserved'
+        RETURNING *
+    ), restocked AS (
+        UPDATE inventory_shards s SET available = s.available + r.quantity
+        FROM (SELECT product_id, shard, SUM(quantity) AS quantity FROM released GROUP BY product_id, shard) r
+        WHERE s.product_id = r.product_id AND s.shard = r.shard
+    )
+    SELECT * FROM released;
+$$ language 'sql';
+
+-- Release up to p_limit holds whose checkout was never paid
+CREATE OR REPLACE FUNCTION release_expired_inventory(p_limit INTEGER DEFAULT 500)
+RETURNS SETOF inventory_reservations AS $$
+    WITH expired AS (
+        SELECT id FROM inventory_reservations
+        WHERE status = 'reserved' AND expires_at < NOW()
+        ORDER BY expires_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ), released AS (
+        UPDATE inventory_reservations SET status = 'released', updated_at = NOW()
+        WHERE id IN (SELECT id FROM expired)
+        RETURNING *
+    ), restocked AS (
+        UPDATE inventory_shards s SET available = s.available + r.quantity
+        FROM (SELECT product_id, shard, SUM(quantity) AS quantity FROM released GROUP BY product_id, shard) r
+        WHERE s.product_id = r.product_id AND s.shard = r.shard
+    )
+    SELECT * FROM released;
+$$ language 'sql';
+
+-- Mark a paid checkout's holds as sold (idempotent; released holds are not revived)
+CREATE OR REPLACE FUNCTION commit_inventory(p_reservation_id TEXT)
+RETURNS SETOF inventory_reservations AS $$
+    UPDATE inventory_reservations SET status = 'committed', updated_at = NOW()
+    WHERE reservation_id = p_reservation_id AND status = 'reserved'
+    RETURNING *;
+$$ language 'sql';
+
+-- Set a product's stock to p_quantity units, spread evenly over p_shards
+-- rows; a NULL quantity stops tracking the product's inventory.
+-- p_quantity includes units held by open checkouts: the shards keep their
+-- rows and get p_quantity minus the open holds, so releasing a hold brings
+-- stock back to p_quantity instead of adding to it. If more is held than
+-- p_quantity, the shards are set to 0 and released holds can still exceed
+-- it. Shards past p_shards are kept (at 0) while open holds were taken from
+-- them, so those holds are released into a row that still exists.
+CREATE OR REPLACE FUNCTION set_product_stock(p_product_id INTEGER, p_quantity INTEGER, p_shards INTEGER DEFAULT 8)
+RETURNS SETOF inventory_shards AS $$
+DECLARE
+    held INTEGER;
+    stock INTEGER;
+BEGIN
+    UPDATE products SET track_inventory = (p_quantity IS NOT NULL) WHERE id = p_product_id;
+    IF p_quantity IS NULL THEN
+        DELETE FROM inventory_shards WHERE product_id = p_product_id;
+        RETURN;
+    END IF;
+
+    -- Lock the shards in the order reserve_inventory waits for them, so no reservation is taken meanwhile
+    PERFORM 1 FROM inventory_shards WHERE product_id = p_product_id ORDER BY shard FOR UPDATE;
+    SELECT COALESCE(SUM(quantity), 0) INTO held FROM inventory_reservations
+    WHERE product_id = p_product_id AND status = 'reserved';
+    stock := GREATEST(p_quantity - held, 0);
+
+    DELETE FROM inventory_shards s
+    WHERE s.product_id = p_product_id AND s.shard >= p_shards
+    AND NOT EXISTS (
+        SELECT 1 FROM inventory_reservations r
+        WHERE r.product_id = s.product_id AND r.shard = s.shard AND r.status = 'reserved'
+    );
+    UPDATE inventory_shards SET available = 0 WHERE product_id = p_product_id AND shard >= p_shards;
+    INSERT INTO inventory_shards (product_id, shard, available)
+        SELECT p_product_id, n, stock / p_shards + CASE WHEN n < stock % p_shards THEN 1 ELSE 0 END
+        FROM generate_series(0, p_shards - 1) AS n
+    ON CONFLICT (product_id, shard) DO UPDATE SET available = EXCLUDED.available;
+
+    RETURN QUERY SELECT * FROM inventory_shards WHERE product_id = p_product_id ORDER BY shard;
+END;
+$$ language 'plpgsql';
+
+-- Sales rollups: units and gross amount per day, maintained incrementally as
+-- orders are paid so analytics never scan orders (see app/services/analytics_service.py)
+CREATE TABLE IF NOT EXISTS sales_daily_product (
+    day DATE NOT NULL,
+    product_id INTEGER NOT NULL,  -- no foreign key: rollups outlive archived products
+    currency VARCHAR(3) NOT NULL DEFAULT 'usd',
+    units INTEGER NOT NULL DEFAULT 0,
+    gross_amount BIGINT NOT NULL DEFAULT 0,  -- in minor units
+    orders INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, product_id, currency)
+);
+
+ALTER TABLE sales_daily_product DROP CONSTRAINT IF EXISTS sales_daily_product_product_id_fkey;
+
+CREATE TABLE IF NOT EXISTS sales_daily_category (
+    day DATE NOT NULL,
+    category VARCHAR(100) NOT NULL,  -- '' for uncategorized products
+    currency VARCHAR(3) NOT NULL DEFAULT 'usd',
+    units INTEGER NOT NULL DEFAULT 0,
+    gross_amount BIGINT NOT NULL DEFAULT 0,
+    orders INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, category, currency)
+);
+
+-- Add a paid order to the rollups exactly once (later calls return no rows).
+-- Products are counted under their category at the time of payment.
+CREATE OR REPLACE FUNCTION record_order_sales(p_order_id INTEGER)
+RETURNS SETOF sales_daily_product AS $$
+    WITH claimed AS (
+        UPDATE orders SET sales_recorded_at = NOW()
+        WHERE id = p_order_id AND status = 'paid' AND sales_recorded_at IS NULL
+        RETURNING id, currency, sales_recorded_at::date AS day
+    ), lines AS (
+        SELECT c.day, c.currency, i.product_id, COALESCE(p.category, '') AS category,
+               SUM(i.quantity) AS units, SUM(i.quantity * i.unit_amount_snapshot) AS gross_amount
+        FROM claimed c
+        JOIN order_items i ON i.order_id = c.id
+        JOIN products p ON p.id = i.product_id
+        GROUP BY c.day, c.currency, i.product_id, p.category
+    ), by_category AS (
+        INSERT INTO sales_daily_category (day, category, currency, units, gross_amount, orders)
+        SELECT day, category, currency, SUM(units), SUM(gross_amount), 1
+        FROM lines
+        GROUP BY day, category, currency
+        ON CONFLICT (day, category, currency) DO UPDATE SET
+            units = sales_daily_category.units + EXCLUDED.units,
+            gross_amount = sales_daily_category.gross_amount + EXCLUDED.gross_amount,
+            orders = sales_daily_category.orders + 1
+    )
+    INSERT INTO sales_daily_product (day, product_id, currency, units, gross_amount, orders)
+    SELECT day, product_id, currency, units, gross_amount, 1
+    FROM lines
+    ON CONFLICT (day, product_id, currency) DO UPDATE SET
+        units = sales_daily_product.units + EXCLUDED.units,
+        gross_amount = sales_daily_product.gross_amount + EXCLUDED.gross_amount,
+        orders = sales_daily_product.orders + 1
+    RETURNING *;
+$$ language 'sql';
+
+-- Archive: cold rows are moved out of the hot tables in batches by the
+-- functions below (see app/services/archive_service.py), so the hot tables
+-- and their indexes only hold rows the request paths still read. Archive
+-- tables have their source's columns (keep them in step) plus archived_at,
+-- and keep the original ids.
+CREATE TABLE IF NOT EXISTS products_archive (
+    LIKE products,
+    archived_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS orders_archive (
+    LIKE orders,
+    archived_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id)
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_archive_session_id ON orders_archive(stripe_checkout_session_id);
+
+-- No foreign key to products, so products can be archived after their orders
+CREATE TABLE IF NOT EXISTS order_items_archive (
+    LIKE order_items,
+    archived_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id),
+    FOREIGN KEY (order_id) REFERENCES orders_archive(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_order_items_archive_order_id ON order_items_archive(order_id);
+
+CREATE TABLE IF NOT EXISTS stripe_events_archive (
+    LIKE stripe_events,
+    archived_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id)
+);
+
+-- Finished (committed or released) holds of archived products; no foreign key, like order_items_archive
+CREATE TABLE IF NOT EXISTS inventory_reservations_archive (
+    LIKE inventory_reservations,
+    archived_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id)
+);
+
+-- Move up to p_limit closed orders (failed, cancelled, or paid and counted in
+-- the sales rollups) not updated for p_older_than_days, with their items
+CREATE OR REPLACE FUNCTION archive_closed_orders(p_older_than_days INTEGER, p_limit INTEGER DEFAULT 500)
+RETURNS SETOF orders_archive AS $$
+    WITH batch AS (
+        SELECT id FROM orders
+        WHERE updated_at < NOW() - make_interval(days => p_older_than_days)
+          AND (status IN ('failed', 'cancelled') OR (status = 'paid' AND sales_recorded_at IS NOT NULL))
+        ORDER BY updated_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ), moved_items AS (
+        DELETE FROM order_items i USING batch b WHERE i.order_id = b.id
+        RETURNING i.*
+    ), archived_items AS (
+        INSERT INTO order_items_archive SELECT moved_items.*, NOW() FROM moved_items
+    ), moved AS (
+        DELETE FROM orders o USING batch b WHERE o.id = b.id
+        RETURNING o.*
+    )
+    INSERT INTO orders_archive SELECT moved.*, NOW() FROM moved
+    RETURNING *;
+$$ language 'sql';
+
+-- Move up to p_limit processed Stripe events older than p_older_than_days.
+-- The retention must exceed Stripe's retry window (3 days): a redelivered
+-- event that is no longer in stripe_events is processed again.
+CREATE OR REPLACE FUNCTION archive_processed_stripe_events(p_older_than_days INTEGER, p_limit INTEGER DEFAULT 500)
+RETURNS SETOF stripe_events_archive AS $$
+    WITH batch AS (
+        SELECT id FROM stripe_events
+        WHERE processed AND processed_at < NOW() - make_interval(days => p_older_than_days)
+        ORDER BY processed_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ), moved AS (
+        DELETE FROM stripe_events e USING batch b WHERE e.id = b.id
+        RETURNING e.*
+    )
+    INSERT INTO stripe_events_archive SELECT moved.*, NOW() FROM moved
+    RETURNING *;
+$$ language 'sql';
+
+-- Move up to p_limit products soft-deleted more than p_older_than_days ago.
+-- Products still referenced by hot order items or open inventory holds wait
+-- until those are gone; their stock rows and finished holds are dropped.
+CREATE OR REPLACE FUNCTION archive_deleted_products(p_older_than_days INTEGER, p_limit INTEGER DEFAULT 500)
+RETURNS SETOF products_archive AS $$
+    WITH batch AS (
+        SELECT p.id FROM products p
+        WHERE p.deleted_at < NOW() - make_interval(days => p_older_than_days)
+          AND NOT EXISTS (SELECT 1 FROM order_items i WHERE i.product_id = p.id)
+          AND NOT EXISTS (SELECT 1 FROM inventory_reservations r WHERE r.product_id = p.id AND r.status = 'reserved')
+        ORDER BY p.deleted_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ), finished_holds AS (
+        DELETE FROM inventory_reservations r USING batch b WHERE r.product_id = b.id
+        RETURNING r.*
+    ), archived_holds AS (
+        INSERT INTO inventory_reservations_archive SELECT finished_holds.*, NOW() FROM finished_holds
+    ), moved AS (
+        DELETE FROM products p USING batch b WHERE p.id = b.id
+        RETURNING p.*
+    )
+    INSERT INTO products_archive SELECT moved.*, NOW() FROM moved
+    RETURNING *;
+$$ language 'sql';
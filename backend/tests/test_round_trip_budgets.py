@@ -0,0 +1,107 @@
+"""Endpoints stay within their declared round-trip budgets.
+
+The app runs against the benchmark fakes with ``QUERY_BUDGET_MODE=raise``, so
+an endpoint that issues more Supabase or Stripe round trips than its
+``@round_trip_budget`` allows raises ``RoundTripBudgetExceeded`` out of the
+request and fails the test.
+"""
+import os
+from datetime import date, timedelta
+
+os.environ["QUERY_BUDGET_MODE"] = "raise"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.harness import WEBHOOK_SECRET, build_context
+from benchmarks.scenarios import _checkout_body
+
+
+@pytest.fixture(scope="module")
+def context():
+    return build_context(products=30)
+
+
+@pytest.fixture(scope="module")
+def client(context):
+    # Not entered as a context manager: the lifespan's background workers are not needed here
+    return TestClient(context.app)
+
+
+def _checkout(client, context) -> str:
+    response = client.post("/checkout/session", json=_checkout_body(context))
+    assert response.status_code == 200, response.text
+    return response.json()["session_id"]
+
+
+@pytest.mark.parametrize("path", [
+    "/products",
+    "/products?category=books",
+    "/products?search=pro",
+    "/products/categories",
+    "/products/admin",
+])
+def test_product_listings(client, path):
+    assert client.get(path).status_code == 200
+
+
+def test_product_lookups(client, context):
+    product_id = context.product_ids[0]
+    response = client.get(f"/products/{product_id}")
+    assert response.status_code == 200
+    assert client.get(f"/products/{product_id}", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+    ids = ",".join(map(str, context.product_ids[:10]))
+    assert client.get(f"/products?ids={ids}").status_code == 200
+
+
+def test_cart_quote(client, context):
+    response = client.post("/cart/quote", json={"items": _checkout_body(context)["items"]})
+    assert response.status_code == 200
+
+
+def test_checkout(client, context):
+    _checkout(client, context)
+
+
+def test_webhook_and_redelivery(client, context):
+    session_id = _checkout(client, context)
+    event = context.stripe.complete_checkout_session(session_id)
+    payload, headers = context.stripe.webhook_request(event, WEBHOOK_SECRET)
+
+    response = client.post("/stripe/webhook", content=payload, headers=headers)
+    assert response.status_code == 200
+    assert client.post("/stripe/webhook", content=payload, headers=headers).json() == {"status": "already_processed"}
+    assert client.get(f"/orders/by-session/{session_id}").json()["status"] == "paid"
+
+
+def test_admin_writes(client, context):
+    response = client.post("/products/admin", json={"title": "Budget test", "current_price_amount": 1500, "published": True})
+    assert response.status_code == 201, response.text
+    product_id = response.json()["id"]
+    assert client.put(f"/products/admin/{product_id}", json={"current_price_amount": 1800}).status_code == 200
+    assert client.post(f"/products/admin/{product_id}/resync").status_code == 200
+    assert client.delete(f"/products/admin/{product_id}").status_code == 200
+
+
+def test_sales_report_pages_through_rollups(client, context):
+    # More rows than one PostgREST page, in a year no other test writes to
+    context.db._conn.executemany(
+        "INSERT INTO sales_daily_product (day, product_id, currency, units, gross_amount, orders) VALUES (?, ?, 'usd', 1, 100, 1)",
+        [((date(2020, 1, 1) + timedelta(days=n)).isoformat(), product_id) for n in range(60) for product_id in context.product_ids],
+    )
+    response = client.get("/admin/analytics/sales?group_by=product&start=2020-01-01&end=2020-02-29")
+    assert response.status_code == 200, response.text
+    assert len(response.json()["rows"]) == 60 * len(context.product_ids)
+    assert sum(total["units"] for total in response.json()["totals"]) == 60 * len(context.product_ids)
+
+
+def test_service_budget_is_enforced(context):
+    from app.database import get_supabase
+    from app.query_budget import RoundTripBudgetExceeded, expect_round_trips
+    from app.services.product_service import get_products
+
+    with expect_round_trips(supabase=1):
+        get_products(get_supabase(), published_only=True)
+    with pytest.raises(RoundTripBudgetExceeded):
+        with expect_round_trips(supabase=0):
+            get_products(get_supabase(), published_only=True)
@@ -1,5 +1,5 @@
 import { useState } from 'react';
-import { Product } from '../services/api';
+import { Product, imageVariant } from '../services/api';
 import { useCartContext } from '../contexts/CartContext';
 
 interface ProductCardProps {
@@ -47,7 +47,7 @@ export default function ProductCard({ product }: ProductCardProps) {
       {currentImage && (
         <div className="relative w-full h-48 bg-gray-100">
           <img
-            src={currentImage}
+            src={imageVariant(currentImage, 640)}
             alt={product.title}
             className="w-full h-full object-cover"
           />
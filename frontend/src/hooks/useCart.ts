@@ -1,6 +1,6 @@
 /** Cart hook for managing cart state */
 import { useState, useEffect } from 'react';
-import { CheckoutItem } from '../services/api';
+import { CheckoutItem, getProductsByIds } from '../services/api';
 
 export interface CartItem extends CheckoutItem {
   title?: string;
@@ -19,6 +19,34 @@ export const useCart = () => {
     localStorage.setItem('cart', JSON.stringify(cart));
   }, [cart]);
 
+  // On load, refresh the saved title/price snapshots with one batch lookup,
+  // dropping products that are no longer available
+  useEffect(() => {
+    const ids = cart.map((item) => item.product_id);
+    if (ids.length === 0) return;
+    getProductsByIds(ids)
+      .then((products) => {
+        const byId = new Map(products.map((product) => [product.id, product]));
+        setCart((prev) =>
+          prev
+            .filter((item) => byId.has(item.product_id))
+            .map((item) => {
+              const product = byId.get(item.product_id)!;
+              return {
+                ...item,
+                title: product.title,
+                price: product.current_price_amount,
+                formatted_price: product.formatted_price,
+                image_url: product.images[0] ?? product.image_url,
+              };
+            })
+        );
+      })
+      .catch((error) => {
+        console.error('Error refreshing cart:', error);
+      });
+  }, []);
+
   const addToCart = (item: CartItem) => {
     setCart((prev) => {
       const existing = prev.find((i) => i.product_id === item.product_id);
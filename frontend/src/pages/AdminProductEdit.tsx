@@ -19,6 +19,7 @@ export default function AdminProductEdit() {
   const [loading, setLoading] = useState(false);
   const [saving, setSaving] = useState(false);
   const [imageInput, setImageInput] = useState(''); // For adding new images
+  const [stockInput, setStockInput] = useState(''); // Empty leaves stock unchanged
 
   useEffect(() => {
     if (!isNew) {
@@ -80,6 +81,9 @@ export default function AdminProductEdit() {
         images: formData.images.length > 0 ? formData.images : undefined,
         category: formData.category || undefined,
       };
+      if (stockInput.trim()) {
+        productData.stock_quantity = parseInt(stockInput, 10);
+      }
 
       if (isNew) {
         await createProduct(productData);
@@ -248,6 +252,22 @@ export default function AdminProductEdit() {
           </div>
         </div>
 
+        <div>
+          <label htmlFor="stock" className="block text-sm font-medium text-gray-700 mb-2">
+            Set available stock
+          </label>
+          <input
+            type="number"
+            id="stock"
+            min="0"
+            step="1"
+            value={stockInput}
+            onChange={(e) => setStockInput(e.target.value)}
+            placeholder={isNew ? 'Leave empty for unlimited stock' : 'Leave empty to keep current stock'}
+            className="w-full px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-indigo-500"
+          />
+        </div>
+
         <div>
           <label className="flex items-center">
             <input
@@ -1,13 +1,36 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useCartContext } from '../contexts/CartContext';
-import { createCheckoutSession } from '../services/api';
+import { createCheckoutSession, quoteCart, CartQuote, imageVariant } from '../services/api';
 
 export default function Cart() {
   const { cart, updateQuantity, removeFromCart, getFormattedTotal } = useCartContext();
   const [loading, setLoading] = useState(false);
+  const [quote, setQuote] = useState<CartQuote | null>(null);
   const navigate = useNavigate();
 
+  // Re-price the cart on the server whenever its contents change
+  const cartKey = cart.map((item) => `${item.product_id}:${item.quantity}`).join(',');
+  useEffect(() => {
+    if (cart.length === 0) {
+      setQuote(null);
+      return;
+    }
+    let cancelled = false;
+    quoteCart(cart.map((item) => ({ product_id: item.product_id, quantity: item.quantity })))
+      .then((data) => {
+        if (!cancelled) setQuote(data);
+      })
+      .catch((error) => {
+        console.error('Error quoting cart:', error);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [cartKey]);
+
+  const quoteLine = (productId: number) => quote?.lines.find((line) => line.product_id === productId);
+
   const handleCheckout = async () => {
     if (cart.length === 0) return;
 
@@ -61,14 +84,19 @@ export default function Cart() {
               <div className="flex items-center space-x-4 flex-1">
                 {item.image_url && (
                   <img
-                    src={item.image_url}
+                    src={imageVariant(item.image_url, 160)}
                     alt={item.title}
                     className="w-20 h-20 object-cover rounded"
                   />
                 )}
                 <div className="flex-1">
                   <h3 className="text-lg font-semibold text-gray-900">{item.title}</h3>
-                  <p className="text-sm text-gray-600">{item.formatted_price}</p>
+                  <p className="text-sm text-gray-600">
+                    {quoteLine(item.product_id)?.formatted_unit_price ?? item.formatted_price}
+                  </p>
+                  {quoteLine(item.product_id)?.problem && (
+                    <p className="text-sm text-red-600">{quoteLine(item.product_id)?.problem}</p>
+                  )}
                 </div>
               </div>
               <div className="flex items-center space-x-4">
@@ -88,7 +116,7 @@ export default function Cart() {
                   </button>
                 </div>
                 <span className="text-lg font-semibold text-gray-900 w-24 text-right">
-                  ${((item.price || 0) * item.quantity / 100).toFixed(2)}
+                  ${((quoteLine(item.product_id)?.unit_amount ?? item.price ?? 0) * item.quantity / 100).toFixed(2)}
                 </span>
                 <button
                   onClick={() => removeFromCart(item.product_id)}
@@ -103,11 +131,13 @@ export default function Cart() {
         <div className="p-4 bg-gray-50 border-t border-gray-200">
           <div className="flex justify-between items-center mb-4">
             <span className="text-xl font-semibold text-gray-900">Total:</span>
-            <span className="text-2xl font-bold text-gray-900">{getFormattedTotal()}</span>
+            <span className="text-2xl font-bold text-gray-900">
+              {quote ? quote.formatted_subtotal : getFormattedTotal()}
+            </span>
           </div>
           <button
             onClick={handleCheckout}
-            disabled={loading}
+            disabled={loading || (quote !== null && !quote.checkout_ready)}
             className="w-full px-4 py-3 bg-indigo-600 text-white rounded-md hover:bg-indigo-700 disabled:opacity-50 disabled:cursor-not-allowed"
           >
             {loading ? 'Processing...' : 'Checkout'}
@@ -1,13 +1,13 @@
 import { useState, useEffect, useMemo } from 'react';
 import { useProducts } from '../hooks/useProducts';
 import ProductCard from '../components/ProductCard';
-import { getProducts, Product } from '../services/api';
+import { getProductFacets, ProductFacets } from '../services/api';
 
 export default function Home() {
   const [selectedCategory, setSelectedCategory] = useState<string>('');
   const [searchTerm, setSearchTerm] = useState<string>('');
   const [debouncedSearch, setDebouncedSearch] = useState<string>('');
-  const [categories, setCategories] = useState<string[]>([]);
+  const [categories, setCategories] = useState<ProductFacets['categories']>([]);
 
   // Debounce search input
   useEffect(() => {
@@ -18,15 +18,12 @@ export default function Home() {
     return () => clearTimeout(timer);
   }, [searchTerm]);
 
-  // Fetch categories from products
+  // Fetch category facets (names and product counts)
   useEffect(() => {
     const fetchCategories = async () => {
       try {
-        const products = await getProducts();
-        const uniqueCategories = Array.from(
-          new Set(products.map(p => p.category).filter(Boolean) as string[])
-        ).sort();
-        setCategories(uniqueCategories);
+        const facets = await getProductFacets();
+        setCategories(facets.categories);
       } catch (error) {
         console.error('Error fetching categories:', error);
       }
@@ -87,15 +84,15 @@ export default function Home() {
             </button>
             {categories.map((category) => (
               <button
-                key={category}
-                onClick={() => setSelectedCategory(category)}
+                key={category.name}
+                onClick={() => setSelectedCategory(category.name)}
                 className={`px-4 py-2 rounded-md text-sm font-medium transition-colors ${
-                  selectedCategory === category
+                  selectedCategory === category.name
                     ? 'bg-indigo-600 text-white'
                     : 'bg-gray-200 text-gray-700 hover:bg-gray-300'
                 }`}
               >
-                {category}
+                {category.name} ({category.count})
               </button>
             ))}
           </div>
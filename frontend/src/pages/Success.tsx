@@ -1,6 +1,6 @@
 import { useEffect, useState } from 'react';
 import { useSearchParams, Link } from 'react-router-dom';
-import { getOrderBySession, Order } from '../services/api';
+import { getOrderBySession, subscribeToOrderBySession, Order } from '../services/api';
 import { useCartContext } from '../contexts/CartContext';
 
 export default function Success() {
@@ -11,21 +11,35 @@ export default function Success() {
   const sessionId = searchParams.get('session_id');
 
   useEffect(() => {
-    if (sessionId) {
+    if (!sessionId) {
+      setLoading(false);
+      return;
+    }
+
+    // The webhook may mark the order paid a moment after the redirect;
+    // stream status updates instead of showing a stale one-shot read
+    let cleared = false;
+    const handleOrder = (data: Order) => {
+      setOrder(data);
+      setLoading(false);
+      if (!cleared) {
+        clearCart(); // Clear cart on successful order
+        cleared = true;
+      }
+    };
+
+    const close = subscribeToOrderBySession(sessionId, handleOrder, () => {
+      // Stream unavailable (e.g. blocked by a proxy); fall back to a single read
       getOrderBySession(sessionId)
-        .then((data) => {
-          setOrder(data);
-          clearCart(); // Clear cart on successful order
-        })
+        .then(handleOrder)
         .catch((error) => {
           console.error('Error fetching order:', error);
         })
         .finally(() => {
           setLoading(false);
         });
-    } else {
-      setLoading(false);
-    }
+    });
+    return close;
   }, [sessionId, clearCart]);
 
   if (loading) {
@@ -26,6 +26,14 @@ export interface Product {
   active_stripe_price_id?: string | null;
   last_sync_status?: string | null;
   last_sync_at?: string | null;
+  track_inventory?: boolean;
+  stock_quantity?: number | null;  // Write-only: sets available stock (admin)
+}
+
+export interface ProductFacets {
+  categories: Array<{ name: string; count: number }>;
+  price_ranges: Array<{ min_amount: number; max_amount: number | null; count: number }>;
+  total: number;
 }
 
 export interface CheckoutItem {
@@ -39,6 +47,27 @@ export interface CheckoutSessionRequest {
   cancel_url: string;
 }
 
+export interface CartQuoteLine {
+  product_id: number;
+  quantity: number;
+  title: string | null;
+  unit_amount: number | null;
+  formatted_unit_price: string | null;
+  line_total: number;
+  available: boolean;
+  stock_available: number | null;
+  problem: string | null;
+}
+
+export interface CartQuote {
+  lines: CartQuoteLine[];
+  currency: string;
+  subtotal: number;
+  formatted_subtotal: string;
+  item_count: number;
+  checkout_ready: boolean;
+}
+
 export interface CheckoutSessionResponse {
   checkout_url: string;
   session_id: string;
@@ -58,6 +87,13 @@ export interface Order {
   created_at: string;
 }
 
+// Image proxy widths (IMAGE_WIDTHS in the backend); resized variants are WebP
+export type ImageWidth = 160 | 320 | 640 | 1280;
+
+/** A resized variant of a storefront image URL when it points at the image proxy; other URLs are returned as-is. */
+export const imageVariant = (url: string, width: ImageWidth): string =>
+  url.startsWith(`${API_URL}/images/`) ? `${url}&w=${width}` : url;
+
 // Product APIs
 export const getProducts = async (category?: string, search?: string): Promise<Product[]> => {
   const params = new URLSearchParams();
@@ -69,6 +105,21 @@ export const getProducts = async (category?: string, search?: string): Promise<P
   return response.data.products;
 };
 
+export const getProduct = async (id: number): Promise<Product> => {
+  const response = await api.get<Product>(`/products/${id}`);
+  return response.data;
+};
+
+export const getProductsByIds = async (ids: number[]): Promise<Product[]> => {
+  const response = await api.get<{ products: Product[] }>(`/products?ids=${ids.join(',')}`);
+  return response.data.products;
+};
+
+export const getProductFacets = async (): Promise<ProductFacets> => {
+  const response = await api.get<ProductFacets>('/products/categories');
+  return response.data;
+};
+
 export const getAdminProducts = async (category?: string, search?: string): Promise<Product[]> => {
   const params = new URLSearchParams();
   if (category) params.append('category', category);
@@ -97,6 +148,12 @@ export const resyncProduct = async (id: number): Promise<void> => {
   await api.post(`/products/admin/${id}/resync`);
 };
 
+// Cart APIs
+export const quoteCart = async (items: CheckoutItem[]): Promise<CartQuote> => {
+  const response = await api.post<CartQuote>('/cart/quote', { items });
+  return response.data;
+};
+
 // Checkout APIs
 export const createCheckoutSession = async (
   request: CheckoutSessionRequest
@@ -115,3 +172,40 @@ export const getOrderBySession = async (sessionId: string): Promise<Order> => {
   const response = await api.get<Order>(`/orders/by-session/${sessionId}`);
   return response.data;
 };
+
+/**
+ * Follow an order's status over Server-Sent Events until it is final.
+ * Calls onOrder for the current order, for every update and for a final read
+ * when the stream times out; onError when the stream fails before a final
+ * status (callers can fall back to getOrderBySession).
+ * Returns a function that closes the stream.
+ */
+export const subscribeToOrderBySession = (
+  sessionId: string,
+  onOrder: (order: Order) => void,
+  onError: () => void
+): (() => void) => {
+  const source = new EventSource(`${API_URL}/orders/by-session/${sessionId}/events`);
+  let finished = false;
+  const close = () => {
+    finished = true;
+    source.close();
+  };
+
+  source.addEventListener('order', (event) => {
+    onOrder(JSON.parse((event as MessageEvent).data));
+  });
+  source.addEventListener('end', close);
+  source.addEventListener('timeout', () => {
+    close();
+    // The stream gave up while the order was pending; read it once more in case an update was missed
+    getOrderBySession(sessionId).then(onOrder).catch(onError);
+  });
+  source.onerror = () => {
+    if (!finished) {
+      close();
+      onError();
+    }
+  };
+  return close;
+};